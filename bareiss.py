@@ -0,0 +1,114 @@
+from fractions import Fraction
+from math import gcd
+
+import instrumentation
+from numeric import NumericMode
+from elimination import AugmentedMatrix
+
+
+def lcm(a, b):
+    return a * b // gcd(a, b)
+
+
+class BareissMatrix(object):
+
+    #Fraction-free Gauss-Jordan elimination on an augmented matrix of Python ints. Every row is first
+    #scaled by the common denominator of its entries, which is exact for ints, Fractions, Decimals and
+    #floats alike. Each step then replaces the entries outside the pivot row by
+    #(pivot * a_ij - a_ic * a_kj) / previous_pivot, a division that is always exact, so every entry stays a
+    #minor of the scaled matrix instead of growing without bound, and a pivot is nonzero or it is not.
+    #Once done every pivot equals the last one, d, and the matrix is d times the reduced row echelon form.
+    def __init__(self, num_rows, num_variables, data):
+        self.num_rows = num_rows
+        self.num_variables = num_variables
+        self.stride = num_variables + 1
+        self.data = data
+        self.pivot_columns = []
+        self.rank = 0
+        self.divisor = 1
+
+    @classmethod
+    def from_planes(cls, planes):
+        mode = NumericMode(NumericMode.FRACTION)
+        num_variables = planes[0].dimension
+
+        data = []
+        for p in planes:
+            if p.dimension != num_variables:
+                raise Exception(AugmentedMatrix.ALL_ROWS_MUST_BE_IN_SAME_DIM_MSG)
+            row = [mode.convert(c) for c in p.normal_vector.coordinates] + [mode.convert(p.constant_term)]
+            scale = 1
+            for c in row:
+                scale = lcm(scale, c.denominator)
+            data.extend([c.numerator * (scale // c.denominator) for c in row])
+
+        return cls(len(planes), num_variables, data)
+
+    def swap_rows(self, row1, row2):
+        instrumentation.count(instrumentation.SWAP_ROWS)
+        s = self.stride
+        a = row1 * s
+        b = row2 * s
+        self.data[a:a + s], self.data[b:b + s] = self.data[b:b + s], self.data[a:a + s]
+
+    #First row at or below row with a nonzero entry in col, -1 if there is none
+    def find_pivot_row(self, row, col):
+        data = self.data
+        s = self.stride
+        for k in range(row, self.num_rows):
+            if data[k * s + col]:
+                return k
+        return -1
+
+    #Brings every other row to the pivot's scale and clears its entry in col. Rows below the pivot are
+    #zero left of col, but rows above still hold their own pivots and free-column entries there
+    def eliminate(self, row, col, previous_pivot):
+        data = self.data
+        s = self.stride
+        pivot_start = row * s
+        pivot = data[pivot_start + col]
+
+        for k in range(self.num_rows):
+            if k == row:
+                continue
+            start = k * s
+            gamma = data[start + col]
+            instrumentation.count(instrumentation.ADD_MULTIPLE_OF_ROW)
+            for j in range(0 if k < row else col + 1, s):
+                data[start + j] = (pivot * data[start + j] - gamma * data[pivot_start + j]) // previous_pivot
+            data[start + col] = 0
+
+    def compute_rref(self):
+        with instrumentation.phase(instrumentation.RREF_PHASE):
+            return self.do_compute_rref()
+
+    def do_compute_rref(self):
+        previous_pivot = 1
+        row = 0
+        for col in range(self.num_variables):
+            if row == self.num_rows:
+                break
+            pivot_row = self.find_pivot_row(row, col)
+            if pivot_row < 0:
+                continue
+            if pivot_row != row:
+                self.swap_rows(row, pivot_row)
+
+            self.eliminate(row, col, previous_pivot)
+            previous_pivot = self.data[row * self.stride + col]
+            self.pivot_columns.append(col)
+            row += 1
+
+        self.rank = row
+        self.divisor = previous_pivot
+        return self
+
+    #The exact reduced row echelon form as a fraction-mode AugmentedMatrix
+    def to_augmented_matrix(self):
+        mode = NumericMode(NumericMode.FRACTION)
+        d = self.divisor
+        data = [Fraction(c, d) for c in self.data]
+        return AugmentedMatrix(self.num_rows, self.num_variables, data, mode)
+
+    def __len__(self):
+        return self.num_rows
@@ -0,0 +1,212 @@
+from array import array
+import math
+
+from vector import axpy
+from linsys import LinearSystem
+
+
+INTERSECTING = 0
+PARALLEL = 1
+COINCIDENT = 2
+
+
+#Packs lines into the flat buffers intersect_lines expects: (A0, B0, A1, B1, ...) and (k0, k1, ...)
+def pack_lines(lines):
+    normals = array('d')
+    constants = array('d')
+    for line in lines:
+        normals.extend([float(c) for c in line.normal_vector.coordinates])
+        constants.append(float(line.constant_term))
+    return normals, constants
+
+
+#Intersects line i of the first batch with line i of the second batch for every i in a single pass.
+#Returns the x and y coordinates plus a status per pair; pairs that are PARALLEL or COINCIDENT
+#get nan coordinates. Two lines count as parallel when the sine of the angle between their
+#normals is below tolerance, so no trigonometry or magnitude() calls are needed.
+def intersect_lines(normals1, constants1, normals2, constants2, tolerance=1e-10):
+    if len(normals1) != len(normals2) or len(constants1) != len(constants2) or len(normals1) != 2 * len(constants1):
+        raise Exception('Both batches need two coefficients and one constant term per line')
+
+    count = len(constants1)
+    xs = array('d', bytes(8 * count))
+    ys = array('d', bytes(8 * count))
+    status = bytearray(count)
+    nan = float('nan')
+    hypot = math.hypot
+
+    i = 0
+    for a1, b1, k1, a2, b2, k2 in zip(normals1[0::2], normals1[1::2], constants1,
+                                      normals2[0::2], normals2[1::2], constants2):
+        # X = (Dk1 - Bk2) / (AD - BC), Y = (-Ck1 + Ak2) / (AD - BC)
+        determinant = a1 * b2 - b1 * a2
+        scale = hypot(a1, b1) * hypot(a2, b2)
+
+        if abs(determinant) > tolerance * scale:
+            xs[i] = (b2 * k1 - b1 * k2) / determinant
+            ys[i] = (a1 * k2 - a2 * k1) / determinant
+        else:
+            xs[i] = nan
+            ys[i] = nan
+            #Parallel lines coincide when their constant terms are in the same ratio as their normals
+            if abs(a1 * k2 - a2 * k1) + abs(b1 * k2 - b2 * k1) <= tolerance * (scale + abs(k1) * hypot(a2, b2) + abs(k2) * hypot(a1, b1)):
+                status[i] = COINCIDENT
+            else:
+                status[i] = PARALLEL
+        i += 1
+
+    return xs, ys, status
+
+
+UNIQUE_SOLUTION = 'Unique solution'
+
+
+#Packs LinearSystems (or nested [[a, b, ..., k], ...] rows) into the flat buffer solve_small_systems expects
+def pack_systems(systems):
+    buffer = array('d')
+    for system in systems:
+        for row in system:
+            if hasattr(row, 'normal_vector'):
+                buffer.extend([float(c) for c in row.normal_vector.coordinates])
+                buffer.append(float(row.constant_term))
+            else:
+                buffer.extend([float(c) for c in row])
+    return buffer
+
+
+#Solves N independent k x k systems given as one flat (N, k, k+1) row-major buffer of augmented rows.
+#Returns an (N, k) array('d') of solution points and a status per system: UNIQUE_SOLUTION,
+#LinearSystem.NO_SOLUTIONS_MSG or LinearSystem.INF_SOLUTIONS_MSG. Systems without a unique
+#solution get nan coordinates. 2x2 and 3x3 systems use Cramer's rule; a system is singular when
+#its determinant is below tolerance relative to the product of its row lengths.
+def solve_small_systems(systems, size, tolerance=1e-10):
+    stride = size * (size + 1)
+    if len(systems) % stride:
+        raise Exception('The buffer must hold size * (size + 1) numbers per system')
+
+    count = len(systems) // stride
+    solutions = array('d', bytes(8 * count * size))
+    statuses = [UNIQUE_SOLUTION] * count
+
+    if size == 2:
+        solve = solve_2x2
+    elif size == 3:
+        solve = solve_3x3
+    else:
+        solve = solve_by_elimination
+
+    for i in range(count):
+        point = solve(systems[i * stride:(i + 1) * stride], size, tolerance)
+        if isinstance(point, str):
+            statuses[i] = point
+            point = [float('nan')] * size
+        solutions[i * size:(i + 1) * size] = array('d', point)
+
+    return solutions, statuses
+
+
+def solve_2x2(system, size, tolerance):
+    a1, b1, k1, a2, b2, k2 = system
+    determinant = a1 * b2 - b1 * a2
+    if abs(determinant) <= tolerance * math.hypot(a1, b1) * math.hypot(a2, b2):
+        return solve_by_elimination(system, size, tolerance)
+    return ((b2 * k1 - b1 * k2) / determinant, (a1 * k2 - a2 * k1) / determinant)
+
+
+def solve_3x3(system, size, tolerance):
+    a1, b1, c1, k1, a2, b2, c2, k2, a3, b3, c3, k3 = system
+
+    #Cofactors of the first row come from the cross product of rows two and three
+    x1 = b2 * c3 - c2 * b3
+    y1 = c2 * a3 - a2 * c3
+    z1 = a2 * b3 - b2 * a3
+    determinant = a1 * x1 + b1 * y1 + c1 * z1
+
+    scale = (math.sqrt(a1 * a1 + b1 * b1 + c1 * c1) * math.sqrt(a2 * a2 + b2 * b2 + c2 * c2) *
+             math.sqrt(a3 * a3 + b3 * b3 + c3 * c3))
+    if abs(determinant) <= tolerance * scale:
+        return solve_by_elimination(system, size, tolerance)
+
+    #x = adj(A) k / det(A), with the adjugate built from the cross products of each pair of rows
+    x2 = b3 * c1 - c3 * b1
+    y2 = c3 * a1 - a3 * c1
+    z2 = a3 * b1 - b3 * a1
+    x3 = b1 * c2 - c1 * b2
+    y3 = c1 * a2 - a1 * c2
+    z3 = a1 * b2 - b1 * a2
+
+    return ((x1 * k1 + x2 * k2 + x3 * k3) / determinant,
+            (y1 * k1 + y2 * k2 + y3 * k3) / determinant,
+            (z1 * k1 + z2 * k2 + z3 * k3) / determinant)
+
+
+#Gaussian elimination with partial pivoting on one small augmented system.
+#Returns the solution, or the LinearSystem message explaining why there is no unique one.
+def solve_by_elimination(system, size, tolerance):
+    stride = size + 1
+    rows = [list(system[i * stride:(i + 1) * stride]) for i in range(size)]
+    largest = max([abs(c) for c in system] + [1.0])
+
+    r = 0
+    for col in range(size):
+        pivot = max(range(r, size), key=lambda i: abs(rows[i][col])) if r < size else None
+        if pivot is None or abs(rows[pivot][col]) <= tolerance * largest:
+            continue
+        rows[r], rows[pivot] = rows[pivot], rows[r]
+        for i in range(size):
+            if i != r and rows[i][col]:
+                alpha = rows[i][col] / rows[r][col]
+                rows[i] = axpy(-alpha, rows[r], rows[i])
+        r += 1
+
+    for i in range(r, size):
+        if abs(rows[i][size]) > tolerance * largest:
+            return LinearSystem.NO_SOLUTIONS_MSG
+    if r < size:
+        return LinearSystem.INF_SOLUTIONS_MSG
+
+    return [rows[i][size] / rows[i][i] for i in range(size)]
+
+
+def main():
+    from line import Line
+    from plane import Plane
+    from vector import Vector
+
+    first = [Line(normal_vector=Vector([4.046, 2.836]), constant_term=1.21),
+             Line(normal_vector=Vector([7.204, 3.182]), constant_term=8.68),
+             Line(normal_vector=Vector([1, 2]), constant_term=3)]
+    second = [Line(normal_vector=Vector([10.115, 7.09]), constant_term=3.025),
+              Line(normal_vector=Vector([8.172, 4.114]), constant_term=9.883),
+              Line(normal_vector=Vector([-2, -4]), constant_term=-5)]
+    xs, ys, status = intersect_lines(*(pack_lines(first) + pack_lines(second)))
+    point = first[1].compute_intersection(second[1])
+    if not (list(status) == [COINCIDENT, INTERSECTING, PARALLEL] and
+            abs(xs[1] - float(point.coordinates[0])) < 1e-9 and abs(ys[1] - float(point.coordinates[1])) < 1e-9 and
+            math.isnan(xs[0]) and math.isnan(ys[2])):
+        print('test case 1 failed')
+
+    p1 = Plane(normal_vector=Vector([0, 1, 1]), constant_term= 1)
+    p2 = Plane(normal_vector=Vector([1, -1, 1]), constant_term= 2)
+    p3 = Plane(normal_vector=Vector([1, 2, -5]), constant_term= 3)
+    q = Plane(normal_vector=Vector([1, 0, 2]), constant_term= 3)
+    systems = [[p1, p2, p3], [p1, p2, q], [p1, p2, Plane(normal_vector=Vector([1, 0, 2]), constant_term= 4)]]
+    solutions, statuses = solve_small_systems(pack_systems(systems), 3)
+    x = LinearSystem(systems[0]).compute_solution().basepoint
+    if not (statuses == [UNIQUE_SOLUTION, LinearSystem.INF_SOLUTIONS_MSG, LinearSystem.NO_SOLUTIONS_MSG] and
+            all(abs(solutions[j] - float(x.coordinates[j])) < 1e-12 for j in range(3)) and
+            all(math.isnan(c) for c in solutions[3:])):
+        print('test case 2 failed')
+
+    rows = [[2, 1, 0, 0, 3], [1, 2, 1, 0, 4], [0, 1, 2, 1, 4], [0, 0, 1, 2, 3]]
+    solutions, statuses = solve_small_systems(pack_systems([rows, rows[:3] + [rows[2]]]), 4)
+    pairs, pair_statuses = solve_small_systems(pack_systems([[[1, 2, 3], [2, 4, 6]], [[1, 1, 2], [1, -1, 0]]]), 2)
+    if not (statuses == [UNIQUE_SOLUTION, LinearSystem.INF_SOLUTIONS_MSG] and
+            all(abs(c - 1) < 1e-12 for c in solutions[:4]) and
+            pair_statuses == [LinearSystem.INF_SOLUTIONS_MSG, UNIQUE_SOLUTION] and
+            list(pairs[2:]) == [1.0, 1.0]):
+        print('test case 3 failed')
+
+
+if __name__ == "__main__":
+    main()
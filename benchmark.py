@@ -0,0 +1,309 @@
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from vector import Vector
+from line import Line
+from plane import Plane
+from hyperplane import Hyperplane
+from linsys import LinearSystem
+from numeric import NumericMode
+
+
+DEFAULT_SIZES = (2, 20, 200, 2000)
+DEFAULT_MODES = (NumericMode.FLOAT, NumericMode.DECIMAL)
+
+#Elimination is cubic, so linear systems stop at this many variables unless asked otherwise
+DEFAULT_MAX_SYSTEM_SIZE = 200
+
+#Each timing repeats the call until a batch takes at least this long, then keeps the best of REPEATS batches
+MIN_BATCH_SECONDS = 0.05
+REPEATS = 5
+
+#A benchmark counts as a regression when it gets slower than the baseline by more than this factor
+DEFAULT_THRESHOLD = 1.10
+
+BENCHMARKS = []
+
+
+#Registers a benchmark. setup(generator, size, mode) builds the inputs and returns the zero-argument call to time.
+#fixed_size is for objects whose dimension cannot change, like Line and Plane.
+def benchmark(name, fixed_size=None, max_size=None):
+    def register(setup):
+        BENCHMARKS.append((name, setup, fixed_size, max_size))
+        return setup
+    return register
+
+
+def random_coordinates(generator, size):
+    return [generator.uniform(-10, 10) for _ in range(size)]
+
+
+def random_vector(generator, size, mode):
+    return Vector(random_coordinates(generator, size), mode=mode)
+
+
+#A diagonally dominant system, so it always has a unique solution
+def random_system(generator, size, mode):
+    planes = []
+    for i in range(size):
+        coordinates = random_coordinates(generator, size)
+        coordinates[i] = sum(abs(c) for c in coordinates) + 1
+        planes.append(Hyperplane(normal_vector=Vector(coordinates), constant_term=generator.uniform(-10, 10)))
+    return LinearSystem(planes, mode=mode)
+
+
+@benchmark('vector.plus')
+def vector_plus(generator, size, mode):
+    v = random_vector(generator, size, mode)
+    w = random_vector(generator, size, mode)
+    return lambda: v.plus(w)
+
+
+@benchmark('vector.dot_product')
+def vector_dot_product(generator, size, mode):
+    v = random_vector(generator, size, mode)
+    w = random_vector(generator, size, mode)
+    return lambda: v.dot_product(w)
+
+
+@benchmark('vector.times_scalar')
+def vector_times_scalar(generator, size, mode):
+    v = random_vector(generator, size, mode)
+    return lambda: v.times_scalar(3)
+
+
+#Derived values are cached on the vector, so the cache is cleared to time the computation itself
+@benchmark('vector.magnitude')
+def vector_magnitude(generator, size, mode):
+    v = random_vector(generator, size, mode)
+
+    def run():
+        v.clear_cache()
+        return v.magnitude()
+    return run
+
+
+@benchmark('vector.angle_between')
+def vector_angle_between(generator, size, mode):
+    v = random_vector(generator, size, mode)
+    w = random_vector(generator, size, mode)
+
+    def run():
+        v.clear_cache()
+        w.clear_cache()
+        return v.angle_between(w)
+    return run
+
+
+@benchmark('vector.is_parallel')
+def vector_is_parallel(generator, size, mode):
+    v = random_vector(generator, size, mode)
+    w = v.times_scalar(-2)
+
+    def run():
+        v.clear_cache()
+        w.clear_cache()
+        return v.is_parallel(w)
+    return run
+
+
+@benchmark('line.compute_intersection', fixed_size=2)
+def line_compute_intersection(generator, size, mode):
+    line1 = Line(normal_vector=random_vector(generator, 2, mode), constant_term=generator.uniform(-10, 10))
+    line2 = Line(normal_vector=random_vector(generator, 2, mode), constant_term=generator.uniform(-10, 10))
+    return lambda: line1.compute_intersection(line2)
+
+
+@benchmark('plane.__eq__', fixed_size=3)
+def plane_eq(generator, size, mode):
+    normal_vector = random_vector(generator, 3, mode)
+    plane1 = Plane(normal_vector=normal_vector, constant_term=5)
+    plane2 = Plane(normal_vector=normal_vector.times_scalar(2), constant_term=10)
+    return lambda: plane1 == plane2
+
+
+@benchmark('hyperplane.__eq__')
+def hyperplane_eq(generator, size, mode):
+    normal_vector = random_vector(generator, size, mode)
+    hyperplane1 = Hyperplane(normal_vector=normal_vector, constant_term=5)
+    hyperplane2 = Hyperplane(normal_vector=normal_vector.times_scalar(2), constant_term=10)
+    return lambda: hyperplane1 == hyperplane2
+
+
+@benchmark('linsys.compute_rref', max_size=DEFAULT_MAX_SYSTEM_SIZE)
+def linsys_compute_rref(generator, size, mode):
+    system = random_system(generator, size, mode)
+    return system.compute_rref
+
+
+@benchmark('linsys.compute_solution', max_size=DEFAULT_MAX_SYSTEM_SIZE)
+def linsys_compute_solution(generator, size, mode):
+    system = random_system(generator, size, mode)
+    return system.compute_solution
+
+
+#Best seconds per call, plus how many calls each batch made
+def time_call(call):
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_BATCH_SECONDS:
+            break
+        number *= 10 if elapsed <= 0 else min(10, max(2, int(MIN_BATCH_SECONDS / elapsed) + 1))
+
+    timings = [elapsed / number]
+    for _ in range(REPEATS - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        timings.append((time.perf_counter() - start) / number)
+
+    return min(timings), sum(timings) / len(timings), number
+
+
+#Peak bytes allocated during one call, measured separately because tracing slows everything down
+def measure_memory(call):
+    tracemalloc.start()
+    try:
+        call()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, modes=DEFAULT_MODES, pattern=None, max_system_size=None, seed=0):
+    results = []
+
+    for name, setup, fixed_size, max_size in BENCHMARKS:
+        if pattern and pattern not in name:
+            continue
+        if max_size is not None and max_system_size is not None:
+            max_size = max_system_size
+
+        benchmark_sizes = [fixed_size] if fixed_size else [s for s in sizes if max_size is None or s <= max_size]
+        for mode in modes:
+            for size in benchmark_sizes:
+                call = setup(random.Random(seed), size, NumericMode(mode))
+                best, mean, number = time_call(call)
+                results.append({
+                    'name': name,
+                    'mode': mode,
+                    'size': size,
+                    'best_seconds': best,
+                    'mean_seconds': mean,
+                    'calls_per_repeat': number,
+                    'repeats': REPEATS,
+                    'peak_bytes': measure_memory(call),
+                })
+                print('{:<28} {:<8} {:>5}  {:>12.3e} s  {:>10} B'.format(
+                    name, mode, size, best, results[-1]['peak_bytes']), file=sys.stderr)
+
+    return {
+        'metadata': {
+            'commit': current_commit(),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'results': results,
+    }
+
+
+def result_key(result):
+    return (result['name'], result['mode'], result['size'])
+
+
+#Pairs up the benchmarks both runs share; returns (rows, regressions) where each row is
+#(key, baseline seconds, current seconds, ratio, baseline bytes, current bytes)
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    baseline_results = dict((result_key(r), r) for r in baseline['results'])
+    rows = []
+    regressions = []
+
+    for result in current['results']:
+        key = result_key(result)
+        if key not in baseline_results:
+            continue
+        old = baseline_results[key]
+        ratio = result['best_seconds'] / old['best_seconds'] if old['best_seconds'] else float('inf')
+        row = (key, old['best_seconds'], result['best_seconds'], ratio, old['peak_bytes'], result['peak_bytes'])
+        rows.append(row)
+        if ratio > threshold:
+            regressions.append(row)
+
+    return rows, regressions
+
+
+def print_comparison(rows, regressions):
+    print('{:<28} {:<8} {:>5}  {:>12} {:>12} {:>7}  {:>10} {:>10}'.format(
+        'benchmark', 'mode', 'size', 'baseline s', 'current s', 'ratio', 'base B', 'current B'))
+    for (name, mode, size), old, new, ratio, old_bytes, new_bytes in rows:
+        flag = '  <-- slower' if (name, mode, size) in [r[0] for r in regressions] else ''
+        print('{:<28} {:<8} {:>5}  {:>12.3e} {:>12.3e} {:>7.2f}  {:>10} {:>10}{}'.format(
+            name, mode, size, old, new, ratio, old_bytes, new_bytes, flag))
+    print('{} of {} benchmarks regressed'.format(len(regressions), len(rows)))
+
+
+def parse_list(text, convert=str):
+    return tuple(convert(item) for item in text.split(',') if item)
+
+
+#python benchmark.py run --output before.json
+#python benchmark.py compare before.json after.json   (exits with status 1 on a regression)
+def main():
+    parser = argparse.ArgumentParser(description='Time and measure the memory of the hot paths')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='run the benchmarks and write the results as JSON')
+    run.add_argument('--sizes', type=lambda s: parse_list(s, int), default=DEFAULT_SIZES)
+    run.add_argument('--modes', type=parse_list, default=DEFAULT_MODES)
+    run.add_argument('--filter', dest='pattern', help='only run benchmarks whose name contains this')
+    run.add_argument('--max-system-size', type=int, default=None)
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--output', help='file to write (default: standard output)')
+
+    compare = commands.add_parser('compare', help='compare two result files')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        results = run_benchmarks(args.sizes, args.modes, args.pattern, args.max_system_size, args.seed)
+        text = json.dumps(results, indent=2)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(text + '\n')
+        else:
+            print(text)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    rows, regressions = compare_results(baseline, current, args.threshold)
+    print_comparison(rows, regressions)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
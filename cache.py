@@ -0,0 +1,88 @@
+from collections import OrderedDict
+import time
+
+
+class SolutionCache(object):
+
+    MAX_SIZE_MUST_BE_POSITIVE_MSG = 'The cache must be able to hold at least one entry'
+
+    MISSING = object()
+
+    #Bounded LRU map from content fingerprints to results. Once max_size entries are held the least
+    #recently used one is evicted; with a ttl (in seconds) entries also expire that long after being stored.
+    #clock is only replaceable so expiry can be driven by hand.
+    def __init__(self, max_size=128, ttl=None, clock=time.monotonic):
+        if max_size < 1:
+            raise Exception(self.MAX_SIZE_MUST_BE_POSITIVE_MSG)
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key, self.MISSING)
+        if entry is self.MISSING:
+            self.misses += 1
+            return default
+
+        value, expires_at = entry
+        if expires_at is not None and self.clock() >= expires_at:
+            del self.entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        expires_at = None if self.ttl is None else self.clock() + self.ttl
+        self.entries[key] = (value, expires_at)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    #Returns the cached value for key, or stores and returns compute()
+    def get_or_compute(self, key, compute):
+        value = self.get(key, self.MISSING)
+        if value is self.MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def __contains__(self, key):
+        entry = self.entries.get(key)
+        return entry is not None and (entry[1] is None or self.clock() < entry[1])
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def statistics(self):
+        return {
+            'size': len(self.entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': self.hit_rate(),
+        }
+
+    def __str__(self):
+        return 'Solution cache: {} of {} entries, {} hits, {} misses, {} evictions, {} expirations'.format(
+            len(self.entries), self.max_size, self.hits, self.misses, self.evictions, self.expirations)
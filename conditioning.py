@@ -0,0 +1,117 @@
+import math
+import sys
+
+from numeric import NumericMode
+
+
+#Hager's estimate of ||A^-1||_1 (as refined by Higham), given solvers for A x = b and A^T z = b.
+#It climbs towards the column of A^-1 with the largest sum, which usually takes two or three
+#iterations, and never reports more than the true norm.
+def estimate_inverse_one_norm(solve, solve_transpose, n, max_iterations=5):
+    x = [1.0 / n] * n
+    estimate = 0.0
+    previous_column = -1
+
+    for _ in range(max_iterations):
+        y = [float(c) for c in solve(x)]
+        estimate = sum(abs(c) for c in y)
+        signs = [1.0 if c >= 0 else -1.0 for c in y]
+        z = [float(c) for c in solve_transpose(signs)]
+
+        column = max(range(n), key=lambda j: abs(z[j]))
+        if abs(z[column]) <= sum(a * b for a, b in zip(z, x)) or column == previous_column:
+            break
+        x = [0.0] * n
+        x[column] = 1.0
+        previous_column = column
+
+    #Higham's extra test vector catches matrices the climb stalls on
+    alternating = [(-1.0) ** i * (1.0 + i / max(n - 1, 1)) for i in range(n)]
+    y = [float(c) for c in solve(alternating)]
+    return max(estimate, 2.0 * sum(abs(c) for c in y) / (3.0 * n))
+
+
+#Relative precision the given numbers were known to: a double's unit roundoff if any of them is a float,
+#zero when they are all exact (ints, Decimals, Fractions)
+def input_unit_roundoff(values):
+    for v in values:
+        if isinstance(v, float):
+            return NumericMode(NumericMode.FLOAT).unit_roundoff()
+    return 0.0
+
+
+#A mode for factorizing only to estimate a condition number: just exact zero pivots count as zero
+def estimation_mode(precision=None):
+    if precision is None:
+        return NumericMode(NumericMode.FLOAT, tolerance=sys.float_info.min)
+    return NumericMode(NumericMode.DECIMAL, precision, sys.float_info.min)
+
+
+class ConditionEstimate(object):
+
+    #Correct digits auto mode aims for, matching the default tolerance of 1e-10
+    TARGET_DIGITS = 10
+
+    #Decimal digits kept beyond what the condition number is expected to cost
+    GUARD_DIGITS = 2
+
+    #Significant decimal digits a double carries
+    FLOAT_DIGITS = 15
+
+    #A zero tolerance is never tighter than this many units of the input's own roundoff
+    INPUT_NOISE_UNITS = 10
+
+    #An estimate is only trusted from a factorization that kept this relative accuracy
+    TRUSTED_ERROR_BOUND = 1e-3
+
+    MAX_PRECISION = 400
+
+    #The numeric mode picked for a system with the given condition number, and the relative error bound
+    #condition_number * unit_roundoff of its solutions. Float is kept when it loses few enough digits,
+    #decimal gets enough precision to keep target_digits and a zero tolerance halfway between its rounding
+    #noise and the smallest pivot the condition number allows, and a system with an exactly zero pivot is
+    #left to exact fractions, which settle the rank without a tolerance.
+    #input_roundoff is how precisely the coefficients were known (see input_unit_roundoff). Extra digits
+    #cannot tell a zero pivot from the rounding of the input, so no tolerance goes below it and the error
+    #bound uses it in place of a smaller unit_roundoff. Once condition_number * input_roundoff reaches 1
+    #the input does not pin down a solution at all, and the system is treated as possibly rank deficient:
+    #fractions check its rank exactly on the numbers as written (floats by their shortest repr).
+    def __init__(self, condition_number, mode, error_bound):
+        self.condition_number = condition_number
+        self.mode = mode
+        self.precision = mode.precision if mode.kind == NumericMode.DECIMAL else None
+        self.error_bound = error_bound
+
+    @classmethod
+    def choose(cls, condition_number, target_digits=TARGET_DIGITS, input_roundoff=0.0):
+        if math.isinf(condition_number):
+            return cls(condition_number, NumericMode(NumericMode.FRACTION), 0.0)
+        if condition_number * input_roundoff >= 1:
+            return cls(condition_number, NumericMode(NumericMode.FRACTION), condition_number * input_roundoff)
+
+        lost_digits = max(0, int(math.ceil(math.log10(max(condition_number, 1.0)))))
+        precision = target_digits + lost_digits + cls.GUARD_DIGITS
+        if precision <= cls.FLOAT_DIGITS:
+            mode = NumericMode(NumericMode.FLOAT)
+        else:
+            tolerance = max(10.0 ** -(lost_digits + target_digits // 2), cls.INPUT_NOISE_UNITS * input_roundoff)
+            mode = NumericMode(NumericMode.DECIMAL, max(precision, NumericMode.DEFAULT_PRECISION), tolerance)
+
+        return cls(condition_number, mode, condition_number * max(mode.unit_roundoff(), input_roundoff))
+
+    #Estimates condition numbers with factorize(mode), starting in float64 and doubling the digits
+    #while the factorization itself is too inaccurate to be believed, then picks the mode
+    @classmethod
+    def estimate(cls, factorize, target_digits=TARGET_DIGITS, input_roundoff=0.0):
+        mode = estimation_mode()
+        while True:
+            condition_number = factorize(mode).condition_number()
+            if (math.isinf(condition_number) or condition_number * mode.unit_roundoff() < cls.TRUSTED_ERROR_BOUND or
+                    mode.precision >= cls.MAX_PRECISION):
+                return cls.choose(condition_number, target_digits, input_roundoff)
+            digits = NumericMode.DEFAULT_PRECISION if mode.kind == NumericMode.FLOAT else 2 * mode.precision
+            mode = estimation_mode(min(digits, cls.MAX_PRECISION))
+
+    def __str__(self):
+        return 'Condition number ~{:.3g}, {}, relative error bound {:.3g}'.format(
+            self.condition_number, self.mode, self.error_bound)
@@ -0,0 +1,216 @@
+from numeric import NumericMode
+import instrumentation
+from vector import Vector, axpy_in_place, scale_in_place
+
+
+class AugmentedMatrix(object):
+
+    ALL_ROWS_MUST_BE_IN_SAME_DIM_MSG = 'All rows should live in the same dimension'
+
+    #The whole system lives in one row-major buffer, each row holding its coefficients followed by its constant term.
+    #The numeric mode decides the element type of the buffer; the default is 30 digit Decimal.
+    def __init__(self, num_rows, num_variables, data, mode=None):
+        self.num_rows = num_rows
+        self.num_variables = num_variables
+        self.stride = num_variables + 1
+        self.data = data
+        self.mode = mode or NumericMode()
+        self.tolerance = self.mode.tolerance
+        self.zero = self.mode.zero
+        self.one = self.mode.one
+
+    @classmethod
+    def from_planes(cls, planes, mode=None):
+        mode = mode or NumericMode()
+        num_variables = planes[0].dimension
+
+        values = []
+        for p in planes:
+            if p.dimension != num_variables:
+                raise Exception(cls.ALL_ROWS_MUST_BE_IN_SAME_DIM_MSG)
+            values.extend(p.normal_vector.coordinates)
+            values.append(p.constant_term)
+
+        return cls(len(planes), num_variables, mode.buffer(values), mode)
+
+    #Planes (or lines/hyperplanes) are only built when the caller asks for them
+    def to_planes(self, row_class):
+        planes = []
+        for i in range(self.num_rows):
+            planes.append(row_class(normal_vector=Vector(self.row_coefficients(i), mode=self.mode),
+                                    constant_term=self.constant_term(i)))
+        return planes
+
+    def copy(self):
+        return AugmentedMatrix(self.num_rows, self.num_variables, self.data[:], self.mode)
+
+    def row_coefficients(self, row):
+        start = row * self.stride
+        return self.data[start:start + self.num_variables]
+
+    def constant_term(self, row):
+        return self.data[row * self.stride + self.num_variables]
+
+    def is_near_zero(self, value):
+        if not self.tolerance:
+            return not value
+        return abs(value) < self.tolerance
+
+    def swap_rows(self, row1, row2):
+        instrumentation.count(instrumentation.SWAP_ROWS)
+        s = self.stride
+        a = row1 * s
+        b = row2 * s
+        self.data[a:a + s], self.data[b:b + s] = self.data[b:b + s], self.data[a:a + s]
+
+    #Scales the entries of a row from column start onwards
+    def multiply_row(self, coefficient, row, start=0):
+        instrumentation.count(instrumentation.MULTIPLY_ROW)
+        scale_in_place(coefficient, self.data, row * self.stride + start, self.stride - start)
+
+    #Adds coefficient times row_to_add onto row_to_be_added_to, from column start onwards
+    def add_multiple_of_row(self, coefficient, row_to_add, row_to_be_added_to, start=0):
+        instrumentation.count(instrumentation.ADD_MULTIPLE_OF_ROW)
+        axpy_in_place(coefficient, self.data, row_to_add * self.stride + start,
+                      row_to_be_added_to * self.stride + start, self.stride - start)
+
+    def first_nonzero_index(self, row):
+        base = row * self.stride
+        for k in range(self.num_variables):
+            if not self.is_near_zero(self.data[base + k]):
+                return k
+        return -1
+
+    #Partial pivoting: the row at or below row with the largest coefficient in col, -1 if they are all zero
+    def find_pivot_row(self, row, col):
+        data = self.data
+        s = self.stride
+        k = max(range(row, self.num_rows), key=lambda i: abs(data[i * s + col]))
+        if self.is_near_zero(data[k * s + col]):
+            return -1
+        return k
+
+    def clear_coefficients_below(self, row, col):
+        data = self.data
+        s = self.stride
+        beta = data[row * s + col]
+
+        for k in range(row + 1, self.num_rows):
+            gamma = data[k * s + col]
+            if not gamma:
+                continue
+            self.add_multiple_of_row(-gamma / beta, row, k, start=col + 1)
+            data[k * s + col] = self.zero
+
+    def clear_coefficients_above(self, row, col):
+        data = self.data
+        s = self.stride
+
+        for k in range(row)[::-1]:
+            alpha = data[k * s + col]
+            if not alpha:
+                continue
+            self.add_multiple_of_row(-alpha, row, k, start=col + 1)
+            data[k * s + col] = self.zero
+
+    def scale_row_to_make_coefficient_equal_one(self, row, col):
+        beta = self.one / self.data[row * self.stride + col]
+        self.multiply_row(beta, row, start=col + 1)
+        self.data[row * self.stride + col] = self.one
+
+    def compute_triangular_form(self):
+        with self.mode.context():
+            return self.do_compute_triangular_form()
+
+    def do_compute_triangular_form(self):
+        with instrumentation.phase(instrumentation.TRIANGULAR_PHASE):
+            return self.eliminate_below_pivots()
+
+    def eliminate_below_pivots(self):
+        num_variables = self.num_variables
+
+        j = 0
+        for i in range(self.num_rows):
+            while j < num_variables:
+                pivot_row = self.find_pivot_row(i, j)
+                if pivot_row < 0:
+                    j += 1
+                    continue
+                if pivot_row != i:
+                    self.swap_rows(i, pivot_row)
+
+                self.clear_coefficients_below(i, j)
+                j += 1
+                break
+
+        return self
+
+    def compute_rref(self):
+        with self.mode.context(), instrumentation.phase(instrumentation.RREF_PHASE):
+            return self.do_compute_rref()
+
+    def do_compute_rref(self):
+        self.do_compute_triangular_form()
+        pivot_indices = self.indices_of_first_nonzero_terms_in_each_row()
+
+        for i in range(self.num_rows)[::-1]:
+            j = pivot_indices[i]
+            if j < 0:
+                continue
+            self.scale_row_to_make_coefficient_equal_one(i, j)
+            self.clear_coefficients_above(i, j)
+
+        return self
+
+    def indices_of_first_nonzero_terms_in_each_row(self):
+        return [self.first_nonzero_index(i) for i in range(self.num_rows)]
+
+    #A row reading 0 = k with k nonzero
+    def has_contradictory_equation(self):
+        for i in range(self.num_rows):
+            if self.first_nonzero_index(i) < 0 and not self.is_near_zero(self.constant_term(i)):
+                return True
+        return False
+
+    #The following two methods expect the matrix to already be in reduced row echelon form
+    def extract_direction_vectors_for_parametrization(self):
+        num_variables = self.num_variables
+        pivot_indices = self.indices_of_first_nonzero_terms_in_each_row()
+        free_variable_indices = sorted(set(range(num_variables)) - set(pivot_indices))
+
+        direction_vectors = []
+
+        for free_var in free_variable_indices:
+            vector_coords = [self.zero] * num_variables
+            vector_coords[free_var] = self.one
+            for i in range(self.num_rows):
+                pivot_var = pivot_indices[i]
+                if pivot_var < 0:
+                    break
+                vector_coords[pivot_var] = -self.data[i * self.stride + free_var]
+            direction_vectors.append(vector_coords)
+
+        return direction_vectors
+
+    def extract_basepoint_for_parametrization(self):
+        pivot_indices = self.indices_of_first_nonzero_terms_in_each_row()
+
+        basepoint_coords = [self.zero] * self.num_variables
+
+        for i in range(self.num_rows):
+            pivot_var = pivot_indices[i]
+            if pivot_var < 0:
+                break
+            basepoint_coords[pivot_var] = self.constant_term(i)
+
+        return basepoint_coords
+
+    def __len__(self):
+        return self.num_rows
+
+    def __str__(self):
+        ret = 'Augmented Matrix:\n'
+        temp = ['Row {}: {} | {}'.format(i+1, self.row_coefficients(i), self.constant_term(i))
+                for i in range(self.num_rows)]
+        ret += '\n'.join(temp)
+        return ret
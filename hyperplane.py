@@ -1,16 +1,21 @@
-from decimal import Decimal, getcontext
+from decimal import Decimal
 
+import instrumentation
+from parallel_index import ParallelIndex
 from vector import Vector
-
-getcontext().prec = 30
+from numeric import is_near_zero
 
 
 class Hyperplane(object):
 
     NO_NONZERO_ELTS_FOUND_MSG = 'No nonzero elements found'
 
-    def __init__(self, normal_vector=None, constant_term=None):
-        self.dimension = 3
+    def __init__(self, normal_vector=None, constant_term=None, dimension=None):
+        instrumentation.count(instrumentation.PLANE_ALLOCATIONS)
+        #The dimension follows the normal vector so systems are not limited to three variables
+        if dimension is None:
+            dimension = normal_vector.dimension if normal_vector else 3
+        self.dimension = dimension
 
         if not normal_vector:
             all_zeros = [0]*self.dimension
@@ -19,7 +24,9 @@ class Hyperplane(object):
 
         if not constant_term:
             constant_term = Decimal(0)
-        self.constant_term = Decimal(constant_term)
+        #A normal vector with a numeric mode carries that mode over to the constant term and basepoint
+        mode = normal_vector.mode
+        self.constant_term = Decimal(constant_term) if mode is None else mode.convert(constant_term)
 
         self.set_basepoint()
 
@@ -30,6 +37,7 @@ class Hyperplane(object):
         return n1.is_parallel(n2)
 
     def set_basepoint(self):
+        instrumentation.count(instrumentation.BASEPOINT_COMPUTATIONS)
         try:
             n = self.normal_vector
             c = self.constant_term
@@ -38,8 +46,13 @@ class Hyperplane(object):
             initial_index = Hyperplane.first_nonzero_index(n.coordinates)
             initial_coefficient = n.coordinates[initial_index]
 
-            basepoint_coords[initial_index] = float(c)/float(initial_coefficient)
-            self.basepoint = Vector(basepoint_coords)
+            mode = n.mode
+            if mode is None:
+                basepoint_coords[initial_index] = float(c)/float(initial_coefficient)
+            else:
+                with mode.context():
+                    basepoint_coords[initial_index] = mode.convert(c) / mode.convert(initial_coefficient)
+            self.basepoint = Vector(basepoint_coords, mode=mode)
 
         except Exception as e:
             if str(e) == Hyperplane.NO_NONZERO_ELTS_FOUND_MSG:
@@ -53,7 +66,7 @@ class Hyperplane(object):
                 return False
             else:
                 diff = self.constant_term - v.constant_term
-                return MyDecimal(diff).is_near_zero()
+                return is_near_zero(diff)
         elif v.normal_vector.is_zero():
             return False
 
@@ -66,6 +79,12 @@ class Hyperplane(object):
 
         return difference_between_points.is_orthogonal(self.normal_vector)
 
+    #The same for every scaling of the equation, so equal hyperplanes share it (up to rounding at multiples of tolerance).
+    #This is the key for memoizing by content: __eq__ allows for tolerance, which no hash can agree with,
+    #so Hyperplanes themselves are left unhashable
+    def fingerprint(self, tolerance=ParallelIndex.DEFAULT_TOLERANCE):
+        return ParallelIndex(tolerance).keys(self)[1]
+
     def __str__(self):
 
         num_decimal_places = 3
@@ -115,7 +134,7 @@ class Hyperplane(object):
     @staticmethod
     def first_nonzero_index(iterable):
         for k, item in enumerate(iterable):
-            if not MyDecimal(item).is_near_zero():
+            if not is_near_zero(item):
                 return k
         raise Exception(Hyperplane.NO_NONZERO_ELTS_FOUND_MSG)
 
@@ -0,0 +1,255 @@
+from numeric import NumericMode
+from vector import axpy
+from elimination import AugmentedMatrix
+from linsys import LinearSystem
+
+
+class ReducedRow(object):
+
+    #coefficients and constant_term are one row of the reduced form and combination maps
+    #equation ids to the multiples of those equations that add up to this row
+    def __init__(self, coefficients, constant_term, combination, pivot):
+        self.coefficients = coefficients
+        self.constant_term = constant_term
+        self.combination = combination
+        self.pivot = pivot
+
+
+class IncrementalLinearSystem(object):
+
+    ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG = LinearSystem.ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG
+    UNKNOWN_EQUATION_MSG = 'No equation with that id is part of the system'
+
+    #Keeps the system in reduced row echelon form while equations are added and removed.
+    #Appending reduces only the new equation against the current pivots, O(n * rank).
+    #Removing downdates the rows built from that equation and then retries the equations
+    #that had been redundant, without going back over the whole system.
+    def __init__(self, dimension, row_class=None, mode=None):
+        self.dimension = dimension
+        self.row_class = row_class
+        self.mode = NumericMode.resolve(mode) or NumericMode()
+        self.equations = {}
+        self.rows = []
+        self.dependent = {}
+        self.next_id = 0
+
+    @classmethod
+    def from_linear_system(cls, system):
+        incremental = cls(system.dimension, system.row_class(), system.mode)
+        for p in system.planes:
+            incremental.add_equation(p)
+        return incremental
+
+    def __len__(self):
+        return len(self.equations)
+
+    def is_near_zero(self, value):
+        return self.mode.is_near_zero(value)
+
+    #Returns an id that can later be passed to remove_equation
+    def add_equation(self, plane):
+        if plane.dimension != self.dimension:
+            raise Exception(self.ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG)
+        if self.row_class is None:
+            self.row_class = type(plane)
+
+        equation_id = self.next_id
+        self.next_id += 1
+
+        convert = self.mode.convert
+        coefficients = [convert(c) for c in plane.normal_vector.coordinates]
+        constant_term = convert(plane.constant_term)
+        self.equations[equation_id] = (coefficients, constant_term)
+
+        with self.mode.context():
+            self.insert(coefficients[:], constant_term, {equation_id: self.mode.one}, equation_id)
+
+        return equation_id
+
+    def remove_equation(self, equation_id):
+        if equation_id not in self.equations:
+            raise Exception(self.UNKNOWN_EQUATION_MSG)
+        del self.equations[equation_id]
+
+        #A redundant equation never contributed to the reduced rows
+        if equation_id in self.dependent:
+            del self.dependent[equation_id]
+            return
+
+        with self.mode.context():
+            self.downdate(equation_id)
+
+    #Reduces a row against every pivot and keeps it if anything is left over
+    def insert(self, coefficients, constant_term, combination, equation_id):
+        coefficients, constant_term, combination = self.reduce(coefficients, constant_term, combination)
+
+        pivot = -1
+        for j, c in enumerate(coefficients):
+            if not self.is_near_zero(c):
+                pivot = j
+                break
+
+        if pivot < 0:
+            self.dependent[equation_id] = constant_term
+            return
+
+        beta = self.mode.one / coefficients[pivot]
+        coefficients = [c * beta for c in coefficients]
+        coefficients[pivot] = self.mode.one
+        new_row = ReducedRow(coefficients, constant_term * beta,
+                             dict((k, v * beta) for k, v in combination.items()), pivot)
+
+        #Clear the new pivot column from the rows that are already there
+        for row in self.rows:
+            alpha = row.coefficients[pivot]
+            if alpha:
+                self.add_multiple_of_row(-alpha, new_row, row)
+                row.coefficients[pivot] = self.mode.zero
+
+        self.rows.append(new_row)
+
+    def reduce(self, coefficients, constant_term, combination):
+        for row in self.rows:
+            alpha = coefficients[row.pivot]
+            if not alpha:
+                continue
+            coefficients = axpy(-alpha, row.coefficients, coefficients)
+            coefficients[row.pivot] = self.mode.zero
+            constant_term = constant_term - alpha * row.constant_term
+            for k, v in row.combination.items():
+                combination[k] = combination.get(k, self.mode.zero) - alpha * v
+        return coefficients, constant_term, combination
+
+    def add_multiple_of_row(self, coefficient, row_to_add, row_to_be_added_to):
+        row_to_be_added_to.coefficients = axpy(coefficient, row_to_add.coefficients, row_to_be_added_to.coefficients)
+        row_to_be_added_to.constant_term = row_to_be_added_to.constant_term + coefficient * row_to_add.constant_term
+        combination = row_to_be_added_to.combination
+        for k, v in row_to_add.combination.items():
+            combination[k] = combination.get(k, self.mode.zero) + coefficient * v
+
+    def downdate(self, equation_id):
+        involved = [row for row in self.rows if row.combination.get(equation_id)]
+
+        #Pick the row leaning hardest on the equation and use it to cancel the equation out of the others
+        if involved:
+            removed = max(involved, key=lambda row: abs(row.combination[equation_id]))
+            gamma = removed.combination[equation_id]
+            for row in involved:
+                if row is not removed:
+                    self.add_multiple_of_row(-row.combination[equation_id] / gamma, removed, row)
+                    row.combination.pop(equation_id, None)
+            self.rows.remove(removed)
+
+        for row in self.rows:
+            row.combination.pop(equation_id, None)
+
+        #Equations that were redundant may now restore the rank
+        dependent = sorted(self.dependent)
+        self.dependent = {}
+        for k in dependent:
+            coefficients, constant_term = self.equations[k]
+            self.insert(coefficients[:], constant_term, {k: self.mode.one}, k)
+
+        self.canonicalize()
+
+    #Removing a pivot can leave a row whose first nonzero entry is left of its pivot;
+    #rebuilding from the reduced rows themselves restores the leading pivots in O(n * rank^2)
+    def canonicalize(self):
+        leading = True
+        for row in self.rows:
+            for j in range(row.pivot):
+                if not self.is_near_zero(row.coefficients[j]):
+                    leading = False
+                    break
+
+        if leading:
+            return
+
+        rows = self.rows
+        dependent = self.dependent
+        self.rows = []
+        for row in rows:
+            self.insert(row.coefficients, row.constant_term, row.combination, None)
+        self.dependent = dependent
+
+    def pivot_rows(self):
+        return sorted(self.rows, key=lambda row: row.pivot)
+
+    def has_contradictory_equation(self):
+        for constant_term in self.dependent.values():
+            if not self.is_near_zero(constant_term):
+                return True
+        return False
+
+    #The reduced rows followed by one 0 = k row per redundant equation, like compute_rref
+    def to_augmented_matrix(self):
+        values = []
+        for row in self.pivot_rows():
+            values.extend(row.coefficients)
+            values.append(row.constant_term)
+        for k in sorted(self.dependent):
+            values.extend([self.mode.zero] * self.dimension)
+            values.append(self.dependent[k])
+        return AugmentedMatrix(len(self.equations), self.dimension, self.mode.buffer(values), self.mode)
+
+    def compute_rref(self):
+        matrix = self.to_augmented_matrix()
+        return LinearSystem(matrix.to_planes(self.row_class), mode=self.mode)
+
+    def indices_of_first_nonzero_terms_in_each_row(self):
+        return [row.pivot for row in self.pivot_rows()] + [-1] * len(self.dependent)
+
+    def compute_solution(self):
+        if self.has_contradictory_equation():
+            return LinearSystem.NO_SOLUTIONS_MSG
+        return LinearSystem.parametrize_rref(self.to_augmented_matrix())
+
+    def __str__(self):
+        ret = 'Incremental Linear System:\n'
+        temp = ['Equation {}: {}'.format(i+1, p) for i, p in enumerate(self.compute_rref().planes)]
+        ret += '\n'.join(temp)
+        return ret
+
+
+def main():
+    from plane import Plane
+    from vector import Vector
+
+    p1 = Plane(normal_vector=Vector([0, 1, 1]), constant_term= 1)
+    p2 = Plane(normal_vector=Vector([1, -1, 1]), constant_term= 2)
+    p3 = Plane(normal_vector=Vector([1, 2, -5]), constant_term= 3)
+    p4 = Plane(normal_vector=Vector([1, 0, 2]), constant_term= 3)
+    s = IncrementalLinearSystem(3, mode=NumericMode.FRACTION)
+    a = s.add_equation(p1)
+    s.add_equation(p2)
+    b = s.add_equation(p4)
+    u = s.compute_solution()
+    s.add_equation(p3)
+    t = s.compute_solution()
+    full = LinearSystem([p1,p2,p3], mode=NumericMode.FRACTION).compute_solution()
+    if not (len(u.direction_vectors) == 1 and
+            t.basepoint == full.basepoint and t.direction_vectors == [] and
+            s.indices_of_first_nonzero_terms_in_each_row() == [0, 1, 2, -1]):
+        print('test case 1 failed')
+
+    s.remove_equation(a)
+    t = s.compute_solution()
+    full = LinearSystem([p2,p4,p3], mode=NumericMode.FRACTION).compute_solution()
+    s.remove_equation(b)
+    u = s.compute_solution()
+    rest = LinearSystem([p2,p3], mode=NumericMode.FRACTION)
+    if not (t.basepoint == full.basepoint and t.direction_vectors == [] and
+            u.basepoint == rest.compute_solution().basepoint and
+            u.direction_vectors == rest.compute_solution().direction_vectors and
+            s.compute_rref().planes == rest.compute_rref().planes):
+        print('test case 2 failed')
+
+    s.add_equation(Plane(normal_vector=Vector([2, -2, 2]), constant_term= 5))
+    if not (s.compute_solution() == LinearSystem.NO_SOLUTIONS_MSG and
+            LinearSystem([p2,p3,Plane(normal_vector=Vector([2, -2, 2]), constant_term= 5)],
+                         mode=NumericMode.FRACTION).compute_solution() == LinearSystem.NO_SOLUTIONS_MSG):
+        print('test case 3 failed')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import time
+from contextlib import contextmanager, nullcontext
+
+
+#Counter names
+SWAP_ROWS = 'swap_rows'
+MULTIPLY_ROW = 'multiply_row'
+ADD_MULTIPLE_OF_ROW = 'add_multiple_of_row'
+VECTOR_ALLOCATIONS = 'vector_allocations'
+PLANE_ALLOCATIONS = 'plane_allocations'
+BASEPOINT_COMPUTATIONS = 'basepoint_computations'
+DECIMAL_CONVERSIONS = 'decimal_conversions'
+
+#Phase names
+TRIANGULAR_PHASE = 'triangular'
+RREF_PHASE = 'rref'
+PARAMETRIZATION_PHASE = 'parametrization'
+
+#What callbacks are told about
+COUNTER_EVENT = 'counter'
+PHASE_EVENT = 'phase'
+
+#The Instrumentation collecting right now, or None. Every hook checks this first,
+#so while nothing is collecting a hook costs one attribute lookup and a comparison
+active = None
+
+NO_PHASE = nullcontext()
+
+
+def count(name, amount=1):
+    if active is not None:
+        active.count(name, amount)
+
+
+#Times a phase when something is collecting; the rest of the time it is a shared no-op context
+def phase(name):
+    if active is None:
+        return NO_PHASE
+    return active.phase(name)
+
+
+#`with collect(callbacks) as stats:` records everything run inside the block
+def collect(callbacks=None):
+    return Instrumentation(callbacks)
+
+
+class Instrumentation(object):
+
+    #Counters for row operations, allocations and conversions, plus wall time per phase, for
+    #everything run inside a `with Instrumentation() as stats:` block. Each callback is called
+    #as callback(event, name, value): once per finished phase with its seconds, and once per
+    #counter with its total when the block exits or publish() is called.
+    def __init__(self, callbacks=None):
+        self.callbacks = list(callbacks or [])
+        self.previous = None
+        self.reset()
+
+    def reset(self):
+        self.counters = {}
+        self.phase_seconds = {}
+        self.phase_calls = {}
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    #Nested phases are timed independently, so an rref phase includes its triangular phase
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + elapsed
+            self.phase_calls[name] = self.phase_calls.get(name, 0) + 1
+            for callback in self.callbacks:
+                callback(PHASE_EVENT, name, elapsed)
+
+    def publish(self):
+        for name in sorted(self.counters):
+            for callback in self.callbacks:
+                callback(COUNTER_EVENT, name, self.counters[name])
+
+    def snapshot(self):
+        return {
+            'counters': dict(self.counters),
+            'phase_seconds': dict(self.phase_seconds),
+            'phase_calls': dict(self.phase_calls),
+        }
+
+    def __enter__(self):
+        global active
+        self.previous = active
+        active = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global active
+        active = self.previous
+        self.previous = None
+        self.publish()
+        return False
+
+    def __str__(self):
+        lines = ['Instrumentation:']
+        lines += ['  {} = {}'.format(name, self.counters[name]) for name in sorted(self.counters)]
+        lines += ['  {} phase: {:.6f} s over {} calls'.format(name, self.phase_seconds[name], self.phase_calls[name])
+                  for name in sorted(self.phase_seconds)]
+        return '\n'.join(lines)
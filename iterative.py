@@ -0,0 +1,287 @@
+import math
+
+from numeric import NumericMode
+from vector import axpy, dot
+from elimination import AugmentedMatrix
+from lu import LUFactorization
+
+
+class ConvergenceStatistics(object):
+
+    #What a solve reports back: how many iterations it ran and how close it got
+    def __init__(self, method, iterations=0, residual_norm=None, converged=False, residual_history=None, **extra):
+        self.method = method
+        self.iterations = iterations
+        self.residual_norm = residual_norm
+        self.converged = converged
+        self.residual_history = residual_history if residual_history is not None else []
+        for name, value in extra.items():
+            setattr(self, name, value)
+
+    def __str__(self):
+        return 'Convergence statistics ({}): {} iterations, residual norm {}, converged = {}'.format(
+            self.method, self.iterations, self.residual_norm, self.converged)
+
+
+class IterativeSolver(object):
+
+    CONJUGATE_GRADIENT = 'cg'
+    JACOBI = 'jacobi'
+    GAUSS_SEIDEL = 'gauss-seidel'
+    GMRES = 'gmres'
+
+    METHODS = (CONJUGATE_GRADIENT, JACOBI, GAUSS_SEIDEL, GMRES)
+
+    MATRIX_MUST_BE_SQUARE_MSG = 'Iterative solvers need as many equations as variables'
+    ZERO_DIAGONAL_MSG = 'Jacobi and Gauss-Seidel need a nonzero diagonal'
+
+    #matrix is a CSRMatrix and constant_terms a list of floats. Iteration stops once
+    #||b - Ax|| <= tolerance * ||b|| or after max_iterations (default: 10 times the size)
+    def __init__(self, matrix, constant_terms, tolerance=1e-10, max_iterations=None):
+        if matrix.num_rows != matrix.num_columns:
+            raise Exception(self.MATRIX_MUST_BE_SQUARE_MSG)
+
+        self.matrix = matrix
+        self.constant_terms = constant_terms
+        self.size = matrix.num_rows
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations or 10 * max(self.size, 1)
+
+    #options go to the chosen method, e.g. restart for gmres
+    def solve(self, method, initial_guess=None, **options):
+        solvers = {
+            self.CONJUGATE_GRADIENT: self.conjugate_gradient,
+            self.JACOBI: self.jacobi,
+            self.GAUSS_SEIDEL: self.gauss_seidel,
+            self.GMRES: self.gmres,
+        }
+        return solvers[method](initial_guess, **options)
+
+    def start(self, initial_guess):
+        if initial_guess is None:
+            return [0.0] * self.size
+        return [float(c) for c in initial_guess]
+
+    def residual(self, x):
+        return [b - ax for b, ax in zip(self.constant_terms, self.matrix.matvec(x))]
+
+    def threshold(self):
+        return self.tolerance * max(math.sqrt(dot(self.constant_terms, self.constant_terms)), 1e-300)
+
+    #Symmetric positive definite systems only
+    def conjugate_gradient(self, initial_guess=None):
+        x = self.start(initial_guess)
+        r = self.residual(x)
+        p = r[:]
+        rs = dot(r, r)
+        threshold = self.threshold()
+        statistics = ConvergenceStatistics(self.CONJUGATE_GRADIENT, residual_norm=math.sqrt(rs))
+
+        while statistics.residual_norm > threshold and statistics.iterations < self.max_iterations:
+            ap = self.matrix.matvec(p)
+            curvature = dot(p, ap)
+            if curvature == 0:
+                break
+            alpha = rs / curvature
+            x = axpy(alpha, p, x)
+            r = axpy(-alpha, ap, r)
+            rs_new = dot(r, r)
+            p = axpy(rs_new / rs, p, r)
+            rs = rs_new
+
+            statistics.iterations += 1
+            statistics.residual_norm = math.sqrt(rs)
+            statistics.residual_history.append(statistics.residual_norm)
+
+        statistics.converged = statistics.residual_norm <= threshold
+        return x, statistics
+
+    def diagonal(self):
+        diagonal = self.matrix.diagonal()
+        if not all(diagonal):
+            raise Exception(self.ZERO_DIAGONAL_MSG)
+        return diagonal
+
+    def jacobi(self, initial_guess=None):
+        return self.relax(self.JACOBI, initial_guess)
+
+    def gauss_seidel(self, initial_guess=None):
+        return self.relax(self.GAUSS_SEIDEL, initial_guess)
+
+    #Jacobi builds each sweep from the previous iterate, Gauss-Seidel uses new values as soon as they exist
+    def relax(self, method, initial_guess):
+        diagonal = self.diagonal()
+        matrix = self.matrix
+        b = self.constant_terms
+        x = self.start(initial_guess)
+        threshold = self.threshold()
+
+        r = self.residual(x)
+        statistics = ConvergenceStatistics(method, residual_norm=math.sqrt(dot(r, r)))
+
+        while statistics.residual_norm > threshold and statistics.iterations < self.max_iterations:
+            source = x[:] if method == self.JACOBI else x
+            for i in range(self.size):
+                total = b[i]
+                for j, v in matrix.row(i):
+                    if j != i:
+                        total -= v * source[j]
+                x[i] = total / diagonal[i]
+
+            r = self.residual(x)
+            statistics.iterations += 1
+            statistics.residual_norm = math.sqrt(dot(r, r))
+            statistics.residual_history.append(statistics.residual_norm)
+
+        statistics.converged = statistics.residual_norm <= threshold
+        return x, statistics
+
+    #Restarted GMRES with modified Gram-Schmidt Arnoldi and Givens rotations
+    def gmres(self, initial_guess=None, restart=30):
+        n = self.size
+        x = self.start(initial_guess)
+        threshold = self.threshold()
+        restart = max(1, min(restart, n))
+
+        r = self.residual(x)
+        beta = math.sqrt(dot(r, r))
+        statistics = ConvergenceStatistics(self.GMRES, residual_norm=beta)
+
+        while beta > threshold and statistics.iterations < self.max_iterations:
+            basis = [[c / beta for c in r]]
+            hessenberg = []
+            cosines = []
+            sines = []
+            g = [beta]
+
+            k = 0
+            while k < restart and statistics.iterations < self.max_iterations:
+                w = self.matrix.matvec(basis[k])
+                column = []
+                for v in basis:
+                    h = dot(w, v)
+                    w = axpy(-h, v, w)
+                    column.append(h)
+                norm = math.sqrt(dot(w, w))
+                column.append(norm)
+
+                for i in range(k):
+                    a = cosines[i] * column[i] + sines[i] * column[i + 1]
+                    column[i + 1] = -sines[i] * column[i] + cosines[i] * column[i + 1]
+                    column[i] = a
+
+                denominator = math.hypot(column[k], column[k + 1])
+                if denominator == 0:
+                    cosines.append(1.0)
+                    sines.append(0.0)
+                else:
+                    cosines.append(column[k] / denominator)
+                    sines.append(column[k + 1] / denominator)
+                column[k] = denominator
+                column[k + 1] = 0.0
+                g.append(-sines[k] * g[k])
+                g[k] = cosines[k] * g[k]
+
+                hessenberg.append(column)
+                k += 1
+                statistics.iterations += 1
+                statistics.residual_norm = abs(g[k])
+                statistics.residual_history.append(statistics.residual_norm)
+
+                if statistics.residual_norm <= threshold or norm == 0:
+                    break
+                basis.append([c / norm for c in w])
+
+            #Back substitution on the triangularized Hessenberg matrix, then update x
+            y = [0.0] * k
+            for i in range(k - 1, -1, -1):
+                total = g[i]
+                for j in range(i + 1, k):
+                    total -= hessenberg[j][i] * y[j]
+                y[i] = total / hessenberg[i][i] if hessenberg[i][i] else 0.0
+            for i in range(k):
+                x = axpy(y[i], basis[i], x)
+
+            r = self.residual(x)
+            beta = math.sqrt(dot(r, r))
+            statistics.residual_norm = beta
+            if k == 0:
+                break
+
+        statistics.converged = statistics.residual_norm <= threshold
+        return x, statistics
+
+
+class IterativeRefinement(object):
+
+    REFINEMENT = 'refinement'
+
+    #Extra digits a decimal residual needs beyond the answer, since b - Ax cancels the leading ones
+    GUARD_DIGITS = 2
+
+    #Mixed-precision solve of a square AugmentedMatrix in decimal or fraction mode: the coefficients are
+    #factored once in float64, then each step computes the residual b - Ax in the matrix's own mode and
+    #adds the float64 correction solved from it. Steps stop once a correction changes x by less than
+    #10^-digits relative to x (default: the decimal precision less GUARD_DIGITS, or 30 for fractions),
+    #when corrections stop shrinking, or after max_steps.
+    def __init__(self, matrix, digits=None, max_steps=10):
+        if matrix.num_rows != matrix.num_variables:
+            raise Exception(LUFactorization.MATRIX_MUST_BE_SQUARE_MSG)
+
+        self.matrix = matrix
+        self.mode = matrix.mode
+        self.size = matrix.num_variables
+        if digits is None:
+            if self.mode.kind == NumericMode.DECIMAL:
+                digits = self.mode.precision - self.GUARD_DIGITS
+            else:
+                digits = NumericMode.DEFAULT_PRECISION
+        self.digits = digits
+        self.max_steps = max_steps
+
+        float_mode = NumericMode(NumericMode.FLOAT)
+        low = AugmentedMatrix(matrix.num_rows, matrix.num_variables, float_mode.buffer(matrix.data), float_mode)
+        self.factorization = LUFactorization.from_augmented_matrix(low)
+        if self.factorization.rank < self.size:
+            raise Exception(LUFactorization.SINGULAR_MATRIX_MSG)
+
+    def residual(self, x):
+        matrix = self.matrix
+        zero = self.mode.zero
+        return [matrix.constant_term(i) - dot(matrix.row_coefficients(i), x, zero) for i in range(self.size)]
+
+    def solve(self):
+        with self.mode.context():
+            return self.do_solve()
+
+    def do_solve(self):
+        convert = self.mode.convert
+        b = [float(self.matrix.constant_term(i)) for i in range(self.size)]
+        x = [convert(c) for c in self.factorization.solve(b)]
+        target = self.mode.convert(10) ** -self.digits
+
+        statistics = ConvergenceStatistics(self.REFINEMENT, digits=self.digits)
+        previous = None
+
+        while statistics.iterations < self.max_steps:
+            r = self.residual(x)
+            statistics.residual_norm = max(abs(c) for c in r)
+            statistics.residual_history.append(statistics.residual_norm)
+            if not statistics.residual_norm:
+                statistics.converged = True
+                break
+
+            correction = [convert(c) for c in self.factorization.solve([float(c) for c in r])]
+            x = [a + d for a, d in zip(x, correction)]
+            statistics.iterations += 1
+
+            change = max(abs(d) for d in correction)
+            if change <= target * max(max(abs(c) for c in x), self.mode.one):
+                statistics.converged = True
+                break
+            if previous is not None and change >= previous:
+                break
+            previous = change
+
+        statistics.refinement_steps = statistics.iterations
+        return x, statistics
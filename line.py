@@ -1,8 +1,9 @@
-from decimal import Decimal, getcontext
+from decimal import Decimal
 
+import instrumentation
+from parallel_index import ParallelIndex
 from vector import Vector
-
-getcontext().prec = 30
+from numeric import is_near_zero
 
 
 class Line(object):
@@ -10,6 +11,7 @@ class Line(object):
     NO_NONZERO_ELTS_FOUND_MSG = 'No nonzero elements found'
 
     def __init__(self, normal_vector=None, constant_term=None):
+        instrumentation.count(instrumentation.PLANE_ALLOCATIONS)
         self.dimension = 2
 
         if not normal_vector:
@@ -19,7 +21,9 @@ class Line(object):
 
         if not constant_term:
             constant_term = Decimal(0)
-        self.constant_term = Decimal(constant_term)
+        #A normal vector with a numeric mode carries that mode over to the constant term and basepoint
+        mode = normal_vector.mode
+        self.constant_term = Decimal(constant_term) if mode is None else mode.convert(constant_term)
 
         self.set_basepoint()
 
@@ -32,6 +36,7 @@ class Line(object):
     
     #Setting basepoint by setting an index to 0 (0, k/B) or (k/A, 0)
     def set_basepoint(self):
+        instrumentation.count(instrumentation.BASEPOINT_COMPUTATIONS)
         try:
             n = self.normal_vector
             c = self.constant_term
@@ -40,8 +45,13 @@ class Line(object):
             initial_index = Line.first_nonzero_index(n.coordinates)
             initial_coefficient = n.coordinates[initial_index]
 
-            basepoint_coords[initial_index] = float(c)/initial_coefficient
-            self.basepoint = Vector(basepoint_coords)
+            mode = n.mode
+            if mode is None:
+                basepoint_coords[initial_index] = float(c)/initial_coefficient
+            else:
+                with mode.context():
+                    basepoint_coords[initial_index] = mode.convert(c) / mode.convert(initial_coefficient)
+            self.basepoint = Vector(basepoint_coords, mode=mode)
 
         except Exception as e:
             if str(e) == Line.NO_NONZERO_ELTS_FOUND_MSG:
@@ -64,18 +74,29 @@ class Line(object):
         if self.is_parallel(v):
             return None
         else:
+            #Constant terms of lines with a numeric mode are already in that mode's number type
+            mode = self.normal_vector.mode
+            k1 = float(self.constant_term) if mode is None else self.constant_term
+            k2 = float(v.constant_term) if mode is None else mode.convert(v.constant_term)
+
             # X = (Dk1 - Bk2) / (AD - BC)
-            x_numerator = (v.normal_vector.coordinates[1] * float(self.constant_term)) - (self.normal_vector.coordinates[1] * float(v.constant_term))
+            x_numerator = (v.normal_vector.coordinates[1] * k1) - (self.normal_vector.coordinates[1] * k2)
             x_denominator = (self.normal_vector.coordinates[0] * v.normal_vector.coordinates[1]) - (self.normal_vector.coordinates[1] * v.normal_vector.coordinates[0])
             x = x_numerator/x_denominator
 
             # Y = (-Ck1 + Ak2) / (AD - BC)
-            y_numerator = (-v.normal_vector.coordinates[0] * float(self.constant_term)) + (self.normal_vector.coordinates[0] * float(v.constant_term))
+            y_numerator = (-v.normal_vector.coordinates[0] * k1) + (self.normal_vector.coordinates[0] * k2)
             y_denominator = (self.normal_vector.coordinates[0] * v.normal_vector.coordinates[1]) - (self.normal_vector.coordinates[1] * v.normal_vector.coordinates[0])
             y = y_numerator/y_denominator
-            return(Vector([x,y]))
+            return(Vector([x,y], mode=mode))
         
 
+    #The same for every scaling of the equation, so equal lines share it (up to rounding at multiples of tolerance).
+    #This is the key for memoizing by content: __eq__ allows for tolerance, which no hash can agree with,
+    #so Lines themselves are left unhashable
+    def fingerprint(self, tolerance=ParallelIndex.DEFAULT_TOLERANCE):
+        return ParallelIndex(tolerance).keys(self)[1]
+
     def __str__(self):
 
         num_decimal_places = 3
@@ -125,7 +146,7 @@ class Line(object):
     @staticmethod
     def first_nonzero_index(iterable):
         for k, item in enumerate(iterable):
-            if not MyDecimal(item).is_near_zero():
+            if not is_near_zero(item):
                 return k
         raise Exception(Line.NO_NONZERO_ELTS_FOUND_MSG)
 
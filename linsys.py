@@ -1,10 +1,24 @@
-from decimal import Decimal, getcontext
-from copy import deepcopy
+from decimal import Decimal
+from fractions import Fraction
+from functools import partial
+import hashlib
 
-from vector import Vector
+import instrumentation
+from vector import Vector, axpy, scale
 from plane import Plane
-
-getcontext().prec = 30
+from line import Line
+from hyperplane import Hyperplane
+from elimination import AugmentedMatrix
+from lu import LUFactorization
+from bareiss import BareissMatrix
+from sparse import SparseAugmentedMatrix
+from numeric import NumericMode
+from parallel import parallel_rref
+from iterative import IterativeSolver, IterativeRefinement
+from cache import SolutionCache
+from qr import QRFactorization
+from conditioning import ConditionEstimate, input_unit_roundoff
+from structured import SystemStructure, StructuredSolver
 
 
 class LinearSystem(object):
@@ -12,8 +26,28 @@ class LinearSystem(object):
     ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG = 'All planes in the system should live in the same dimension'
     NO_SOLUTIONS_MSG = 'No solutions'
     INF_SOLUTIONS_MSG = 'Infinitely many solutions'
-
-    def __init__(self, planes):
+    UNKNOWN_BACKEND_MSG = 'The backend must be either dense or sparse'
+
+    UNKNOWN_METHOD_MSG = 'Unknown solution method'
+
+    DENSE_BACKEND = 'dense'
+    SPARSE_BACKEND = 'sparse'
+
+    ELIMINATION_METHOD = 'elimination'
+    PARALLEL_METHOD = 'parallel'
+    CONJUGATE_GRADIENT_METHOD = IterativeSolver.CONJUGATE_GRADIENT
+    JACOBI_METHOD = IterativeSolver.JACOBI
+    GAUSS_SEIDEL_METHOD = IterativeSolver.GAUSS_SEIDEL
+    GMRES_METHOD = IterativeSolver.GMRES
+    LEAST_SQUARES_METHOD = 'least-squares'
+    REFINEMENT_METHOD = IterativeRefinement.REFINEMENT
+    BAREISS_METHOD = 'bareiss'
+
+    #mode picks the arithmetic used by every elimination and solve: float, decimal (the default) or fraction.
+    #'auto' picks one of them from an estimate of the condition number of a square system (see
+    #ConditionEstimate), which then rides along with every solution; other systems get the default.
+    #With a SolutionCache, compute_rref and compute_solution reuse earlier results for the same system
+    def __init__(self, planes, backend=DENSE_BACKEND, mode=None, cache=None):
         try:
             d = planes[0].dimension
             for p in planes:
@@ -21,28 +55,98 @@ class LinearSystem(object):
 
             self.planes = planes
             self.dimension = d
+            self.factorizations = {}
+            self.detected_structure = None
 
         except AssertionError:
             raise Exception(self.ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG)
 
+        if backend not in (self.DENSE_BACKEND, self.SPARSE_BACKEND):
+            raise Exception(self.UNKNOWN_BACKEND_MSG)
+        self.backend = backend
+        self.auto_mode = mode == NumericMode.AUTO
+        self.conditioning = None
+        if self.auto_mode:
+            mode = self.choose_mode()
+        self.mode = NumericMode.resolve(mode) or NumericMode()
+        self.cache = cache
+
+    #Estimates the conditioning again and returns the mode it calls for; run whenever an 'auto' system changes
+    def choose_mode(self):
+        self.conditioning = self.estimate_conditioning()
+        return self.conditioning.mode if self.conditioning else None
+
+    #Condition number of a square system and the numeric mode it calls for; see ConditionEstimate.estimate.
+    #Float coefficients are only known to a double's precision, which bounds the tolerance it may pick
+    def estimate_conditioning(self):
+        if len(self.planes) != self.dimension:
+            return None
+        input_roundoff = input_unit_roundoff(c for p in self.planes for c in p.normal_vector.coordinates)
+        return ConditionEstimate.estimate(
+            lambda mode: LUFactorization.from_augmented_matrix(AugmentedMatrix.from_planes(self.planes, mode)),
+            input_roundoff=input_roundoff)
+
+    #Content address of the system: a hash of its numeric mode and of its equations converted exactly to
+    #that mode, so two systems only share a fingerprint when every solver is handed the same numbers.
+    #Nothing is rounded, since any rounding step would merge values on either side of the zero tolerance.
+    #In fraction mode the canonical fingerprint also ignores the order and scaling of the equations, which
+    #cannot change an exact reduced row echelon form; in the other modes they change the rounding, so both
+    #fingerprints keep the equations as given.
+    def fingerprint(self, canonical=True):
+        convert = self.mode.convert
+        rows = []
+        for p in self.planes:
+            row = [convert(c) for c in p.normal_vector.coordinates] + [convert(p.constant_term)]
+            if canonical and self.mode.kind == NumericMode.FRACTION:
+                leading = next((c for c in row[:-1] if c), None)
+                if leading is not None:
+                    row = [c / leading for c in row]
+            rows.append(repr(row))
+        if canonical and self.mode.kind == NumericMode.FRACTION:
+            rows.sort()
+
+        content = repr((self.dimension, self.mode.kind, self.mode.precision, self.mode.tolerance, rows))
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    #Row order and scaling can change the 0 = k rows of an inconsistent system, so RREFs use the plain fingerprint
     def compute_rref(self):
-        tf = self.compute_triangular_form()
+        if self.cache is None:
+            return self.do_compute_rref()
+        key = ('rref', self.fingerprint(canonical=False))
+        rref = self.cache.get_or_compute(key, self.do_compute_rref)
 
-        num_equations = len(tf)
-        pivot_indices = tf.indices_of_first_nonzero_terms_in_each_row()
+        #A fresh list of rows, so assigning to a row of the result leaves the cached copy alone
+        return LinearSystem(list(rref.planes), backend=self.backend, mode=self.mode, cache=self.cache)
+
+    def do_compute_rref(self):
+        matrix = self.elimination_matrix()
+        matrix.compute_rref()
+        return self.from_augmented_matrix(matrix)
+
+    #Elimination runs in place on a single coefficient buffer instead of on Plane objects
+    def to_augmented_matrix(self):
+        return AugmentedMatrix.from_planes(self.planes, self.mode)
+
+    #Only the nonzero coefficients are stored, so elimination cost follows the nonzero count
+    def to_sparse_matrix(self):
+        return SparseAugmentedMatrix.from_planes(self.planes, self.mode)
+
+    def elimination_matrix(self):
+        if self.backend == self.SPARSE_BACKEND:
+            return self.to_sparse_matrix()
+        return self.to_augmented_matrix()
+
+    def from_augmented_matrix(self, matrix):
+        return LinearSystem(matrix.to_planes(self.row_class()), backend=self.backend, mode=self.mode, cache=self.cache)
+
+    #Rows are rebuilt with the same class (Plane, Line or Hyperplane) the system was given
+    def row_class(self):
+        return type(self.planes[0])
 
-        for i in range(num_equations)[::-1]:
-            j = pivot_indices[i]
-            if j < 0:
-                continue
-            tf.scale_row_to_make_coefficient_equal_one(i, j)
-            tf.clear_coefficents_above(i, j)
-        
-        return tf
-    
     def scale_row_to_make_coefficient_equal_one(self, row, col):
         n = self[row].normal_vector
-        beta = Decimal(1.0) / n.coordinates[col]
+        with self.mode.context():
+            beta = self.mode.one / self.mode.convert(n.coordinates[col])
         self.multiply_coefficient_and_row(beta, row)
 
     def clear_coefficents_above(self, row, col):
@@ -52,79 +156,106 @@ class LinearSystem(object):
             self.add_multiple_times_row_to_row(alpha, row, k)
 
     def swap_rows(self, row1, row2):
+        instrumentation.count(instrumentation.SWAP_ROWS)
         self[row1], self[row2] = self[row2], self[row1]
         pass
 
+    #The row operations work in the system's mode and rebuild rows with its row class
     def multiply_coefficient_and_row(self, coefficient, row):
+        instrumentation.count(instrumentation.MULTIPLY_ROW)
+        convert = self.mode.convert
         n = self[row].normal_vector
         k = self[row].constant_term
-        
-        new_normal_vector = n.times_scalar(coefficient)
-        new_constant_term = k * coefficient
 
-        self[row] = Plane(normal_vector=new_normal_vector, constant_term=new_constant_term)
+        with self.mode.context():
+            coefficient = convert(coefficient)
+            new_normal_vector = Vector(scale(coefficient, [convert(c) for c in n.coordinates]), mode=self.mode)
+            new_constant_term = convert(k) * coefficient
 
-        pass
+        self[row] = self.row_class()(normal_vector=new_normal_vector, constant_term=new_constant_term)
 
     def add_multiple_times_row_to_row(self, coefficient, row_to_add, row_to_be_added_to):
+        instrumentation.count(instrumentation.ADD_MULTIPLE_OF_ROW)
+        convert = self.mode.convert
         n1 = self[row_to_add].normal_vector
         n2 = self[row_to_be_added_to].normal_vector
         k1 = self[row_to_add].constant_term
         k2 = self[row_to_be_added_to].constant_term
 
-        new_normal_vector = n1.times_scalar(coefficient).plus(n2)
-        new_constant_term = (k1 * coefficient) + k2
-
-        self[row_to_be_added_to] = Plane(normal_vector=new_normal_vector, constant_term=new_constant_term)
+        with self.mode.context():
+            coefficient = convert(coefficient)
+            new_normal_vector = Vector(axpy(coefficient, [convert(c) for c in n1.coordinates],
+                                            [convert(c) for c in n2.coordinates]), mode=self.mode)
+            new_constant_term = (convert(k1) * coefficient) + convert(k2)
 
-        pass
+        self[row_to_be_added_to] = self.row_class()(normal_vector=new_normal_vector, constant_term=new_constant_term)
     
+    #Partial pivoting: brings up the row at or below row with the largest coefficient in col
     def swap_with_row_below_for_nonzero_coefficent_if_able(self, row, col):
         num_equations = len(self)
 
-        for k in range(row+1, num_equations):
-            coefficient = MyDecimal(self[k].normal_vector.coordinates[col])
-            if not coefficient.is_near_zero():
-                self.swap_rows(row, k)
-                return True
-            
+        k = max(range(row, num_equations), key=lambda i: abs(self[i].normal_vector.coordinates[col]))
+        if self.mode.is_near_zero(self.mode.convert(self[k].normal_vector.coordinates[col])):
             return False
+        if k != row:
+            self.swap_rows(row, k)
+        return True
 
     def clear_coefficents_below(self, row, col):
         num_equations = len(self)
-        beta = MyDecimal(self[row].normal_vector.coordinates[col])
+        beta = self.mode.convert(self[row].normal_vector.coordinates[col])
 
         for k in range(row+1, num_equations):
             n = self[k].normal_vector
-            gamma = n.coordinates[col]
-            alpha = -gamma/beta
+            gamma = self.mode.convert(n.coordinates[col])
+            with self.mode.context():
+                alpha = -gamma/beta
             self.add_multiple_times_row_to_row(alpha, row, k)
 
-    def compute_triangular_form(self):
-        system = deepcopy(self)
-
-        num_equations = len(system)
-        num_variables = system.dimension
-
-        j=0
-        for i in range(num_equations):
-            while j < num_variables:
-                c = MyDecimal(system[i].normal_vector.coordinates[j])
-                if c.is_near_zero():
-                    swap_succeeded = system.swap_with_row_below_for_nonzero_coefficent_if_able(i, j)
-                    if not swap_succeeded:
-                        j += 1
-                        continue
-                
-                system.clear_coefficents_below(i, j)
-                j += 1
-                break
+    #Bandwidths, triangularity and diagonal dominance of the coefficients, found once and kept until a row
+    #changes; matrix saves rebuilding the augmented matrix when the caller already has it
+    def structure(self, matrix=None):
+        if self.detected_structure is None:
+            self.detected_structure = SystemStructure(matrix or self.to_augmented_matrix())
+        return self.detected_structure
 
-        return system
+    #Triangular systems are already in triangular form, and banded ones are reduced within their band;
+    #a banded reduction that runs out of pivots is finished by generic elimination
+    def compute_triangular_form(self):
+        matrix = self.to_augmented_matrix()
+        structure = self.structure(matrix)
+
+        if structure.kind in (SystemStructure.DIAGONAL, SystemStructure.UPPER_TRIANGULAR):
+            if not any(matrix.is_near_zero(matrix.data[i * matrix.stride + i]) for i in range(matrix.num_rows)):
+                return self.from_augmented_matrix(matrix)
+        if structure.kind in (SystemStructure.TRIDIAGONAL, SystemStructure.BANDED):
+            if StructuredSolver(matrix, structure).banded_triangular_form():
+                return self.from_augmented_matrix(matrix)
+
+        matrix.compute_triangular_form()
+        return self.from_augmented_matrix(matrix)
+
+    #method picks the solver; options are passed on to it
+    def compute_solution(self, method=ELIMINATION_METHOD, **options):
+        if self.cache is None:
+            return self.do_compute_solution(method, **options)
+
+        #Only the exact reduced row echelon form is the same for every order and scaling of the equations;
+        #least squares and the iterative solvers depend on both. Options that cannot be hashed (a warm start,
+        #say) are never looked up
+        canonical = method in (self.ELIMINATION_METHOD, self.BAREISS_METHOD)
+        key = ('solution', method, tuple(sorted(options.items())), self.fingerprint(canonical=canonical))
+        try:
+            hash(key)
+        except TypeError:
+            return self.do_compute_solution(method, **options)
+        return self.cache.get_or_compute(key, lambda: self.do_compute_solution(method, **options))
 
-    def compute_solution(self):
+    def do_compute_solution(self, method=ELIMINATION_METHOD, **options):
         try:
-            return self.do_gaussian_elimination_and_parametrize_solution()
+            solution = self.solver_for_method(method)(**options)
+            solution.conditioning = self.conditioning
+            return solution
         
         except Exception as e:
             if str(e) == self.NO_SOLUTIONS_MSG or str(e) == self.INF_SOLUTIONS_MSG:
@@ -132,48 +263,169 @@ class LinearSystem(object):
             else:
                 raise e
 
-    def do_gaussian_elimination_and_parametrize_solution(self):
-        rref = self.compute_rref()
+    def solver_for_method(self, method):
+        solvers = {
+            self.ELIMINATION_METHOD: self.do_gaussian_elimination_and_parametrize_solution,
+            self.PARALLEL_METHOD: self.do_parallel_elimination_and_parametrize_solution,
+            self.LEAST_SQUARES_METHOD: self.do_least_squares_and_parametrize_solution,
+            self.REFINEMENT_METHOD: self.do_iterative_refinement,
+            self.BAREISS_METHOD: self.do_bareiss_elimination_and_parametrize_solution,
+        }
+        for m in IterativeSolver.METHODS:
+            solvers[m] = partial(self.do_iterative_solution, m)
+        if method not in solvers:
+            raise Exception(self.UNKNOWN_METHOD_MSG)
+        return solvers[method]
+
+    #Blocked elimination with the trailing updates spread over a process pool; always runs in float64
+    def compute_rref_in_parallel(self, processes=None, block_size=32):
+        matrix = AugmentedMatrix.from_planes(self.planes, NumericMode(NumericMode.FLOAT))
+        parallel_rref(matrix, processes, block_size)
+        return self.from_augmented_matrix(matrix)
+
+    def do_parallel_elimination_and_parametrize_solution(self, processes=None, block_size=32):
+        matrix = AugmentedMatrix.from_planes(self.planes, NumericMode(NumericMode.FLOAT))
+        parallel_rref(matrix, processes, block_size)
+
+        if matrix.has_contradictory_equation():
+            raise Exception(self.NO_SOLUTIONS_MSG)
+
+        return self.parametrize_rref(matrix)
+
+    #Iterative solvers work in float64 on the CSR form of the coefficients and need a square system.
+    #initial_guess may be a Vector, a list of coordinates or the Parametrization of an earlier solve;
+    #the returned Parametrization carries the ConvergenceStatistics of the run
+    def do_iterative_solution(self, method, initial_guess=None, tolerance=1e-10, max_iterations=None, **options):
+        matrix, constant_terms = self.to_sparse_matrix().to_csr()
+        solver = IterativeSolver(matrix, constant_terms, tolerance, max_iterations)
+
+        if isinstance(initial_guess, Parametrization):
+            initial_guess = initial_guess.basepoint
+        if isinstance(initial_guess, Vector):
+            initial_guess = initial_guess.coordinates
+
+        x, statistics = solver.solve(method, initial_guess, **options)
+        return Parametrization(Vector(x, mode=NumericMode(NumericMode.FLOAT)), [], statistics)
+
+    #Decimal- or fraction-grade unique solutions at close to float64 cost; see IterativeRefinement.
+    #Systems without a unique solution go through elimination in the system's mode instead
+    def do_iterative_refinement(self, digits=None, max_steps=10):
+        matrix = self.to_augmented_matrix()
+        if matrix.num_rows != matrix.num_variables or self.mode.kind == NumericMode.FLOAT:
+            return self.do_gaussian_elimination_and_parametrize_solution()
 
-        rref.raise_exception_if_contradictory_equation()
+        try:
+            refinement = IterativeRefinement(matrix, digits, max_steps)
+        except Exception as e:
+            if str(e) != LUFactorization.SINGULAR_MATRIX_MSG:
+                raise e
+            return self.do_gaussian_elimination_and_parametrize_solution()
 
-        direction_vectors = rref.extract_direction_vectors_for_parametrization()
-        basepoint = rref.extract_basepoint_for_parametrization()
+        x, statistics = refinement.solve()
+        return Parametrization(Vector(x, mode=self.mode), [], statistics)
 
-        return Parametrization(basepoint, direction_vectors)
+    #Minimum-residual solution of an inconsistent (e.g. overdetermined, noisy) system via Householder QR.
+    #Column pivoting also handles rank-deficient systems, whose minimizers are parametrized like compute_solution's
+    def do_least_squares_and_parametrize_solution(self, pivoting=True):
+        matrix = self.to_augmented_matrix()
+        factorization = QRFactorization.from_augmented_matrix(matrix, pivoting)
+        constant_terms = [matrix.constant_term(i) for i in range(matrix.num_rows)]
+        basepoint, direction_vectors, residual_norm = factorization.least_squares(constant_terms)
 
-    def extract_direction_vectors_for_parametrization(self):
-        num_variables = self.dimension
-        pivot_indices = self.indices_of_first_nonzero_terms_in_each_row()
-        free_variable_indices = set(range(num_variables)) - set(pivot_indices)
+        return Parametrization(Vector(basepoint, mode=self.mode),
+                               [Vector(v, mode=self.mode) for v in direction_vectors],
+                               residual_norm=residual_norm)
 
-        direction_vectors = []
+    #One LU factorization per pivoting strategy is computed and then shared by every solve, rank,
+    #determinant, inverse, nullspace and column space query until a row of the system changes
+    def factorize(self, pivoting=LUFactorization.PARTIAL_PIVOTING):
+        if pivoting not in self.factorizations:
+            self.factorizations[pivoting] = LUFactorization.from_augmented_matrix(self.to_augmented_matrix(), pivoting)
+        return self.factorizations[pivoting]
 
-        for free_var in free_variable_indices:
-            vector_coords = [0] * num_variables
-            vector_coords[free_var] = 1
-            for i, p in enumerate(self.planes):
-                pivot_var = pivot_indices[i]
-                if pivot_var < 0:
-                    break
-                vector_coords[pivot_var] = -p.normal_vector[free_var]
-            direction_vectors.append(Vector(vector_coords))
+    #Rank of the coefficient matrix
+    def rank(self, pivoting=LUFactorization.PARTIAL_PIVOTING):
+        return self.factorize(pivoting).rank
 
-        return direction_vectors
+    def determinant(self, pivoting=LUFactorization.PARTIAL_PIVOTING):
+        return self.factorize(pivoting).determinant()
 
-    def extract_basepoint_for_parametrization(self):
-        num_variables = self.dimension
-        pivot_indices = self.indices_of_first_nonzero_terms_in_each_row()
+    #Rows of the inverse of the coefficient matrix
+    def inverse(self, pivoting=LUFactorization.PARTIAL_PIVOTING):
+        return [Vector(row, mode=self.mode) for row in self.factorize(pivoting).inverse()]
+
+    #Estimated 1-norm condition number of the coefficient matrix, reusing the cached factorization
+    def condition_number(self, pivoting=LUFactorization.PARTIAL_PIVOTING):
+        return self.factorize(pivoting).condition_number()
+
+    #A basis of the solutions of the homogeneous system
+    def nullspace(self, pivoting=LUFactorization.PARTIAL_PIVOTING):
+        return [Vector(v, mode=self.mode) for v in self.factorize(pivoting).nullspace()]
+
+    #A basis made of the coefficient matrix's own pivot columns
+    def column_space(self, pivoting=LUFactorization.PARTIAL_PIVOTING):
+        columns = self.factorize(pivoting).pivot_columns()
+        return [Vector([p.normal_vector.coordinates[j] for p in self.planes], mode=self.mode) for j in columns]
+
+    def solve_for_constant_terms(self, constant_terms):
+        return Vector(self.factorize().solve(constant_terms), mode=self.mode)
+
+    def solve_for_many_constant_terms(self, columns):
+        return [Vector(x, mode=self.mode) for x in self.factorize().solve_many(columns)]
+
+    #Exact elimination on integers whatever the system's mode; see BareissMatrix. Rank and consistency
+    #are decided without a tolerance, and the parametrization is in fraction mode
+    def do_bareiss_elimination_and_parametrize_solution(self):
+        matrix = BareissMatrix.from_planes(self.planes).compute_rref().to_augmented_matrix()
+
+        if matrix.has_contradictory_equation():
+            raise Exception(self.NO_SOLUTIONS_MSG)
 
-        basepoint_coords = [0] * num_variables
+        return self.parametrize_rref(matrix)
 
-        for i, p in enumerate(self.planes):
-            pivot_var = pivot_indices[i]
-            if pivot_var < 0:
-                break
-            basepoint_coords[pivot_var] = p.constant_term
+    #Square systems with a triangular or banded structure are solved by a StructuredSolver on a copy of the
+    #augmented matrix; when it finds no unique solution the untouched original goes through generic
+    #elimination, which tells none from infinitely many
+    def do_gaussian_elimination_and_parametrize_solution(self):
+        if self.backend == self.DENSE_BACKEND:
+            matrix = self.to_augmented_matrix()
+            structure = self.structure(matrix)
+            if structure.is_structured():
+                try:
+                    x = StructuredSolver(matrix.copy(), structure).solve()
+                    return Parametrization(Vector(x, mode=self.mode), [])
+                except Exception as e:
+                    if str(e) != LUFactorization.SINGULAR_MATRIX_MSG:
+                        raise e
+            return LinearSystem.solve_elimination_matrix(matrix)
+
+        return LinearSystem.solve_elimination_matrix(self.elimination_matrix())
+
+    #Works on either an AugmentedMatrix or a SparseAugmentedMatrix
+    @staticmethod
+    def solve_elimination_matrix(matrix):
+        matrix.compute_rref()
+
+        if matrix.has_contradictory_equation():
+            raise Exception(LinearSystem.NO_SOLUTIONS_MSG)
+
+        return LinearSystem.parametrize_rref(matrix)
+
+    @staticmethod
+    def parametrize_rref(matrix):
+        with instrumentation.phase(instrumentation.PARAMETRIZATION_PHASE):
+            direction_vectors = [Vector(v, mode=matrix.mode) for v in matrix.extract_direction_vectors_for_parametrization()]
+            basepoint = Vector(matrix.extract_basepoint_for_parametrization(), mode=matrix.mode)
+
+        return Parametrization(basepoint, direction_vectors)
 
-        return Vector(basepoint_coords)
+    def extract_direction_vectors_for_parametrization(self):
+        matrix = self.to_augmented_matrix()
+        return [Vector(v, mode=self.mode) for v in matrix.extract_direction_vectors_for_parametrization()]
+
+    def extract_basepoint_for_parametrization(self):
+        matrix = self.to_augmented_matrix()
+        return Vector(matrix.extract_basepoint_for_parametrization(), mode=self.mode)
 
     def raise_exception_if_contradictory_equation(self):
         for p in self.planes:
@@ -183,8 +435,7 @@ class LinearSystem(object):
             except Exception as e:
                 if str(e) == 'No nonzero elements found':
 
-                    constant_term = MyDecimal(p.constant_term)
-                    if not constant_term.is_near_zero():
+                    if not self.mode.is_near_zero(self.mode.convert(p.constant_term)):
                         raise Exception(self.NO_SOLUTIONS_MSG)
                 
                 else:
@@ -230,6 +481,10 @@ class LinearSystem(object):
         try:
             assert x.dimension == self.dimension
             self.planes[i] = x
+            self.factorizations = {}
+            self.detected_structure = None
+            if self.auto_mode:
+                self.mode = NumericMode.resolve(self.choose_mode()) or NumericMode()
 
         except AssertionError:
             raise Exception(self.ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG)
@@ -250,10 +505,15 @@ class Parametrization(object):
 
     BASEPT_AND_DIR_VECTORS_MUST_BE_IN_SAME_DIM_MSG = ('The basepoint and direction vectors should all live in the same dimension')
 
-    def __init__(self, basepoint, direction_vectors):
+    #statistics is set when the solution came from an iterative solver, residual_norm for least squares
+    #and conditioning (a ConditionEstimate) when the system picked its numeric mode automatically
+    def __init__(self, basepoint, direction_vectors, statistics=None, residual_norm=None, conditioning=None):
         
         self.basepoint = basepoint
         self.direction_vectors = direction_vectors
+        self.statistics = statistics
+        self.residual_norm = residual_norm
+        self.conditioning = conditioning
         self.dimension = self.basepoint.dimension
 
         try:
@@ -302,3 +562,196 @@ if not (r[0] == Plane(normal_vector=Vector([1, 0, 0]), constant_term= Decimal(23
         r[1] == Plane(normal_vector=Vector([0, 1, 0]), constant_term= Decimal(7)/Decimal(9)) and
         r[2] == Plane(normal_vector=Vector([0, 0, 1]), constant_term= Decimal(2)/Decimal(9))):
     print('test case 4 failed')
+
+p1 = Plane(normal_vector=Vector([1, 1, 1]), constant_term= 1)
+p2 = Plane(normal_vector=Vector([0, 1, 1]), constant_term= 2)
+s = LinearSystem([p1,p2])
+t = s.compute_solution()
+if not (t.basepoint == Vector([-1, 2, 0]) and
+        len(t.direction_vectors) == 1 and
+        t.direction_vectors[0] == Vector([0, -1, 1])):
+    print('test case 5 failed')
+
+p1 = Plane(normal_vector=Vector([0, 1, 1]), constant_term= 1)
+p2 = Plane(normal_vector=Vector([1, -1, 1]), constant_term= 2)
+p3 = Plane(normal_vector=Vector([1, 2, -5]), constant_term= 3)
+s = LinearSystem([p1,p2,p3])
+x, y = s.solve_for_many_constant_terms([[1, 2, 3], [0, 0, 9]])
+if not (x.minus(s.compute_solution().basepoint).is_zero() and
+        s.solve_for_constant_terms([0, 0, 9]) == y and
+        y.minus(Vector([2, 1, -1])).is_zero()):
+    print('test case 6 failed')
+
+p1 = Plane(normal_vector=Vector([0, 1, 1]), constant_term= 1)
+p2 = Plane(normal_vector=Vector([1, -1, 0]), constant_term= 2)
+p3 = Plane(normal_vector=Vector([1, 0, 1]), constant_term= 3)
+s = LinearSystem([p1,p2,p3], backend=LinearSystem.SPARSE_BACKEND)
+r = s.compute_rref()
+t = s.compute_solution()
+if not (r[0] == Plane(normal_vector=Vector([1, 0, 1]), constant_term= 3) and
+        r[1] == Plane(normal_vector=Vector([0, 1, 1]), constant_term= 1) and
+        r[2] == Plane() and
+        t.basepoint == Vector([3, 1, 0]) and
+        t.direction_vectors[0] == Vector([-1, -1, 1])):
+    print('test case 7 failed')
+
+p1 = Plane(normal_vector=Vector([0, 1, 1]), constant_term= 1)
+p2 = Plane(normal_vector=Vector([1, -1, 1]), constant_term= 2)
+p3 = Plane(normal_vector=Vector([1, 2, -5]), constant_term= 3)
+s = LinearSystem([p1,p2,p3], mode=NumericMode.FRACTION)
+t = s.compute_solution()
+u = LinearSystem([p1,p2,p3], mode=NumericMode.FLOAT).compute_solution()
+if not (t.basepoint.coordinates == (Fraction(23, 9), Fraction(7, 9), Fraction(2, 9)) and
+        u.basepoint.minus(t.basepoint).is_zero()):
+    print('test case 8 failed')
+
+p1 = Plane(normal_vector=Vector([4, 1, 0]), constant_term= 1)
+p2 = Plane(normal_vector=Vector([1, 3, -1]), constant_term= 2)
+p3 = Plane(normal_vector=Vector([0, -1, 5]), constant_term= 3)
+s = LinearSystem([p1,p2,p3])
+x = s.compute_solution().basepoint
+t = s.compute_solution(method=LinearSystem.CONJUGATE_GRADIENT_METHOD)
+u = s.compute_solution(method=LinearSystem.GAUSS_SEIDEL_METHOD, tolerance=1e-12)
+v = s.compute_solution(method=LinearSystem.GMRES_METHOD, initial_guess=t)
+if not (t.statistics.converged and u.statistics.converged and
+        x.minus(t.basepoint).is_zero() and
+        x.minus(u.basepoint).is_zero() and
+        v.statistics.iterations <= 1 and
+        x.minus(v.basepoint).is_zero()):
+    print('test case 9 failed')
+
+p1 = Plane(normal_vector=Vector([1, 0, 0]), constant_term= 1)
+p2 = Plane(normal_vector=Vector([1, 0, 0]), constant_term= 3)
+p3 = Plane(normal_vector=Vector([0, 1, 0]), constant_term= 2)
+p4 = Plane(normal_vector=Vector([0, 0, 1]), constant_term= 4)
+s = LinearSystem([p1,p2,p3,p4])
+t = s.compute_solution(method=LinearSystem.LEAST_SQUARES_METHOD)
+u = LinearSystem([p1,p2,p3]).compute_solution(method=LinearSystem.LEAST_SQUARES_METHOD)
+if not (s.compute_solution() == s.NO_SOLUTIONS_MSG and
+        t.basepoint.minus(Vector([2, 2, 4])).is_zero() and
+        abs(t.residual_norm - Decimal(2).sqrt()) < 1e-20 and
+        len(u.direction_vectors) == 1 and
+        u.direction_vectors[0].minus(Vector([0, 0, 1])).is_zero()):
+    print('test case 10 failed')
+
+p1 = Plane(normal_vector=Vector([2, 1, 1]), constant_term= 0)
+p2 = Plane(normal_vector=Vector([4, -6, 0]), constant_term= 0)
+p3 = Plane(normal_vector=Vector([-2, 7, 2]), constant_term= 0)
+s = LinearSystem([p1,p2,p3], mode=NumericMode.FRACTION)
+t = LinearSystem([p1,p2,Plane(normal_vector=Vector([6, -5, 1]), constant_term= 0)], mode=NumericMode.FRACTION)
+if not (s.rank() == 3 and s.determinant() == -16 and
+        s.determinant(pivoting='complete') == -16 and
+        s.inverse()[0].coordinates == (Fraction(3, 4), Fraction(-5, 16), Fraction(-3, 8)) and
+        s.nullspace() == [] and
+        t.rank() == 2 and t.determinant() == 0 and
+        t.nullspace() == [Vector([Fraction(-3, 8), Fraction(-1, 4), 1])] and
+        t.column_space() == [Vector([2, 4, 6]), Vector([1, -6, -5])]):
+    print('test case 11 failed')
+
+p1 = Plane(normal_vector=Vector([0, 1, 1]), constant_term= 1)
+p2 = Plane(normal_vector=Vector([1, -1, 1]), constant_term= 2)
+p3 = Plane(normal_vector=Vector([1, 2, -5]), constant_term= 3)
+s = LinearSystem([p1,p2,p3])
+t = s.compute_solution(method=LinearSystem.REFINEMENT_METHOD)
+u = LinearSystem([p1,p2,p3], mode=NumericMode.FRACTION).compute_solution(method=LinearSystem.REFINEMENT_METHOD)
+if not (t.statistics.converged and
+        t.basepoint.minus(s.compute_solution().basepoint).is_zero(tolerance=Decimal('1e-27')) and
+        abs(u.basepoint.coordinates[0] - Fraction(23, 9)) < Fraction(1, 10**29) and
+        len(LinearSystem([p1,p2]).compute_solution(method=LinearSystem.REFINEMENT_METHOD).direction_vectors) == 1):
+    print('test case 12 failed')
+
+p1 = Plane(normal_vector=Vector([2, 4, 6]), constant_term= 8)
+p2 = Plane(normal_vector=Vector([1, 2, 3]), constant_term= 4)
+p3 = Plane(normal_vector=Vector([Decimal('0.5'), 3, 1]), constant_term= Decimal('1.5'))
+t = LinearSystem([p1,p2,p3]).compute_solution(method=LinearSystem.BAREISS_METHOD)
+if not (t.basepoint.coordinates == (Fraction(9, 2), Fraction(-1, 4), 0) and
+        [v.coordinates for v in t.direction_vectors] == [(Fraction(-7, 2), Fraction(1, 4), 1)] and
+        LinearSystem([p1, Plane(normal_vector=Vector([1, 2, 3]), constant_term= 5)]).compute_solution(
+            method=LinearSystem.BAREISS_METHOD) == LinearSystem.NO_SOLUTIONS_MSG):
+    print('test case 13 failed')
+
+p1 = Plane(normal_vector=Vector([0, 1, 1]), constant_term= 1)
+p2 = Plane(normal_vector=Vector([1, -1, 1]), constant_term= 2)
+p3 = Plane(normal_vector=Vector([1, 2, -5]), constant_term= 3)
+s = LinearSystem([p1,p2,p3], mode=NumericMode.AUTO)
+h = [Plane(normal_vector=Vector([Fraction(1, i + j + 1) for j in range(3)]), constant_term= 1) for i in range(3)]
+t = LinearSystem(h, mode=NumericMode.FRACTION)
+if not (s.mode.kind == NumericMode.FLOAT and abs(s.conditioning.condition_number - Fraction(28, 3)) < 1e-9 and
+        s.compute_solution().conditioning.error_bound < 1e-14 and
+        abs(t.condition_number() - 748) < 1e-9 and
+        LinearSystem([p1, p1, p2], mode=NumericMode.AUTO).mode.kind == NumericMode.FRACTION):
+    print('test case 14 failed')
+
+p1 = Plane(normal_vector=Vector([2, -1, 0]), constant_term= 1)
+p2 = Plane(normal_vector=Vector([-1, 2, -1]), constant_term= 0)
+p3 = Plane(normal_vector=Vector([0, -1, 2]), constant_term= 1)
+s = LinearSystem([p1,p2,p3])
+t = LinearSystem([p1, Plane(normal_vector=Vector([0, 3, -1]), constant_term= 2), Plane(normal_vector=Vector([0, 0, 4]), constant_term= 4)])
+if not (s.structure().kind == SystemStructure.TRIDIAGONAL and s.structure().diagonally_dominant and
+        s.compute_solution().basepoint == Vector([1, 1, 1]) and
+        t.structure().kind == SystemStructure.UPPER_TRIANGULAR and
+        t.compute_solution().basepoint == Vector([1, 1, 1]) and
+        LinearSystem([p1, Plane(normal_vector=Vector([2, -1, 0]), constant_term= 2), p3]).compute_solution() ==
+        LinearSystem.NO_SOLUTIONS_MSG):
+    print('test case 15 failed')
+
+m = NumericMode(NumericMode.DECIMAL, 50)
+p1 = Plane(normal_vector=Vector([3, 1, 1], mode=m), constant_term= 1)
+if not (p1.basepoint.coordinates[0] == m.decimal_context.divide(Decimal(1), Decimal(3)) and
+        len(str(p1.basepoint.coordinates[0])) == 52):
+    print('test case 16 failed')
+
+h1 = Hyperplane(normal_vector=Vector([2, 4, 1, 0]), constant_term= 1)
+h2 = Hyperplane(normal_vector=Vector([1, 1, 0, 1]), constant_term= Decimal('0.5'))
+s = LinearSystem([h1,h2], mode=NumericMode.FLOAT)
+s.scale_row_to_make_coefficient_equal_one(0, 0)
+s.add_multiple_times_row_to_row(-1, 0, 1)
+s.swap_rows(0, 1)
+t = LinearSystem([Line(normal_vector=Vector([3, 1]), constant_term= 1), Line(normal_vector=Vector([1, 2]), constant_term= 0)],
+                 mode=NumericMode.FRACTION)
+t.scale_row_to_make_coefficient_equal_one(0, 0)
+t.clear_coefficents_below(0, 0)
+if not (type(s[0]) is Hyperplane and type(s[1]) is Hyperplane and
+        list(s[1].normal_vector.coordinates) == [1.0, 2.0, 0.5, 0.0] and s[1].constant_term == 0.5 and
+        list(s[0].normal_vector.coordinates) == [0.0, -1.0, -0.5, 1.0] and s[0].constant_term == 0.0 and
+        type(t[1]) is Line and t[0].constant_term == Fraction(1, 3) and
+        list(t[1].normal_vector.coordinates) == [0, Fraction(5, 3)] and t[1].constant_term == Fraction(-1, 3)):
+    print('test case 17 failed')
+
+p1 = Plane(normal_vector=Vector([0, 1, 1]), constant_term= 1)
+p2 = Plane(normal_vector=Vector([1, -1, 1]), constant_term= 2)
+p3 = Plane(normal_vector=Vector([1, 2, -5]), constant_term= 3)
+events = []
+with instrumentation.collect([lambda event, name, value: events.append((event, name))]) as stats:
+    LinearSystem([p1,p2,p3]).compute_solution()
+recorded = stats.snapshot()
+num_events = len(events)
+LinearSystem([p1,p2,p3]).compute_solution()
+if not (stats.counters.get(instrumentation.VECTOR_ALLOCATIONS, 0) > 0 and
+        stats.counters.get(instrumentation.ADD_MULTIPLE_OF_ROW, 0) > 0 and
+        stats.counters.get(instrumentation.SWAP_ROWS, 0) > 0 and
+        stats.phase_calls.get(instrumentation.RREF_PHASE) == 1 and
+        stats.phase_calls.get(instrumentation.PARAMETRIZATION_PHASE) == 1 and
+        (instrumentation.PHASE_EVENT, instrumentation.RREF_PHASE) in events and
+        (instrumentation.COUNTER_EVENT, instrumentation.ADD_MULTIPLE_OF_ROW) in events and
+        instrumentation.active is None and
+        stats.snapshot() == recorded and len(events) == num_events):
+    print('test case 18 failed')
+
+h1 = Hyperplane(normal_vector=Vector([0.1, 0.2, 0.3]), constant_term= 1)
+h2 = Hyperplane(normal_vector=Vector([0.3, 0.6, 0.9]), constant_term= 3)
+h3 = Hyperplane(normal_vector=Vector([1, 0, 1]), constant_term= 2)
+s = LinearSystem([h1,h2,h3], mode=NumericMode.AUTO)
+t = s.compute_solution()
+p1 = Plane(normal_vector=Vector([0, 1, 1]), constant_term= 1)
+p2 = Plane(normal_vector=Vector([1, -1, 1]), constant_term= 2)
+p3 = Plane(normal_vector=Vector([1, 2, -5]), constant_term= 3)
+u = LinearSystem([p1,p2,p3], mode=NumericMode.AUTO)
+before = u.conditioning
+u[2] = Plane(normal_vector=Vector([1, 0, 2]), constant_term= 3)
+if not (s.mode.kind == NumericMode.FRACTION and s.conditioning.error_bound >= 1 and
+        len(t.direction_vectors) == 1 and
+        t.basepoint == LinearSystem([h1,h2,h3], mode=NumericMode.FRACTION).compute_solution().basepoint and
+        before.mode.kind == NumericMode.FLOAT and u.conditioning is not before and
+        u.mode.kind == NumericMode.FRACTION and len(u.compute_solution().direction_vectors) == 1):
+    print('test case 19 failed')
@@ -0,0 +1,287 @@
+import instrumentation
+from conditioning import estimate_inverse_one_norm
+from numeric import NumericMode
+from vector import axpy_in_place
+
+
+class LUFactorization(object):
+
+    MATRIX_MUST_BE_SQUARE_MSG = 'Only square coefficient matrices have a determinant, an inverse or a unique solution'
+    SINGULAR_MATRIX_MSG = 'The coefficient matrix is singular'
+    CONSTANT_TERMS_MUST_MATCH_SIZE_MSG = 'There must be one constant term per equation'
+    UNKNOWN_PIVOTING_MSG = 'Pivoting must be either partial or complete'
+
+    PARTIAL_PIVOTING = 'partial'
+    COMPLETE_PIVOTING = 'complete'
+
+    #PAQ = LU for an m x n coefficient matrix, with L and U sharing one row-major buffer (the unit
+    #diagonal of L is implied). Partial pivoting takes the largest entry of the current column and
+    #moves columns without one to the back; complete pivoting takes the largest entry left anywhere.
+    #Either way the first rank columns of U form an upper triangular block with a nonzero diagonal.
+    def __init__(self, num_rows, num_columns, data, mode=None, pivoting=PARTIAL_PIVOTING):
+        if pivoting not in (self.PARTIAL_PIVOTING, self.COMPLETE_PIVOTING):
+            raise Exception(self.UNKNOWN_PIVOTING_MSG)
+
+        self.num_rows = num_rows
+        self.num_columns = num_columns
+        self.lu = data
+        self.mode = mode or NumericMode()
+        self.pivoting = pivoting
+        self.permutation = list(range(num_rows))
+        self.column_permutation = list(range(num_columns))
+        self.sign = 1
+        self.rank = 0
+        self.one_norm = self.column_sum_norm()
+        with self.mode.context():
+            self.factor()
+
+    @classmethod
+    def from_augmented_matrix(cls, matrix, pivoting=PARTIAL_PIVOTING):
+        data = matrix.mode.buffer([])
+        for i in range(matrix.num_rows):
+            data.extend(matrix.row_coefficients(i))
+
+        return cls(matrix.num_rows, matrix.num_variables, data, matrix.mode, pivoting)
+
+    def is_square(self):
+        return self.num_rows == self.num_columns
+
+    #Largest column sum of absolute values, taken before the buffer is overwritten by the factors
+    def column_sum_norm(self):
+        n = self.num_columns
+        lu = self.lu
+        if not n:
+            return 0.0
+        return max(sum(abs(float(lu[i * n + j])) for i in range(self.num_rows)) for j in range(n))
+
+    def swap_rows(self, row1, row2):
+        instrumentation.count(instrumentation.SWAP_ROWS)
+        n = self.num_columns
+        lu = self.lu
+        a = row1 * n
+        b = row2 * n
+        lu[a:a + n], lu[b:b + n] = lu[b:b + n], lu[a:a + n]
+        self.permutation[row1], self.permutation[row2] = self.permutation[row2], self.permutation[row1]
+        self.sign = -self.sign
+
+    def swap_columns(self, col1, col2):
+        n = self.num_columns
+        lu = self.lu
+        for i in range(self.num_rows):
+            lu[i * n + col1], lu[i * n + col2] = lu[i * n + col2], lu[i * n + col1]
+        perm = self.column_permutation
+        perm[col1], perm[col2] = perm[col2], perm[col1]
+        self.sign = -self.sign
+
+    #Moves a column without a pivot behind all the others, keeping their order
+    def move_column_to_back(self, col):
+        for k in range(col, self.num_columns - 1):
+            self.swap_columns(k, k + 1)
+
+    #Row and column of the largest entry in column col (partial) or in the remaining block (complete)
+    def find_pivot(self, step, col):
+        n = self.num_columns
+        lu = self.lu
+        rows = range(step, self.num_rows)
+        if self.pivoting == self.PARTIAL_PIVOTING:
+            return max(rows, key=lambda k: abs(lu[k * n + col])), col
+
+        best = (step, col)
+        largest = abs(lu[step * n + col])
+        for k in rows:
+            for j in range(col, n):
+                value = abs(lu[k * n + j])
+                if value > largest:
+                    largest = value
+                    best = (k, j)
+        return best
+
+    def factor(self):
+        m = self.num_rows
+        n = self.num_columns
+        lu = self.lu
+
+        step = 0
+        untried = n
+        while step < min(m, untried):
+            pivot_row, pivot_col = self.find_pivot(step, step)
+            if self.mode.is_near_zero(lu[pivot_row * n + pivot_col]):
+                if self.pivoting == self.COMPLETE_PIVOTING:
+                    break
+                self.move_column_to_back(step)
+                untried -= 1
+                continue
+
+            if pivot_row != step:
+                self.swap_rows(step, pivot_row)
+            if pivot_col != step:
+                self.swap_columns(step, pivot_col)
+
+            pivot = lu[step * n + step]
+            for k in range(step + 1, m):
+                gamma = lu[k * n + step]
+                if not gamma:
+                    continue
+                multiplier = gamma / pivot
+                lu[k * n + step] = multiplier
+                instrumentation.count(instrumentation.ADD_MULTIPLE_OF_ROW)
+                axpy_in_place(-multiplier, lu, step * n + step + 1, k * n + step + 1, n - step - 1)
+
+            step += 1
+
+        self.rank = step
+
+    def determinant(self):
+        if not self.is_square():
+            raise Exception(self.MATRIX_MUST_BE_SQUARE_MSG)
+        if self.rank < self.num_columns:
+            return self.mode.zero
+
+        n = self.num_columns
+        with self.mode.context():
+            determinant = self.mode.convert(self.sign)
+            for i in range(n):
+                determinant = determinant * self.lu[i * n + i]
+        return determinant
+
+    #Forward and back substitution, O(n^2) per right-hand side
+    def solve(self, constant_terms):
+        return self.solve_many([constant_terms])[0]
+
+    #Solves every column in one sweep over the factors so each row of L and U is read once
+    def solve_many(self, columns):
+        if not self.is_square():
+            raise Exception(self.MATRIX_MUST_BE_SQUARE_MSG)
+        if self.rank < self.num_columns:
+            raise Exception(self.SINGULAR_MATRIX_MSG)
+
+        with self.mode.context():
+            return self.do_solve_many(columns)
+
+    def do_solve_many(self, columns):
+        n = self.num_columns
+        lu = self.lu
+
+        for column in columns:
+            if len(column) != n:
+                raise Exception(self.CONSTANT_TERMS_MUST_MATCH_SIZE_MSG)
+
+        convert = self.mode.convert
+        solutions = [[convert(column[p]) for p in self.permutation] for column in columns]
+
+        for i in range(n):
+            row = i * n
+            for k in range(i):
+                multiplier = lu[row + k]
+                if not multiplier:
+                    continue
+                for x in solutions:
+                    x[i] = x[i] - multiplier * x[k]
+
+        for i in range(n)[::-1]:
+            row = i * n
+            pivot = lu[row + i]
+            for k in range(i + 1, n):
+                u = lu[row + k]
+                if not u:
+                    continue
+                for x in solutions:
+                    x[i] = x[i] - u * x[k]
+            for x in solutions:
+                x[i] = x[i] / pivot
+
+        #Undo the column permutation: entry i of the solution belongs to variable column_permutation[i]
+        if self.column_permutation != list(range(n)):
+            unpermuted = []
+            for x in solutions:
+                y = [None] * n
+                for i, j in enumerate(self.column_permutation):
+                    y[j] = x[i]
+                unpermuted.append(y)
+            solutions = unpermuted
+
+        return solutions
+
+    #Solves A^T z = b with the same factors: A^T = Q U^T L^T P
+    def solve_transpose(self, constant_terms):
+        if not self.is_square():
+            raise Exception(self.MATRIX_MUST_BE_SQUARE_MSG)
+        if self.rank < self.num_columns:
+            raise Exception(self.SINGULAR_MATRIX_MSG)
+        if len(constant_terms) != self.num_columns:
+            raise Exception(self.CONSTANT_TERMS_MUST_MATCH_SIZE_MSG)
+
+        with self.mode.context():
+            return self.do_solve_transpose(constant_terms)
+
+    def do_solve_transpose(self, constant_terms):
+        n = self.num_columns
+        lu = self.lu
+        convert = self.mode.convert
+        w = [convert(constant_terms[j]) for j in self.column_permutation]
+
+        for i in range(n):
+            total = w[i]
+            for k in range(i):
+                total = total - lu[k * n + i] * w[k]
+            w[i] = total / lu[i * n + i]
+
+        for i in range(n)[::-1]:
+            total = w[i]
+            for k in range(i + 1, n):
+                total = total - lu[k * n + i] * w[k]
+            w[i] = total
+
+        z = [None] * n
+        for i, p in enumerate(self.permutation):
+            z[p] = w[i]
+        return z
+
+    #Estimate of the 1-norm condition number ||A|| ||A^-1||, from a handful of solves with the existing
+    #factors (O(n^2) each); infinite for a singular matrix
+    def condition_number(self):
+        if not self.is_square():
+            raise Exception(self.MATRIX_MUST_BE_SQUARE_MSG)
+        if self.rank < self.num_columns:
+            return float('inf')
+
+        return self.one_norm * estimate_inverse_one_norm(self.solve, self.solve_transpose, self.num_columns)
+
+    #Rows of A^-1
+    def inverse(self):
+        n = self.num_columns
+        identity = [[self.mode.one if i == j else self.mode.zero for i in range(n)] for j in range(n)]
+        columns = self.solve_many(identity)
+        return [[columns[j][i] for j in range(n)] for i in range(n)]
+
+    #A basis of {x : Ax = 0}: one vector per non-pivot column, with that variable set to 1
+    def nullspace(self):
+        with self.mode.context():
+            return self.do_nullspace()
+
+    def do_nullspace(self):
+        n = self.num_columns
+        r = self.rank
+        lu = self.lu
+        zero = self.mode.zero
+        basis = []
+
+        for j in range(r, n):
+            y = [zero] * r
+            for i in range(r)[::-1]:
+                total = -lu[i * n + j]
+                for k in range(i + 1, r):
+                    total = total - lu[i * n + k] * y[k]
+                y[i] = total / lu[i * n + i]
+
+            x = [zero] * n
+            for i in range(r):
+                x[self.column_permutation[i]] = y[i]
+            x[self.column_permutation[j]] = self.mode.one
+            basis.append(x)
+
+        return basis
+
+    #Indices of the original columns that the factorization pivoted on, in increasing order
+    def pivot_columns(self):
+        return sorted(self.column_permutation[:self.rank])
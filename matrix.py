@@ -0,0 +1,356 @@
+from array import array
+
+from numeric import NumericMode
+from vector import Vector, axpy, dot
+from hyperplane import Hyperplane
+from linsys import LinearSystem
+
+
+class Matrix(object):
+
+    DIMENSIONS_MUST_MATCH_MSG = 'The number of columns of the left operand must match the rows or coordinates on the right'
+    ROWS_MUST_BE_IN_SAME_DIM_MSG = 'All rows should live in the same dimension'
+    CONSTANT_TERMS_MUST_MATCH_SIZE_MSG = 'There must be one constant term per row'
+
+    #Square tiles of this many rows and columns keep a block of each operand hot while it is reused
+    DEFAULT_BLOCK_SIZE = 64
+
+    #Strassen recursion stops once any dimension is this small; below it the tiled product is faster
+    STRASSEN_THRESHOLD = 128
+
+    #An m x n matrix over a flat buffer of the same kind Vector and AugmentedMatrix use: array('d') in float
+    #mode, a list of Decimals or Fractions otherwise. Entry (i, j) lives at
+    #offset + i * row_stride + j * column_stride, so transposes and blocks are views sharing the buffer;
+    #compact() gives a row-major copy only when one is needed.
+    def __init__(self, num_rows, num_columns, data, mode=None, row_stride=None, column_stride=1, offset=0):
+        self.num_rows = num_rows
+        self.num_columns = num_columns
+        self.data = data
+        self.mode = mode or NumericMode()
+        self.row_stride = num_columns if row_stride is None else row_stride
+        self.column_stride = column_stride
+        self.offset = offset
+
+    @classmethod
+    def from_rows(cls, rows, mode=None):
+        mode = NumericMode.resolve(mode) or NumericMode()
+        rows = [list(row) for row in rows]
+        num_columns = len(rows[0])
+
+        values = []
+        for row in rows:
+            if len(row) != num_columns:
+                raise Exception(cls.ROWS_MUST_BE_IN_SAME_DIM_MSG)
+            values.extend(row)
+
+        return cls(len(rows), num_columns, mode.buffer(values), mode)
+
+    #One row per vector; the mode of the first vector is kept unless another is asked for
+    @classmethod
+    def from_vectors(cls, vectors, mode=None):
+        mode = NumericMode.resolve(mode) or vectors[0].mode
+        return cls.from_rows([v.coordinates for v in vectors], mode)
+
+    @classmethod
+    def zeros(cls, num_rows, num_columns, mode=None):
+        mode = mode or NumericMode()
+        return cls(num_rows, num_columns, mode.buffer([mode.zero]) * (num_rows * num_columns), mode)
+
+    @classmethod
+    def identity(cls, size, mode=None):
+        matrix = cls.zeros(size, size, mode)
+        for i in range(size):
+            matrix.data[i * size + i] = matrix.mode.one
+        return matrix
+
+    #The coefficient rows of a LinearSystem, in its numeric mode
+    @classmethod
+    def from_linear_system(cls, system):
+        return cls.from_rows([p.normal_vector.coordinates for p in system.planes], system.mode)
+
+    #A LinearSystem with these rows as coefficients and the given constant terms (zeros by default)
+    def to_linear_system(self, constant_terms=None, row_class=Hyperplane, backend=LinearSystem.DENSE_BACKEND, cache=None):
+        if constant_terms is None:
+            constant_terms = [self.mode.zero] * self.num_rows
+        if len(constant_terms) != self.num_rows:
+            raise Exception(self.CONSTANT_TERMS_MUST_MATCH_SIZE_MSG)
+
+        planes = [row_class(normal_vector=Vector(self.row(i), mode=self.mode), constant_term=self.mode.convert(k))
+                  for i, k in enumerate(constant_terms)]
+        return LinearSystem(planes, backend=backend, mode=self.mode, cache=cache)
+
+    def index(self, row, col):
+        return self.offset + row * self.row_stride + col * self.column_stride
+
+    def __getitem__(self, position):
+        return self.data[self.index(*position)]
+
+    def __setitem__(self, position, value):
+        self.data[self.index(*position)] = self.mode.convert(value)
+
+    #Row-major with no gaps: the layout every product works on
+    def is_contiguous(self):
+        return (self.column_stride == 1 and self.row_stride == self.num_columns and self.offset == 0 and
+                len(self.data) == self.num_rows * self.num_columns)
+
+    def row(self, i):
+        start = self.offset + i * self.row_stride
+        if self.column_stride == 1:
+            return self.data[start:start + self.num_columns]
+        return self.data[start:start + self.num_columns * self.column_stride:self.column_stride]
+
+    def column(self, j):
+        return self.transpose().row(j)
+
+    def rows(self):
+        return [self.row(i) for i in range(self.num_rows)]
+
+    def row_vectors(self):
+        return [Vector(self.row(i), mode=self.mode) for i in range(self.num_rows)]
+
+    #A view: no entries are copied, and writes through either matrix show in both
+    def transpose(self):
+        return Matrix(self.num_columns, self.num_rows, self.data, self.mode,
+                      self.column_stride, self.row_stride, self.offset)
+
+    #A view of the rows x cols block whose top left entry is (row, col)
+    def block(self, row, col, rows, cols):
+        return Matrix(rows, cols, self.data, self.mode, self.row_stride, self.column_stride, self.index(row, col))
+
+    #This matrix if it is already row-major, otherwise a row-major copy of it
+    def compact(self):
+        if self.is_contiguous():
+            return self
+        return self.copy()
+
+    def copy(self):
+        buffer = self.mode.buffer([])
+        for i in range(self.num_rows):
+            buffer.extend(self.row(i))
+        return Matrix(self.num_rows, self.num_columns, buffer, self.mode)
+
+    def to_mode(self, mode):
+        if mode == self.mode:
+            return self
+        mode = NumericMode.resolve(mode)
+        values = []
+        for i in range(self.num_rows):
+            values.extend(self.row(i))
+        return Matrix(self.num_rows, self.num_columns, mode.buffer(values), mode)
+
+    def new_buffer(self, values):
+        if self.mode.kind == NumericMode.FLOAT:
+            return array('d', values)
+        return list(values)
+
+    def plus(self, other):
+        with self.mode.context():
+            return self.combine(other, lambda a, b: a + b)
+
+    def minus(self, other):
+        with self.mode.context():
+            return self.combine(other, lambda a, b: a - b)
+
+    def combine(self, other, operation):
+        other = other.to_mode(self.mode)
+        if self.num_rows != other.num_rows or self.num_columns != other.num_columns:
+            raise Exception(self.DIMENSIONS_MUST_MATCH_MSG)
+
+        values = []
+        for i in range(self.num_rows):
+            values.extend(map(operation, self.row(i), other.row(i)))
+        return Matrix(self.num_rows, self.num_columns, self.new_buffer(values), self.mode)
+
+    def times_scalar(self, scalar):
+        with self.mode.context():
+            c = self.mode.convert(scalar)
+            values = []
+            for i in range(self.num_rows):
+                values.extend([c * a for a in self.row(i)])
+            return Matrix(self.num_rows, self.num_columns, self.new_buffer(values), self.mode)
+
+    #This matrix times a Vector (or list of coordinates), as a Vector in this matrix's mode.
+    #Row-major matrices take one dot product per row; transposed views add up the rows of the matrix they
+    #view instead, so neither layout is copied.
+    def times_vector(self, v):
+        coordinates = v.coordinates if isinstance(v, Vector) else v
+        if len(coordinates) != self.num_columns:
+            raise Exception(self.DIMENSIONS_MUST_MATCH_MSG)
+
+        with self.mode.context():
+            x = [self.mode.convert(c) for c in coordinates]
+            if self.transpose().is_contiguous():
+                y = self.sum_of_columns(x)
+            else:
+                zero = self.mode.zero
+                y = [dot(self.row(i), x, zero) for i in range(self.num_rows)]
+        return Vector(y, mode=self.mode)
+
+    def sum_of_columns(self, x):
+        n = self.num_rows
+        data = self.data
+        y = [self.mode.zero] * n
+        for j, a in enumerate(x):
+            if a:
+                y = axpy(a, data[j * n:(j + 1) * n], y)
+        return y
+
+    #Matrix product in this matrix's mode, computed tile by tile: each block_size x block_size tile of the
+    #result takes the dot products of a band of rows of this matrix with a band of columns of other, so
+    #those columns stay in cache while every row of the band reuses them. Columns are read as the rows of
+    #other's transpose, which costs nothing when other is itself a transposed view. With strassen=True
+    #products whose dimensions are all above STRASSEN_THRESHOLD use Strassen's seven-product recursion.
+    def times_matrix(self, other, block_size=DEFAULT_BLOCK_SIZE, strassen=False):
+        if self.num_columns != other.num_rows:
+            raise Exception(self.DIMENSIONS_MUST_MATCH_MSG)
+
+        other = other.to_mode(self.mode)
+        with self.mode.context():
+            if strassen:
+                return self.compact().strassen(other.compact(), block_size)
+            return self.tiled_product(other, block_size)
+
+    def __matmul__(self, other):
+        if isinstance(other, Matrix):
+            return self.times_matrix(other)
+        return self.times_vector(other)
+
+    def tiled_product(self, other, block_size):
+        m = self.num_rows
+        n = other.num_columns
+        rows = self.rows()
+        columns = other.transpose().compact().rows()
+        zero = self.mode.zero
+        values = [zero] * (m * n)
+
+        for i0 in range(0, m, block_size):
+            for j0 in range(0, n, block_size):
+                tile = columns[j0:j0 + block_size]
+                for i in range(i0, min(m, i0 + block_size)):
+                    row = rows[i]
+                    start = i * n + j0
+                    values[start:start + len(tile)] = [dot(row, column, zero) for column in tile]
+
+        return Matrix(m, n, self.new_buffer(values), self.mode)
+
+    #Both operands are row-major; odd dimensions are padded with a zero row or column before halving
+    def strassen(self, other, block_size):
+        m = self.num_rows
+        inner = self.num_columns
+        n = other.num_columns
+        if min(m, inner, n) <= self.STRASSEN_THRESHOLD:
+            return self.tiled_product(other, block_size)
+
+        a = self.padded(m + m % 2, inner + inner % 2)
+        b = other.padded(inner + inner % 2, n + n % 2)
+        h = a.num_rows // 2
+        k = a.num_columns // 2
+        w = b.num_columns // 2
+
+        a11, a12, a21, a22 = a.block(0, 0, h, k), a.block(0, k, h, k), a.block(h, 0, h, k), a.block(h, k, h, k)
+        b11, b12, b21, b22 = b.block(0, 0, k, w), b.block(0, w, k, w), b.block(k, 0, k, w), b.block(k, w, k, w)
+
+        def product(x, y):
+            return x.compact().strassen(y.compact(), block_size)
+
+        m1 = product(a11.plus(a22), b11.plus(b22))
+        m2 = product(a21.plus(a22), b11)
+        m3 = product(a11, b12.minus(b22))
+        m4 = product(a22, b21.minus(b11))
+        m5 = product(a11.plus(a12), b22)
+        m6 = product(a21.minus(a11), b11.plus(b12))
+        m7 = product(a12.minus(a22), b21.plus(b22))
+
+        c11 = m1.plus(m4).minus(m5).plus(m7)
+        c12 = m3.plus(m5)
+        c21 = m2.plus(m4)
+        c22 = m1.minus(m2).plus(m3).plus(m6)
+
+        values = []
+        for top, bottom in ((c11, c12), (c21, c22)):
+            for i in range(h):
+                values.extend(top.row(i))
+                values.extend(bottom.row(i))
+        result = Matrix(2 * h, 2 * w, self.new_buffer(values), self.mode)
+        return result.block(0, 0, m, n).compact()
+
+    def padded(self, num_rows, num_columns):
+        if num_rows == self.num_rows and num_columns == self.num_columns:
+            return self
+        result = Matrix.zeros(num_rows, num_columns, self.mode)
+        for i in range(self.num_rows):
+            result.data[i * num_columns:i * num_columns + self.num_columns] = self.row(i)
+        return result
+
+    #This matrix applied to every vector of a batch at once, as one product with the batch packed into a
+    #matrix, instead of a dot product per row per vector. Float results are views of the product's buffer.
+    def apply(self, vectors, block_size=DEFAULT_BLOCK_SIZE, strassen=False):
+        for v in vectors:
+            if v.dimension != self.num_columns:
+                raise Exception(self.DIMENSIONS_MUST_MATCH_MSG)
+
+        batch = Matrix.from_vectors(vectors, self.mode)
+        result = batch.times_matrix(self.transpose(), block_size, strassen)
+        if self.mode.kind == NumericMode.FLOAT:
+            return Vector.from_buffer(result.data, self.num_rows)
+        return result.row_vectors()
+
+    def __eq__(self, other):
+        return (isinstance(other, Matrix) and self.num_rows == other.num_rows and
+                self.num_columns == other.num_columns and
+                all(list(self.row(i)) == list(other.row(i)) for i in range(self.num_rows)))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __len__(self):
+        return self.num_rows
+
+    def __str__(self):
+        ret = 'Matrix ({} x {}):\n'.format(self.num_rows, self.num_columns)
+        temp = ['Row {}: {}'.format(i + 1, list(self.row(i))) for i in range(self.num_rows)]
+        ret += '\n'.join(temp)
+        return ret
+
+
+def main():
+    from fractions import Fraction
+
+    a = Matrix.from_rows([[1, 2, 3], [4, 5, 6]], NumericMode.FRACTION)
+    b = Matrix.from_rows([[1, 0], [Fraction(1, 2), 2], [-1, 1]], NumericMode.FRACTION)
+    c = Matrix.from_rows([[-1, 7], [Fraction(1, 2), 16]], NumericMode.FRACTION)
+    if not (a.times_matrix(b) == c and
+            a.times_matrix(b, block_size=1) == c and
+            b.transpose().times_matrix(a.transpose()) == c.transpose() and
+            a @ Vector([1, 1, 1]) == Vector([6, 15]) and
+            a.transpose() @ Vector([1, -1]) == Vector([-3, -3, -3]) and
+            a.apply([Vector([1, 0, 0]), Vector([0, 0, 1])]) == [Vector([1, 4]), Vector([3, 6])]):
+        print('test case 1 failed')
+
+    t = a.transpose()
+    d = a.block(0, 1, 2, 2)
+    e = t.block(1, 0, 2, 2)
+    if not (not t.is_contiguous() and t.row(2) == [3, 6] and t.column(1) == [4, 5, 6] and
+            d == Matrix.from_rows([[2, 3], [5, 6]], NumericMode.FRACTION) and
+            e == Matrix.from_rows([[2, 5], [3, 6]], NumericMode.FRACTION) and
+            e.compact().is_contiguous() and e.compact() == e):
+        print('test case 2 failed')
+
+    d[1, 0] = 50
+    if not (a[1, 1] == 50 and t[1, 1] == 50 and e[0, 1] == 50):
+        print('test case 3 failed')
+
+    #Integer-valued doubles keep every product exact, so Strassen has to agree with the tiled product entry for entry
+    n = Matrix.STRASSEN_THRESHOLD + 1
+    f = Matrix.from_rows([[(i * j) % 7 - 3 for j in range(n + 2)] for i in range(n)], NumericMode.FLOAT)
+    g = Matrix.from_rows([[(i + 2 * j) % 5 - 2 for j in range(n + 1)] for i in range(n + 2)], NumericMode.FLOAT)
+    h = f.times_matrix(g, block_size=16, strassen=True)
+    if not (h == f.times_matrix(g) and
+            h == f.times_matrix(g.transpose().compact().transpose()) and
+            (h.num_rows, h.num_columns) == (n, n + 1) and
+            h[n - 1, n] == sum(f[n - 1, k] * g[k, n] for k in range(n + 2))):
+        print('test case 4 failed')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+from decimal import Decimal, Context, localcontext
+from fractions import Fraction
+from array import array
+from contextlib import nullcontext
+from functools import wraps
+import math
+
+import instrumentation
+
+
+class NumericMode(object):
+
+    FLOAT = 'float'
+    DECIMAL = 'decimal'
+    FRACTION = 'fraction'
+
+    #Not a mode of its own: LinearSystem picks one of the three from the system's condition number
+    AUTO = 'auto'
+
+    UNKNOWN_MODE_MSG = 'The numeric mode must be float, decimal or fraction'
+
+    DEFAULT_PRECISION = 30
+    DEFAULT_TOLERANCE = 1e-10
+
+    #float trades accuracy for speed, decimal rounds to precision digits and fraction is exact
+    def __init__(self, kind=DECIMAL, precision=DEFAULT_PRECISION, tolerance=None):
+        if kind not in (self.FLOAT, self.DECIMAL, self.FRACTION):
+            raise Exception(self.UNKNOWN_MODE_MSG)
+
+        self.kind = kind
+        self.precision = precision
+        self.decimal_context = Context(prec=precision)
+
+        #Exact arithmetic needs no tolerance: only a true zero is zero
+        if tolerance is None:
+            tolerance = 0 if kind == self.FRACTION else self.DEFAULT_TOLERANCE
+        self.tolerance = tolerance
+
+        self.zero = self.convert(0)
+        self.one = self.convert(1)
+
+    #Accepts a NumericMode, the name of one, or None
+    @classmethod
+    def resolve(cls, mode):
+        if mode is None or isinstance(mode, NumericMode):
+            return mode
+        return cls(mode)
+
+    def convert(self, value):
+        if self.kind == self.FLOAT:
+            return float(value)
+
+        if self.kind == self.DECIMAL:
+            if instrumentation.active is not None:
+                instrumentation.active.count(instrumentation.DECIMAL_CONVERSIONS)
+            if isinstance(value, Fraction):
+                return self.decimal_context.divide(Decimal(value.numerator), Decimal(value.denominator))
+            return self.decimal_context.create_decimal(value)
+
+        #Floats go through their shortest repr so 0.1 becomes 1/10 rather than its binary expansion
+        if isinstance(value, float):
+            return Fraction(repr(value))
+        return Fraction(value)
+
+    #Row-major storage: a contiguous array of doubles for float, a list of numbers otherwise
+    def buffer(self, values):
+        if self.kind == self.FLOAT:
+            return array('d', [float(v) for v in values])
+        return [self.convert(v) for v in values]
+
+    def is_near_zero(self, value):
+        if self.kind == self.FRACTION and not self.tolerance:
+            return value == 0
+        return abs(value) < self.tolerance
+
+    def sqrt(self, value):
+        if self.kind == self.DECIMAL:
+            return self.decimal_context.sqrt(value)
+        if self.kind == self.FLOAT:
+            return math.sqrt(value)
+        return self.convert(math.sqrt(value))
+
+    #Largest relative error of rounding one value; zero for exact arithmetic
+    def unit_roundoff(self):
+        if self.kind == self.FLOAT:
+            return 2.0 ** -53
+        if self.kind == self.DECIMAL:
+            return 0.5 * 10.0 ** (1 - self.precision)
+        return 0.0
+
+    #Decimal arithmetic inside this block rounds to the mode's precision
+    def context(self):
+        if self.kind == self.DECIMAL:
+            return localcontext(self.decimal_context)
+        return nullcontext()
+
+    def __eq__(self, other):
+        return (isinstance(other, NumericMode) and self.kind == other.kind and
+                self.precision == other.precision and self.tolerance == other.tolerance)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.kind, self.precision, self.tolerance))
+
+    def __str__(self):
+        if self.kind == self.DECIMAL:
+            return 'Numeric mode: decimal ({} digits)'.format(self.precision)
+        return 'Numeric mode: {}'.format(self.kind)
+
+
+#Exact values are only zero when they are exactly zero, everything else is compared against eps
+def is_near_zero(value, eps=1e-10):
+    if isinstance(value, Fraction):
+        return value == 0
+    return abs(value) < eps
+
+
+#Runs a method of an object carrying a mode attribute inside that mode's decimal context
+def in_mode_context(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.mode is None or self.mode.kind != NumericMode.DECIMAL:
+            return method(self, *args, **kwargs)
+        with localcontext(self.mode.decimal_context):
+            return method(self, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,227 @@
+from array import array
+import csv
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+
+from numeric import NumericMode
+from elimination import AugmentedMatrix
+from linsys import LinearSystem
+from hyperplane import Hyperplane
+from vector import Vector
+from parallel import BlockEliminator
+import serialization
+
+
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+
+#What one coefficient costs once it is a Python float in a list
+BYTES_PER_VALUE = 32
+
+MAX_BLOCK_SIZE = 64
+
+
+#CSV rows of coefficients followed by the constant term; blank lines and lines starting with # are skipped
+def read_csv_rows(path):
+    with open(path, newline='') as f:
+        for row in csv.reader(f):
+            if not row or row[0].lstrip().startswith('#'):
+                continue
+            yield [float(c) for c in row]
+
+
+def rows_from_planes(planes):
+    for p in planes:
+        yield [float(c) for c in p.normal_vector.coordinates] + [float(p.constant_term)]
+
+
+class OutOfCoreLinearSystem(object):
+
+    ROW_MUST_MATCH_SIZE_MSG = 'Every equation needs one coefficient per variable and a constant term'
+    NO_EQUATIONS_MSG = 'The stream did not contain any equations'
+
+    #A linear system that lives in a float64 file in the serialization format instead of in Plane objects.
+    #Rows are streamed into the file in chunks, and elimination runs in place on a writable mapping of it
+    #with the blocked eliminator, so the only rows held as Python objects are one chunk while loading and
+    #one panel of pivot rows while eliminating. memory_budget (in bytes) sizes both; the mapped pages
+    #themselves are left to the operating system to page in and out.
+    def __init__(self, path, memory_budget=DEFAULT_MEMORY_BUDGET, owns_file=False):
+        self.path = path
+        self.memory_budget = memory_budget
+        self.owns_file = owns_file
+
+        self.file = open(path, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        header = serialization.Header(self.map)
+        if header.dtype != serialization.FLOAT64 or sys.byteorder == 'big':
+            self.close()
+            raise Exception(serialization.NOT_FLOAT64_MSG)
+
+        self.num_rows = header.num_rows
+        self.dimension = header.num_columns
+        self.stride = header.stride
+        self.mode = NumericMode(NumericMode.FLOAT)
+        start = serialization.HEADER.size
+        self.view = memoryview(self.map)[start:start + 8 * self.num_rows * self.stride].cast('d')
+        self.reduced = False
+
+    #Streams rows (each a list of num_variables coefficients and a constant term) into a working file.
+    #Without a path the file is temporary and removed on close().
+    @classmethod
+    def from_rows(cls, rows, num_variables, path=None, memory_budget=DEFAULT_MEMORY_BUDGET, directory=None):
+        owns_file = path is None
+        if owns_file:
+            handle, path = tempfile.mkstemp(suffix='.lsys', dir=directory)
+            os.close(handle)
+
+        stride = num_variables + 1
+        chunk_rows = max(1, memory_budget // (stride * BYTES_PER_VALUE))
+        num_rows = 0
+
+        try:
+            with open(path, 'wb') as f:
+                f.write(cls.header(0, num_variables))
+                chunk = array('d')
+                for row in rows:
+                    if len(row) != stride:
+                        raise Exception(cls.ROW_MUST_MATCH_SIZE_MSG)
+                    chunk.extend(row)
+                    num_rows += 1
+                    if num_rows % chunk_rows == 0:
+                        chunk.tofile(f)
+                        chunk = array('d')
+                chunk.tofile(f)
+
+                if not num_rows:
+                    raise Exception(cls.NO_EQUATIONS_MSG)
+                f.seek(0)
+                f.write(cls.header(num_rows, num_variables))
+        except Exception:
+            if owns_file:
+                os.remove(path)
+            raise
+
+        return cls(path, memory_budget, owns_file)
+
+    @staticmethod
+    def header(num_rows, num_variables):
+        mode = NumericMode(NumericMode.FLOAT)
+        return serialization.HEADER.pack(
+            serialization.MAGIC, serialization.VERSION, serialization.SYSTEM,
+            serialization.code_for(serialization.ROW_CLASSES, Hyperplane), serialization.FLOAT64,
+            serialization.code_for(serialization.MODE_KINDS, NumericMode.FLOAT), 0,
+            mode.precision, num_rows, num_variables, mode.tolerance)
+
+    @classmethod
+    def from_planes(cls, planes, num_variables, path=None, memory_budget=DEFAULT_MEMORY_BUDGET, directory=None):
+        return cls.from_rows(rows_from_planes(planes), num_variables, path, memory_budget, directory)
+
+    @classmethod
+    def from_csv(cls, csv_path, num_variables, path=None, memory_budget=DEFAULT_MEMORY_BUDGET, directory=None):
+        return cls.from_rows(read_csv_rows(csv_path), num_variables, path, memory_budget, directory)
+
+    #Elimination works in place, so a float64 file is copied to the working file first rather than modified
+    @classmethod
+    def from_binary(cls, binary_path, path=None, memory_budget=DEFAULT_MEMORY_BUDGET, directory=None):
+        with open(binary_path, 'rb') as f:
+            header = serialization.Header(f.read(serialization.HEADER.size))
+
+        if header.contents == serialization.VECTORS:
+            raise Exception(serialization.NOT_EQUATIONS_MSG)
+
+        #Exact text payloads cannot be mapped, so they are parsed as a whole and then streamed into doubles
+        if header.dtype != serialization.FLOAT64:
+            loaded = serialization.load(binary_path)
+            planes = loaded.planes if isinstance(loaded, LinearSystem) else loaded
+            return cls.from_planes(planes, header.num_columns, path, memory_budget, directory)
+
+        owns_file = path is None
+        if owns_file:
+            handle, path = tempfile.mkstemp(suffix='.lsys', dir=directory)
+            os.close(handle)
+        with open(binary_path, 'rb') as source, open(path, 'wb') as target:
+            shutil.copyfileobj(source, target, max(mmap.PAGESIZE, min(memory_budget, 16 * 1024 * 1024)))
+        return cls(path, memory_budget, owns_file)
+
+    #Panels are as wide as the budget allows for holding their pivot rows as Python floats
+    def block_size(self):
+        return max(1, min(MAX_BLOCK_SIZE, self.memory_budget // (2 * self.stride * BYTES_PER_VALUE)))
+
+    def __len__(self):
+        return self.num_rows
+
+    #The rows currently in the file, as Hyperplanes; only sensible once the system fits in memory
+    def to_linear_system(self):
+        planes = [Hyperplane(normal_vector=Vector(self.view[i * self.stride:i * self.stride + self.dimension], mode=self.mode),
+                             constant_term=self.view[i * self.stride + self.dimension])
+                  for i in range(self.num_rows)]
+        return LinearSystem(planes, mode=self.mode)
+
+    #An AugmentedMatrix over the mapping itself, for the read-only queries it offers
+    def augmented_matrix(self):
+        return AugmentedMatrix(self.num_rows, self.dimension, self.view, self.mode)
+
+    #Reduces the file in place to the same reduced row echelon form compute_rref gives in float mode
+    def compute_rref(self):
+        if not self.reduced:
+            eliminator = BlockEliminator(self.view, self.num_rows, self.dimension, self.mode.tolerance,
+                                         processes=1, block_size=self.block_size())
+            eliminator.compute_rref()
+            self.map.flush()
+            self.reduced = True
+        return self
+
+    def compute_solution(self):
+        matrix = self.compute_rref().augmented_matrix()
+
+        if matrix.has_contradictory_equation():
+            return LinearSystem.NO_SOLUTIONS_MSG
+
+        return LinearSystem.parametrize_rref(matrix)
+
+    def close(self):
+        if getattr(self, 'view', None) is not None:
+            self.view.release()
+            self.view = None
+        self.map.close()
+        self.file.close()
+        if self.owns_file and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def main():
+    planes = [Hyperplane(normal_vector=Vector([((3 * i + 5 * j) % 7) - 3 + (i == j) for j in range(8)]),
+                         constant_term= i - 4)
+              for i in range(8)]
+    planes[7] = Hyperplane(normal_vector=planes[2].normal_vector.plus(planes[5].normal_vector),
+                           constant_term= planes[2].constant_term + planes[5].constant_term)
+    expected = LinearSystem(planes, mode=NumericMode.FLOAT).compute_rref()
+    with OutOfCoreLinearSystem.from_planes(planes, 8, memory_budget=2000) as s:
+        r = s.compute_rref().to_linear_system()
+        t = s.compute_solution()
+        if not (s.block_size() == 3 and len(t.direction_vectors) == 1 and
+                all(abs(a - b) < 1e-9
+                    for p, q in zip(r.planes, expected.planes)
+                    for a, b in zip(list(p.normal_vector.coordinates) + [p.constant_term],
+                                    list(q.normal_vector.coordinates) + [q.constant_term])) and
+                r.indices_of_first_nonzero_terms_in_each_row() == expected.indices_of_first_nonzero_terms_in_each_row() and
+                t.basepoint.minus(LinearSystem(planes, mode=NumericMode.FLOAT).compute_solution().basepoint).is_zero(1e-9)):
+            print('test case 1 failed')
+
+    planes[7] = Hyperplane(normal_vector=planes[7].normal_vector, constant_term= planes[7].constant_term + 1)
+    with OutOfCoreLinearSystem.from_planes(planes, 8, memory_budget=2000) as s:
+        if not (s.compute_solution() == LinearSystem.NO_SOLUTIONS_MSG):
+            print('test case 2 failed')
+
+
+if __name__ == "__main__":
+    main()
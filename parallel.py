@@ -0,0 +1,221 @@
+from array import array
+from multiprocessing import Pool, shared_memory
+import os
+
+from vector import axpy
+
+
+#Below this many rows per worker an update is cheaper to do in the calling process
+MIN_ROWS_PER_TASK = 8
+
+worker_memory = None
+worker_view = None
+
+
+def attach_worker(name):
+    global worker_memory, worker_view
+    worker_memory = shared_memory.SharedMemory(name=name)
+    worker_view = worker_memory.buf.cast('d')
+
+
+def update_rows_in_worker(task):
+    update_rows(worker_view, *task)
+
+
+#For every row in [row_start, row_stop): row -= sum_k row[pivot_cols[k]] * pivot_row_k over columns
+#[col_start, stride), then the pivot columns are set to exactly zero. The pivot rows are never in
+#the updated range, so workers can run this on disjoint row ranges of one shared buffer.
+def update_rows(view, stride, row_start, row_stop, pivot_rows, pivot_cols, col_start):
+    sources = [view[p * stride + col_start:p * stride + stride].tolist() for p in pivot_rows]
+
+    for i in range(row_start, row_stop):
+        base = i * stride
+        coefficients = [view[base + c] for c in pivot_cols]
+        if not any(coefficients):
+            continue
+
+        row = view[base + col_start:base + stride].tolist()
+        for coefficient, source in zip(coefficients, sources):
+            if coefficient:
+                row = axpy(-coefficient, source, row)
+        view[base + col_start:base + stride] = array('d', row)
+
+        for c in pivot_cols:
+            view[base + c] = 0.0
+
+
+class BlockEliminator(object):
+
+    #Right-looking blocked Gauss-Jordan elimination on a float64 augmented matrix.
+    #Each panel of block_size columns is factored in the calling process; the trailing rows are
+    #then updated against the whole panel at once, split across a process pool that shares one
+    #buffer, so no part of the matrix is pickled. With processes=1 everything runs in place on view.
+    def __init__(self, view, num_rows, num_variables, tolerance=1e-10, processes=None, block_size=32):
+        self.view = view
+        self.num_rows = num_rows
+        self.num_variables = num_variables
+        self.stride = num_variables + 1
+        self.tolerance = tolerance
+        self.processes = processes or os.cpu_count() or 1
+        self.block_size = block_size
+        self.pool = None
+
+    def run_updates(self, row_start, row_stop, pivot_rows, pivot_cols, col_start):
+        if row_stop <= row_start or not pivot_rows:
+            return
+
+        count = row_stop - row_start
+        if self.pool is None or count < 2 * MIN_ROWS_PER_TASK:
+            update_rows(self.view, self.stride, row_start, row_stop, pivot_rows, pivot_cols, col_start)
+            return
+
+        chunks = min(self.processes * 2, count // MIN_ROWS_PER_TASK)
+        step = -(-count // chunks)
+        tasks = [(self.stride, start, min(start + step, row_stop), pivot_rows, pivot_cols, col_start)
+                 for start in range(row_start, row_stop, step)]
+        self.pool.map(update_rows_in_worker, tasks)
+
+    def swap_rows(self, row1, row2):
+        s = self.stride
+        view = self.view
+        first = view[row1 * s:row1 * s + s].tolist()
+        view[row1 * s:row1 * s + s] = view[row2 * s:row2 * s + s]
+        view[row2 * s:row2 * s + s] = array('d', first)
+
+    #Partial pivoting over the panel columns only; the multipliers are stored where they cancel
+    def factor_panel(self, row, panel_start, panel_stop):
+        view = self.view
+        s = self.stride
+        m = self.num_rows
+        pivots = []
+
+        for c in range(panel_start, panel_stop):
+            if row >= m:
+                break
+
+            pivot_row = max(range(row, m), key=lambda i: abs(view[i * s + c]))
+            if abs(view[pivot_row * s + c]) < self.tolerance:
+                for i in range(row, m):
+                    view[i * s + c] = 0.0
+                continue
+            if pivot_row != row:
+                self.swap_rows(row, pivot_row)
+
+            beta = view[row * s + c]
+            width = panel_stop - c - 1
+            pivot_panel = view[row * s + c + 1:row * s + panel_stop].tolist()
+            for i in range(row + 1, m):
+                gamma = view[i * s + c]
+                if not gamma:
+                    continue
+                multiplier = gamma / beta
+                view[i * s + c] = multiplier
+                if width:
+                    start = i * s + c + 1
+                    view[start:start + width] = array('d', axpy(-multiplier, pivot_panel, view[start:start + width].tolist()))
+
+            pivots.append((row, c))
+            row += 1
+
+        return pivots
+
+    def compute_triangular_form(self):
+        s = self.stride
+        view = self.view
+        pivots = []
+        row = 0
+
+        for panel_start in range(0, self.num_variables, self.block_size):
+            if row >= self.num_rows:
+                break
+            panel_stop = min(panel_start + self.block_size, self.num_variables)
+            panel_pivots = self.factor_panel(row, panel_start, panel_stop)
+            if not panel_pivots:
+                continue
+
+            #U12: bring the panel's own pivot rows up to date on the trailing columns
+            pivot_rows = [p for p, _ in panel_pivots]
+            pivot_cols = [c for _, c in panel_pivots]
+            for k in range(1, len(panel_pivots)):
+                update_rows(view, s, pivot_rows[k], pivot_rows[k] + 1, pivot_rows[:k], pivot_cols[:k], panel_stop)
+
+            row = pivot_rows[-1] + 1
+            self.run_updates(row, self.num_rows, pivot_rows, pivot_cols, panel_stop)
+            pivots.extend(panel_pivots)
+
+        return pivots
+
+    def compute_rref(self):
+        s = self.stride
+        view = self.view
+        pivots = self.compute_triangular_form()
+
+        for p, c in pivots:
+            beta = 1.0 / view[p * s + c]
+            start = p * s + c + 1
+            view[start:p * s + s] = array('d', [beta * x for x in view[start:p * s + s].tolist()])
+            view[p * s + c] = 1.0
+
+        #Gauss-Jordan sweep from the last block of pivots back to the first
+        for block_stop in range(len(pivots), 0, -self.block_size):
+            block = pivots[max(0, block_stop - self.block_size):block_stop]
+            pivot_rows = [p for p, _ in block]
+            pivot_cols = [c for _, c in block]
+
+            for k in range(len(block) - 2, -1, -1):
+                update_rows(view, s, pivot_rows[k], pivot_rows[k] + 1,
+                            pivot_rows[k + 1:], pivot_cols[k + 1:], pivot_cols[k + 1])
+
+            self.run_updates(0, pivot_rows[0], pivot_rows, pivot_cols, pivot_cols[0])
+
+        return pivots
+
+
+#Computes the RREF of a float AugmentedMatrix in place using a pool of processes
+def parallel_rref(matrix, processes=None, block_size=32):
+    size = max(8 * len(matrix.data), 8)
+    memory = shared_memory.SharedMemory(create=True, size=size)
+    view = memory.buf.cast('d')
+    try:
+        view[:len(matrix.data)] = array('d', matrix.data)
+
+        eliminator = BlockEliminator(view, matrix.num_rows, matrix.num_variables,
+                                     matrix.tolerance, processes, block_size)
+        if eliminator.processes > 1:
+            with Pool(eliminator.processes, initializer=attach_worker, initargs=(memory.name,)) as pool:
+                eliminator.pool = pool
+                eliminator.compute_rref()
+        else:
+            eliminator.compute_rref()
+
+        matrix.data = array('d', view[:len(matrix.data)])
+    finally:
+        view.release()
+        memory.close()
+        memory.unlink()
+
+    return matrix
+
+
+def main():
+    from elimination import AugmentedMatrix
+    from numeric import NumericMode
+
+    n = 40
+    values = []
+    for i in range(n):
+        values.extend([float((7 * i + 3 * j) % 11 - 5 + 20 * (i == j)) for j in range(n)] + [float(i % 5)])
+    #Row n - 1 repeats row 0, so the panels also have to cope with a missing pivot
+    values[(n - 1) * (n + 1):] = values[:n + 1]
+
+    serial = parallel_rref(AugmentedMatrix(n, n, array('d', values), NumericMode(NumericMode.FLOAT)), processes=1, block_size=4)
+    pooled = parallel_rref(AugmentedMatrix(n, n, array('d', values), NumericMode(NumericMode.FLOAT)), processes=2, block_size=4)
+    dense = AugmentedMatrix(n, n, array('d', values), NumericMode(NumericMode.FLOAT)).compute_rref()
+    if not (list(pooled.data) == list(serial.data) and
+            all(abs(a - b) < 1e-9 for a, b in zip(pooled.data, dense.data)) and
+            pooled.first_nonzero_index(n - 1) == -1 and pooled.first_nonzero_index(n - 2) == n - 2):
+        print('test case 1 failed')
+
+
+if __name__ == "__main__":
+    main()
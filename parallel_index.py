@@ -0,0 +1,129 @@
+class ParallelIndex(object):
+
+    DIMENSIONS_MUST_MATCH_MSG = 'Every indexed object should live in the same dimension'
+
+    ZERO_NORMAL_KEY = ('zero',)
+
+    DEFAULT_TOLERANCE = 1e-9
+
+    #Groups Lines, Planes or Hyperplanes into parallel and coincident classes with one hash lookup each.
+    #Normal vectors are divided by the absolute value of their largest coordinate and quantized to
+    #multiples of tolerance, and then the sign is fixed by making the first nonzero quantized coordinate
+    #positive; the constant term is scaled by the same factor. Taking the sign from the largest coordinate
+    #instead would flip it between two coordinates of nearly the same size.
+    def __init__(self, tolerance=DEFAULT_TOLERANCE):
+        self.tolerance = tolerance
+        self.dimension = None
+        self.parallel_classes_by_key = {}
+        self.coincident_classes_by_key = {}
+        self.size = 0
+
+    @staticmethod
+    def normalizing_scale(coordinates):
+        return max([abs(c) for c in coordinates] + [0.0])
+
+    def quantize(self, value):
+        return int(round(value / self.tolerance))
+
+    #Returns the (parallel key, coincident key) pair for an object with a normal_vector and constant_term
+    def keys(self, obj):
+        coordinates = [float(c) for c in obj.normal_vector.coordinates]
+        constant_term = float(obj.constant_term)
+        scale = self.normalizing_scale(coordinates)
+
+        if scale < self.tolerance:
+            parallel_key = self.ZERO_NORMAL_KEY
+            return parallel_key, (parallel_key, self.quantize(constant_term))
+
+        quantized = [self.quantize(c / scale) for c in coordinates]
+        sign = 1 if next(q for q in quantized if q) > 0 else -1
+        parallel_key = tuple([sign * q for q in quantized])
+        return parallel_key, (parallel_key, self.quantize(sign * constant_term / scale))
+
+    def add(self, obj):
+        if self.dimension is None:
+            self.dimension = obj.dimension
+        elif obj.dimension != self.dimension:
+            raise Exception(self.DIMENSIONS_MUST_MATCH_MSG)
+
+        parallel_key, coincident_key = self.keys(obj)
+        self.parallel_classes_by_key.setdefault(parallel_key, []).append(obj)
+        self.coincident_classes_by_key.setdefault(coincident_key, []).append(obj)
+        self.size += 1
+
+    def add_all(self, objects):
+        for obj in objects:
+            self.add(obj)
+
+    def parallel_classes(self):
+        return list(self.parallel_classes_by_key.values())
+
+    def coincident_classes(self):
+        return list(self.coincident_classes_by_key.values())
+
+    #Indexed objects parallel to obj (obj itself included if it was added)
+    def parallel_to(self, obj):
+        return list(self.parallel_classes_by_key.get(self.keys(obj)[0], []))
+
+    def coincident_with(self, obj):
+        return list(self.coincident_classes_by_key.get(self.keys(obj)[1], []))
+
+    #One representative per coincident class, in insertion order
+    def unique(self):
+        return [objects[0] for objects in self.coincident_classes_by_key.values()]
+
+    def __len__(self):
+        return self.size
+
+    def __str__(self):
+        return 'Parallel index: {} objects, {} parallel classes, {} coincident classes'.format(
+            self.size, len(self.parallel_classes_by_key), len(self.coincident_classes_by_key))
+
+
+def main():
+    from line import Line
+    from plane import Plane
+    from vector import Vector
+
+    l1 = Line(normal_vector=Vector([4.046, 2.836]), constant_term=1.21)
+    l2 = Line(normal_vector=Vector([10.115, 7.09]), constant_term=3.025)
+    l3 = Line(normal_vector=Vector([-4.046, -2.836]), constant_term=5)
+    l4 = Line(normal_vector=Vector([7.204, 3.182]), constant_term=8.68)
+    l5 = Line(normal_vector=Vector([0, 0]), constant_term=0)
+    index = ParallelIndex()
+    index.add_all([l1, l2, l3, l4, l5])
+    if not (len(index) == 5 and
+            [[id(l) for l in c] for c in index.parallel_classes()] == [[id(l1), id(l2), id(l3)], [id(l4)], [id(l5)]] and
+            [[id(l) for l in c] for c in index.coincident_classes()] == [[id(l1), id(l2)], [id(l3)], [id(l4)], [id(l5)]] and
+            [id(l) for l in index.unique()] == [id(l1), id(l3), id(l4), id(l5)] and
+            len(index.parallel_to(Line(normal_vector=Vector([2.023, 1.418]), constant_term=0))) == 3 and
+            index.coincident_with(Line(normal_vector=Vector([-8.092, -5.672]), constant_term=-2.42)) == [l1, l2]):
+        print('test case 1 failed')
+
+    p1 = Plane(normal_vector=Vector([1, 2, 3]), constant_term= 1)
+    p2 = Plane(normal_vector=Vector([1, 2, 3.0000000001]), constant_term= 1)
+    p3 = Plane(normal_vector=Vector([1, 2, 3.001]), constant_term= 1)
+    index = ParallelIndex()
+    index.add_all([p1, p2, p3])
+    try:
+        index.add(l1)
+        failed = True
+    except Exception as e:
+        failed = str(e) != ParallelIndex.DIMENSIONS_MUST_MATCH_MSG
+    if failed or not ([len(c) for c in index.parallel_classes()] == [2, 1] and
+                      ParallelIndex(1e-3).keys(p1) == ParallelIndex(1e-3).keys(p2)):
+        print('test case 2 failed')
+
+    #The largest coordinates nearly tie, so the sign must not come from whichever of them wins
+    l6 = Line(normal_vector=Vector([1, -1]), constant_term=1)
+    l7 = Line(normal_vector=Vector([1, -1.0000000000001]), constant_term=1)
+    index = ParallelIndex()
+    index.add_all([l6, l7, Line(normal_vector=Vector([-2, 2]), constant_term=-2)])
+    if not (l6 == l7 and l6.is_parallel(l7) and
+            len(index.parallel_classes()) == 1 and len(index.coincident_classes()) == 1 and
+            l6.fingerprint() == l7.fingerprint()):
+        print('test case 3 failed')
+
+
+if __name__ == "__main__":
+    main()
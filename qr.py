@@ -0,0 +1,280 @@
+from numeric import NumericMode
+from vector import axpy, axpy_into, dot
+
+
+class QRFactorization(object):
+
+    RANK_DEFICIENT_MSG = 'The coefficient matrix is rank deficient; factor it with column pivoting'
+    CONSTANT_TERMS_MUST_MATCH_SIZE_MSG = 'There must be one constant term per equation'
+
+    #AP = QR for an m x n coefficient matrix given as one row-major buffer. R ends up on and above
+    #the diagonal and each Householder vector below it (its leading 1 is implied), with the scalar
+    #factors in taus. With pivoting the column of largest remaining norm is moved forward at each step,
+    #so the diagonal of R decreases and the numerical rank can be read off it.
+    def __init__(self, num_rows, num_columns, data, mode=None, pivoting=False):
+        self.num_rows = num_rows
+        self.num_columns = num_columns
+        self.qr = data
+        self.mode = mode or NumericMode()
+        self.pivoting = pivoting
+        self.permutation = list(range(num_columns))
+        self.taus = []
+
+        #Reflectors need square roots, so even fraction mode is only as exact as a float here
+        self.tolerance = self.mode.tolerance or NumericMode.DEFAULT_TOLERANCE
+
+        with self.mode.context():
+            self.factor()
+        self.rank = self.compute_rank()
+
+    @classmethod
+    def from_augmented_matrix(cls, matrix, pivoting=False):
+        data = matrix.mode.buffer([])
+        for i in range(matrix.num_rows):
+            data.extend(matrix.row_coefficients(i))
+
+        return cls(matrix.num_rows, matrix.num_variables, data, matrix.mode, pivoting)
+
+    def swap_columns(self, col1, col2):
+        a = self.qr
+        n = self.num_columns
+        for i in range(self.num_rows):
+            a[i * n + col1], a[i * n + col2] = a[i * n + col2], a[i * n + col1]
+        self.permutation[col1], self.permutation[col2] = self.permutation[col2], self.permutation[col1]
+
+    def squared_column_norm(self, col, start):
+        n = self.num_columns
+        column = [self.qr[i * n + col] for i in range(start, self.num_rows)]
+        return dot(column, column, self.mode.zero)
+
+    def factor(self):
+        m = self.num_rows
+        n = self.num_columns
+        a = self.qr
+        zero = self.mode.zero
+
+        for k in range(min(m, n)):
+            if self.pivoting:
+                norms = [self.squared_column_norm(j, k) for j in range(k, n)]
+                pivot = k + max(range(len(norms)), key=lambda j: norms[j])
+                if pivot != k:
+                    self.swap_columns(k, pivot)
+
+            x = [a[i * n + k] for i in range(k, m)]
+            norm = self.mode.sqrt(dot(x, x, zero))
+            if not norm:
+                self.taus.append(zero)
+                continue
+
+            #H = I - tau v v^T with v[0] = 1 maps x onto alpha e1
+            alpha = -norm if x[0] >= 0 else norm
+            v0 = x[0] - alpha
+            tau = (alpha - x[0]) / alpha
+            self.taus.append(tau)
+            a[k * n + k] = alpha
+            for i in range(k + 1, m):
+                a[i * n + k] = a[i * n + k] / v0
+
+            width = n - k - 1
+            if not width:
+                continue
+
+            w = list(a[k * n + k + 1:k * n + n])
+            for i in range(k + 1, m):
+                vi = a[i * n + k]
+                if vi:
+                    w = axpy(vi, a[i * n + k + 1:i * n + n], w)
+
+            axpy_into(-tau, w, a, k * n + k + 1)
+            for i in range(k + 1, m):
+                vi = a[i * n + k]
+                if vi:
+                    axpy_into(-tau * vi, w, a, i * n + k + 1)
+
+    #Diagonal entries of R below tolerance relative to the largest one count as zero
+    def compute_rank(self):
+        n = self.num_columns
+        diagonal = [abs(self.qr[k * n + k]) for k in range(min(self.num_rows, n))]
+        if not diagonal:
+            return 0
+
+        threshold = self.mode.convert(self.tolerance) * max(diagonal)
+        if self.pivoting:
+            rank = 0
+            while rank < len(diagonal) and diagonal[rank] > threshold:
+                rank += 1
+            return rank
+        return len([d for d in diagonal if d > threshold])
+
+    #Q^T b, applying the stored reflectors in order
+    def apply_transpose(self, constant_terms):
+        if len(constant_terms) != self.num_rows:
+            raise Exception(self.CONSTANT_TERMS_MUST_MATCH_SIZE_MSG)
+
+        m = self.num_rows
+        n = self.num_columns
+        a = self.qr
+        b = [self.mode.convert(k) for k in constant_terms]
+
+        for k, tau in enumerate(self.taus):
+            if not tau:
+                continue
+            w = b[k]
+            for i in range(k + 1, m):
+                w = w + a[i * n + k] * b[i]
+            b[k] = b[k] - tau * w
+            for i in range(k + 1, m):
+                b[i] = b[i] - tau * a[i * n + k] * w
+
+        return b
+
+    #Solves R[:rank, :rank] z = rhs
+    def back_substitute(self, rhs):
+        n = self.num_columns
+        a = self.qr
+        z = list(rhs)
+        for i in range(self.rank)[::-1]:
+            total = z[i]
+            for k in range(i + 1, self.rank):
+                total = total - a[i * n + k] * z[k]
+            z[i] = total / a[i * n + i]
+        return z
+
+    #Minimizes ||Ax - b||. Returns the basepoint, direction vectors spanning every other minimizer
+    #(empty when A has full column rank) and the norm of the residual b - Ax.
+    def least_squares(self, constant_terms):
+        with self.mode.context():
+            return self.do_least_squares(constant_terms)
+
+    def do_least_squares(self, constant_terms):
+        n = self.num_columns
+        r = self.rank
+        if r < n and not self.pivoting:
+            raise Exception(self.RANK_DEFICIENT_MSG)
+
+        zero = self.mode.zero
+        y = self.apply_transpose(constant_terms)
+        residual_norm = self.mode.sqrt(dot(y[r:], y[r:], zero))
+
+        z = self.back_substitute(y[:r])
+        basepoint = [zero] * n
+        for i in range(r):
+            basepoint[self.permutation[i]] = z[i]
+
+        #Each free column j gives R11 y = -R12[:, j] with x_j = 1
+        direction_vectors = []
+        for j in range(r, n):
+            z = self.back_substitute([-self.qr[i * n + j] for i in range(r)])
+            direction = [zero] * n
+            for i in range(r):
+                direction[self.permutation[i]] = z[i]
+            direction[self.permutation[j]] = self.mode.one
+            direction_vectors.append(direction)
+
+        return basepoint, direction_vectors, residual_norm
+
+
+class StreamingLeastSquares(object):
+
+    ROW_MUST_MATCH_SIZE_MSG = 'Every row needs one coefficient per variable'
+
+    #Least squares over rows that arrive one at a time. Each row is folded into an n x n triangular
+    #factor with Givens rotations and then dropped, so memory stays O(n^2) however many rows come in.
+    def __init__(self, num_variables, mode=None):
+        self.num_variables = num_variables
+        self.mode = NumericMode.resolve(mode) or NumericMode()
+        self.r = [self.mode.zero] * (num_variables * num_variables)
+        self.z = [self.mode.zero] * num_variables
+        self.residual_sum_of_squares = self.mode.zero
+        self.num_rows = 0
+
+    def add_row(self, coefficients, constant_term):
+        if len(coefficients) != self.num_variables:
+            raise Exception(self.ROW_MUST_MATCH_SIZE_MSG)
+        with self.mode.context():
+            self.do_add_row(coefficients, constant_term)
+
+    def do_add_row(self, coefficients, constant_term):
+        n = self.num_variables
+        r = self.r
+        z = self.z
+        convert = self.mode.convert
+        row = [convert(c) for c in coefficients]
+        beta = convert(constant_term)
+
+        for k in range(n):
+            x = row[k]
+            if not x:
+                continue
+
+            start = k * n + k
+            stop = k * n + n
+            rkk = r[start]
+            h = self.mode.sqrt(rkk * rkk + x * x)
+            c = rkk / h
+            s = x / h
+
+            pivot_row = r[start:stop]
+            r[start:stop] = [c * p + s * q for p, q in zip(pivot_row, row[k:])]
+            row[k:] = [c * q - s * p for p, q in zip(pivot_row, row[k:])]
+            row[k] = self.mode.zero
+
+            z[k], beta = c * z[k] + s * beta, c * beta - s * z[k]
+
+        #Whatever is left of the constant term can no longer be fitted
+        self.residual_sum_of_squares = self.residual_sum_of_squares + beta * beta
+        self.num_rows += 1
+
+    def add_plane(self, plane):
+        self.add_row(plane.normal_vector.coordinates, plane.constant_term)
+
+    def add_planes(self, planes):
+        for p in planes:
+            self.add_plane(p)
+
+    #Same result as QRFactorization.least_squares on every row added so far
+    def solve(self):
+        factorization = QRFactorization(self.num_variables, self.num_variables, self.mode.buffer(self.r),
+                                        self.mode, pivoting=True)
+        basepoint, direction_vectors, residual_norm = factorization.least_squares(self.z)
+
+        with self.mode.context():
+            residual_norm = self.mode.sqrt(residual_norm * residual_norm + self.residual_sum_of_squares)
+
+        return basepoint, direction_vectors, residual_norm
+
+
+def main():
+    from plane import Plane
+    from vector import Vector
+
+    planes = [Plane(normal_vector=Vector([1, 0, 0]), constant_term= 1),
+              Plane(normal_vector=Vector([1, 0, 0]), constant_term= 3),
+              Plane(normal_vector=Vector([0, 1, 0]), constant_term= 2),
+              Plane(normal_vector=Vector([0, 1, 1]), constant_term= 5),
+              Plane(normal_vector=Vector([1, 2, -5]), constant_term= 3),
+              Plane(normal_vector=Vector([2, -1, 1]), constant_term= 0)]
+    for kind in (NumericMode.DECIMAL, NumericMode.FLOAT):
+        mode = NumericMode(kind)
+        data = mode.buffer([mode.convert(c) for p in planes for c in p.normal_vector.coordinates])
+        x, d, norm = QRFactorization(len(planes), 3, data, mode).least_squares([mode.convert(p.constant_term) for p in planes])
+        streaming = StreamingLeastSquares(3, mode)
+        streaming.add_planes(planes[:2])
+        streaming.add_row([0, 1, 0], 2)
+        streaming.add_planes(planes[3:])
+        y, e, streamed_norm = streaming.solve()
+        if not (streaming.num_rows == 6 and d == [] and e == [] and
+                all(abs(a - b) < 1e-12 for a, b in zip(x, y)) and
+                abs(norm - streamed_norm) < 1e-12 and norm > 1):
+            print('test case 1 failed')
+
+    streaming = StreamingLeastSquares(3)
+    streaming.add_planes(planes[:3])
+    y, e, streamed_norm = streaming.solve()
+    if not (y == [2, 2, 0] and len(e) == 1 and e[0] == [0, 0, 1] and
+            abs(streamed_norm - NumericMode().sqrt(NumericMode().convert(2))) < 1e-20):
+        print('test case 2 failed')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+from array import array
+from decimal import Decimal
+from fractions import Fraction
+import mmap
+import struct
+import sys
+
+from numeric import NumericMode
+from vector import Vector
+from line import Line
+from plane import Plane
+from hyperplane import Hyperplane
+from elimination import AugmentedMatrix
+from linsys import LinearSystem
+
+
+#Every file starts with a 40 byte little-endian header:
+#magic, version, contents, row class, dtype, numeric mode, backend, 2 padding bytes,
+#decimal precision, number of rows, number of columns, tolerance.
+#Rows follow in row-major order: the coordinates of a vector, or the coefficients of an
+#equation followed by its constant term. The header length keeps float64 payloads 8-byte aligned.
+MAGIC = b'LSYS'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBBBB2xIQQd')
+
+VECTORS = 1
+EQUATIONS = 2
+SYSTEM = 3
+
+#float64 payloads are raw doubles; text payloads are the exact values as ASCII, separated by spaces,
+#preceded by their length in bytes as a little-endian uint64
+FLOAT64 = 1
+TEXT = 2
+
+ROW_CLASSES = {0: None, 1: Line, 2: Plane, 3: Hyperplane}
+MODE_KINDS = {0: None, 1: NumericMode.FLOAT, 2: NumericMode.DECIMAL, 3: NumericMode.FRACTION}
+BACKENDS = {0: LinearSystem.DENSE_BACKEND, 1: LinearSystem.SPARSE_BACKEND}
+
+BAD_MAGIC_MSG = 'Not a serialized vector, equation or linear system file'
+UNSUPPORTED_VERSION_MSG = 'The file was written by a newer version of this format'
+UNSUPPORTED_OBJECT_MSG = 'Only lists of Vectors, lists of Lines/Planes/Hyperplanes and LinearSystems can be serialized'
+MIXED_ROWS_MSG = 'Every vector or equation must have the same dimension and class'
+NOT_FLOAT64_MSG = 'Only float64 files can be memory-mapped'
+NOT_EQUATIONS_MSG = 'Only equation and linear system files hold an augmented matrix'
+
+
+def code_for(table, value):
+    for code, candidate in table.items():
+        if candidate == value:
+            return code
+    raise Exception(UNSUPPORTED_OBJECT_MSG)
+
+
+#(contents, row class, mode, backend, rows) for anything dumps accepts; rows are lists of values
+def describe(obj):
+    if isinstance(obj, LinearSystem):
+        rows = [list(p.normal_vector.coordinates) + [p.constant_term] for p in obj.planes]
+        return SYSTEM, obj.row_class(), obj.mode, obj.backend, obj.dimension, rows
+
+    objects = list(obj)
+    if not objects:
+        raise Exception(UNSUPPORTED_OBJECT_MSG)
+    first = objects[0]
+
+    if isinstance(first, Vector):
+        if any(not isinstance(v, Vector) or v.dimension != first.dimension for v in objects):
+            raise Exception(MIXED_ROWS_MSG)
+        return VECTORS, None, first.mode, None, first.dimension, [v.coordinates for v in objects]
+
+    row_class = type(first)
+    if row_class not in (Line, Plane, Hyperplane):
+        raise Exception(UNSUPPORTED_OBJECT_MSG)
+    if any(type(p) is not row_class or p.dimension != first.dimension for p in objects):
+        raise Exception(MIXED_ROWS_MSG)
+    rows = [list(p.normal_vector.coordinates) + [p.constant_term] for p in objects]
+    return EQUATIONS, row_class, first.normal_vector.mode, None, first.dimension, rows
+
+
+#Exact modes are stored as text unless dtype=FLOAT64 asks for doubles, and so are rows without a mode
+#that hold any Decimal or Fraction; everything else is stored as doubles
+def default_dtype(mode, rows=()):
+    if mode is not None:
+        return TEXT if mode.kind in (NumericMode.DECIMAL, NumericMode.FRACTION) else FLOAT64
+    for row in rows:
+        if any(isinstance(c, (Decimal, Fraction)) for c in row):
+            return TEXT
+    return FLOAT64
+
+
+#Text values without a mode come back as Fractions when written as one and as Decimals otherwise
+def parse_exact(word):
+    if '/' in word:
+        return Fraction(word)
+    return Decimal(word)
+
+
+def dumps(obj, dtype=None):
+    contents, row_class, mode, backend, columns, rows = describe(obj)
+    dtype = dtype or default_dtype(mode, rows)
+
+    header = HEADER.pack(MAGIC, VERSION, contents, code_for(ROW_CLASSES, row_class), dtype,
+                         code_for(MODE_KINDS, mode.kind if mode else None),
+                         code_for(BACKENDS, backend) if backend else 0,
+                         mode.precision if mode else 0, len(rows), columns,
+                         float(mode.tolerance) if mode else 0.0)
+
+    if dtype == FLOAT64:
+        values = array('d')
+        for row in rows:
+            values.extend([float(c) for c in row])
+        if sys.byteorder == 'big':
+            values.byteswap()
+        return header + values.tobytes()
+
+    text = ' '.join([str(c) for row in rows for c in row]).encode('ascii')
+    return header + struct.pack('<Q', len(text)) + text
+
+
+def save(obj, path, dtype=None):
+    with open(path, 'wb') as f:
+        f.write(dumps(obj, dtype))
+
+
+class Header(object):
+
+    def __init__(self, data):
+        if len(data) < HEADER.size:
+            raise Exception(BAD_MAGIC_MSG)
+        (magic, version, contents, row_class, dtype, mode_kind, backend,
+         precision, num_rows, num_columns, tolerance) = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise Exception(BAD_MAGIC_MSG)
+        if version > VERSION:
+            raise Exception(UNSUPPORTED_VERSION_MSG)
+
+        self.contents = contents
+        self.row_class = ROW_CLASSES[row_class]
+        self.dtype = dtype
+        self.mode_kind = MODE_KINDS[mode_kind]
+        self.backend = BACKENDS[backend]
+        self.precision = precision
+        self.num_rows = num_rows
+        self.num_columns = num_columns
+        self.tolerance = tolerance
+        self.stride = num_columns if contents == VECTORS else num_columns + 1
+
+    def mode(self):
+        if self.mode_kind is None:
+            return None
+        tolerance = self.tolerance if self.mode_kind != NumericMode.FRACTION else Fraction(self.tolerance)
+        return NumericMode(self.mode_kind, self.precision or NumericMode.DEFAULT_PRECISION, tolerance)
+
+
+#The flat list of values stored after the header
+def read_values(header, data):
+    count = header.num_rows * header.stride
+    if header.dtype == FLOAT64:
+        values = array('d')
+        values.frombytes(data[HEADER.size:HEADER.size + 8 * count])
+        if sys.byteorder == 'big':
+            values.byteswap()
+        return values
+
+    length, = struct.unpack_from('<Q', data, HEADER.size)
+    start = HEADER.size + 8
+    words = bytes(data[start:start + length]).split()
+    parse = {NumericMode.FRACTION: Fraction, NumericMode.FLOAT: float,
+             NumericMode.DECIMAL: Decimal}.get(header.mode_kind, parse_exact)
+    return [parse(w.decode('ascii')) for w in words]
+
+
+def build(header, values):
+    mode = header.mode()
+    stride = header.stride
+    rows = [values[i * stride:(i + 1) * stride] for i in range(header.num_rows)]
+
+    if header.contents == VECTORS:
+        return [Vector(row, mode=mode) for row in rows]
+
+    #Without a mode planes keep Decimal constant terms; the shortest repr of the double gives back the usual literal
+    if mode is None and header.dtype == FLOAT64:
+        constant_terms = [Decimal(repr(row[-1])) for row in rows]
+    else:
+        constant_terms = [row[-1] for row in rows]
+    planes = [header.row_class(normal_vector=Vector(row[:-1], mode=mode), constant_term=k)
+              for row, k in zip(rows, constant_terms)]
+    if header.contents == EQUATIONS:
+        return planes
+    return LinearSystem(planes, backend=header.backend, mode=mode)
+
+
+def loads(data):
+    header = Header(data)
+    return build(header, read_values(header, data))
+
+
+def load(path):
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+class MappedFile(object):
+
+    #Read-only, memory-mapped access to a float64 file. Nothing is parsed up front: rows are
+    #memoryview slices of the mapping, and to_augmented_matrix copies the payload with a single memcpy.
+    #Release every view taken from it before close(), or use it as a context manager.
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.header = Header(self.map)
+            if self.header.dtype != FLOAT64 or sys.byteorder == 'big':
+                raise Exception(NOT_FLOAT64_MSG)
+            count = self.header.num_rows * self.header.stride
+            self.values = memoryview(self.map)[HEADER.size:HEADER.size + 8 * count].cast('d')
+        except Exception:
+            self.map.close()
+            self.file.close()
+            raise
+
+        self.num_rows = self.header.num_rows
+        self.num_columns = self.header.num_columns
+        self.stride = self.header.stride
+
+    def __len__(self):
+        return self.num_rows
+
+    def row(self, i):
+        return self.values[i * self.stride:(i + 1) * self.stride]
+
+    def coefficients(self, i):
+        return self.values[i * self.stride:i * self.stride + self.num_columns]
+
+    def constant_term(self, i):
+        return self.values[i * self.stride + self.num_columns]
+
+    #Vectors backed by the mapping itself (vector files only)
+    def vectors(self):
+        return Vector.from_buffer(self.values, self.num_columns)
+
+    def to_array(self):
+        values = array('d')
+        with self.values.cast('B') as raw:
+            values.frombytes(raw)
+        return values
+
+    def to_augmented_matrix(self):
+        if self.header.contents == VECTORS:
+            raise Exception(NOT_EQUATIONS_MSG)
+        return AugmentedMatrix(self.num_rows, self.num_columns, self.to_array(), NumericMode(NumericMode.FLOAT))
+
+    def load(self):
+        return build(self.header, self.values)
+
+    def close(self):
+        self.values.release()
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def open_mapped(path):
+    return MappedFile(path)
+
+
+def main():
+    import os
+    import shutil
+    import tempfile
+
+    p1 = Plane(normal_vector=Vector([0, 1, 1]), constant_term= 1)
+    p2 = Plane(normal_vector=Vector([1, -1, 1]), constant_term= 2)
+    p3 = Plane(normal_vector=Vector([1, 2, -5]), constant_term= Decimal('3.1'))
+    s = LinearSystem([p1,p2,p3], mode=NumericMode.FRACTION)
+    t = loads(dumps(s))
+    if not (t.mode == s.mode and t.backend == s.backend and
+            t.planes == s.planes and
+            t.compute_solution().basepoint == s.compute_solution().basepoint):
+        print('test case 1 failed')
+
+    v = [Vector([1.5, -2.25, 3.0]), Vector([0.1, 0.2, 0.3])]
+    u = loads(dumps([p1, p2, p3]))
+    if not (loads(dumps(v)) == v and
+            [type(p) for p in u] == [Plane] * 3 and
+            u[2].constant_term == Decimal('3.1') and u == [p1, p2, p3]):
+        print('test case 2 failed')
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'system.lsys')
+    save(LinearSystem([p1,p2,p3], mode=NumericMode.FLOAT), path)
+    r = load(path)
+    with open_mapped(path) as m:
+        matrix = m.to_augmented_matrix()
+        loaded = m.load()
+        if not (len(m) == 3 and m.num_columns == 3 and
+                list(m.coefficients(1)) == [1.0, -1.0, 1.0] and m.constant_term(2) == 3.1 and
+                list(m.row(0)) == [0.0, 1.0, 1.0, 1.0] and
+                list(matrix.data) == list(m.to_array()) and
+                loaded.planes == r.planes and loaded.mode == r.mode and
+                loaded.compute_solution().basepoint == r.compute_solution().basepoint):
+            print('test case 3 failed')
+
+    path = os.path.join(directory, 'vectors.lsys')
+    save([Vector([1.5, -2.25, 3.0], mode=NumericMode.FLOAT), Vector([0.1, 0.2, 0.3], mode=NumericMode.FLOAT)], path)
+    m = open_mapped(path)
+    w = [x.coordinates.tolist() for x in m.vectors()]
+    m.close()
+    if not (w == [[1.5, -2.25, 3.0], [0.1, 0.2, 0.3]]):
+        print('test case 4 failed')
+
+    path = os.path.join(directory, 'exact.lsys')
+    save(s, path)
+    try:
+        open_mapped(path)
+        print('test case 5 failed')
+    except Exception as e:
+        if str(e) != NOT_FLOAT64_MSG:
+            print('test case 5 failed')
+
+    v = [Vector([Decimal('0.1000000000000000000001'), Fraction(1, 3), 2])]
+    u = loads(dumps(v))
+    q = loads(dumps([Plane(normal_vector=Vector([1, 2, 3]), constant_term= Decimal('0.1000000000000000000001'))]))
+    if not (u[0].coordinates == (Decimal('0.1000000000000000000001'), Fraction(1, 3), 2) and
+            q[0].constant_term == Decimal('0.1000000000000000000001') and
+            Header(dumps(v)).dtype == TEXT and Header(dumps([Vector([0.1, 2])])).dtype == FLOAT64):
+        print('test case 6 failed')
+
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+from array import array
+import heapq
+
+import instrumentation
+from numeric import NumericMode
+
+
+class SparseAugmentedMatrix(object):
+
+    ALL_ROWS_MUST_BE_IN_SAME_DIM_MSG = 'All rows should live in the same dimension'
+    UNKNOWN_ORDERING_MSG = 'Unknown pivot ordering'
+
+    NATURAL_ORDERING = 'natural'
+    MINIMUM_DEGREE_ORDERING = 'minimum-degree'
+
+    #Entries smaller than 1/PIVOT_THRESHOLD of the largest one in their column are never picked as pivots
+    PIVOT_THRESHOLD = 10
+
+    #Each row is a dict mapping column index to its nonzero coefficient
+    def __init__(self, num_variables, rows, constant_terms, mode=None):
+        self.num_rows = len(rows)
+        self.num_variables = num_variables
+        self.rows = rows
+        self.constant_terms = constant_terms
+        self.mode = mode or NumericMode()
+        self.tolerance = self.mode.tolerance
+        self.zero = self.mode.zero
+        self.one = self.mode.one
+        self.pivots = None
+
+    @classmethod
+    def from_planes(cls, planes, mode=None):
+        mode = mode or NumericMode()
+        num_variables = planes[0].dimension
+
+        rows = []
+        constant_terms = []
+        for p in planes:
+            if p.dimension != num_variables:
+                raise Exception(cls.ALL_ROWS_MUST_BE_IN_SAME_DIM_MSG)
+            row = {}
+            for j, c in enumerate(p.normal_vector.coordinates):
+                value = mode.convert(c)
+                if not mode.is_near_zero(value):
+                    row[j] = value
+            rows.append(row)
+            constant_terms.append(mode.convert(p.constant_term))
+
+        return cls(num_variables, rows, constant_terms, mode)
+
+    def copy(self):
+        return SparseAugmentedMatrix(self.num_variables, [dict(r) for r in self.rows],
+                                     self.constant_terms[:], self.mode)
+
+    def nonzero_count(self):
+        return sum(len(r) for r in self.rows)
+
+    #The coefficients as a float64 CSRMatrix plus the constant terms as floats
+    def to_csr(self):
+        return (CSRMatrix.from_rows(self.num_variables, self.rows),
+                [float(k) for k in self.constant_terms])
+
+    def is_near_zero(self, value):
+        if not self.tolerance:
+            return not value
+        return abs(value) < self.tolerance
+
+    #Gauss-Jordan elimination that only ever visits stored nonzeros.
+    #With the minimum-degree ordering the next pivot column is the one with the fewest
+    #remaining nonzeros, and the pivot row is the sparsest acceptable row in that column.
+    #If that leaves free variables, one natural-order pass over the already reduced rows
+    #moves the pivots to the canonical columns, so the parametrization agrees with the dense path.
+    def compute_rref(self, ordering=MINIMUM_DEGREE_ORDERING):
+        if ordering not in (self.NATURAL_ORDERING, self.MINIMUM_DEGREE_ORDERING):
+            raise Exception(self.UNKNOWN_ORDERING_MSG)
+
+        with self.mode.context(), instrumentation.phase(instrumentation.RREF_PHASE):
+            return self.do_compute_rref(ordering)
+
+    def do_compute_rref(self, ordering):
+        self.eliminate(ordering)
+        if ordering == self.MINIMUM_DEGREE_ORDERING and len(self.pivots) < self.num_variables:
+            self.eliminate(self.NATURAL_ORDERING)
+
+        return self
+
+    def eliminate(self, ordering):
+        rows = self.rows
+        constants = self.constant_terms
+        columns = [set() for _ in range(self.num_variables)]
+        for i, r in enumerate(rows):
+            for j in r:
+                columns[j].add(i)
+
+        active = set(range(self.num_rows))
+        pivots = []
+
+        #Columns are popped lazily from a heap keyed on how many active rows they touch
+        if ordering == self.MINIMUM_DEGREE_ORDERING:
+            heap = [(len(columns[j]), j) for j in range(self.num_variables) if columns[j]]
+        else:
+            heap = [(0, j) for j in range(self.num_variables) if columns[j]]
+        heapq.heapify(heap)
+        done = set()
+
+        while heap and active:
+            count, col = heapq.heappop(heap)
+            if col in done:
+                continue
+            candidates = [i for i in columns[col] if i in active]
+            if not candidates:
+                done.add(col)
+                continue
+            if ordering == self.MINIMUM_DEGREE_ORDERING and len(candidates) != count:
+                heapq.heappush(heap, (len(candidates), col))
+                continue
+
+            pivot_row = self.choose_pivot_row(candidates, col)
+            done.add(col)
+            active.discard(pivot_row)
+            pivots.append((pivot_row, col))
+
+            for i in candidates:
+                if i != pivot_row:
+                    self.eliminate_column(pivot_row, i, col, columns)
+
+        #Back substitution, newest pivot first, removes each pivot column from the earlier pivot rows
+        for pivot_row, col in pivots[::-1]:
+            instrumentation.count(instrumentation.MULTIPLY_ROW)
+            beta = self.one / rows[pivot_row][col]
+            for j in rows[pivot_row]:
+                rows[pivot_row][j] = rows[pivot_row][j] * beta
+            rows[pivot_row][col] = self.one
+            constants[pivot_row] = constants[pivot_row] * beta
+
+            for i in list(columns[col]):
+                if i != pivot_row:
+                    self.eliminate_column(pivot_row, i, col, columns)
+
+        self.pivots = sorted(pivots, key=lambda p: p[1])
+        return self
+
+    def choose_pivot_row(self, candidates, col):
+        rows = self.rows
+        largest = max(abs(rows[i][col]) for i in candidates)
+        acceptable = [i for i in candidates if abs(rows[i][col]) * self.PIVOT_THRESHOLD >= largest]
+        return min(acceptable, key=lambda i: (len(rows[i]), i))
+
+    #Subtracts the multiple of pivot_row that zeroes col in row, keeping the column structure in sync
+    def eliminate_column(self, pivot_row, row, col, columns):
+        instrumentation.count(instrumentation.ADD_MULTIPLE_OF_ROW)
+        source = self.rows[pivot_row]
+        target = self.rows[row]
+        alpha = target[col] / source[col]
+
+        for j, v in source.items():
+            value = target.get(j, self.zero) - alpha * v
+            if j == col or self.is_near_zero(value):
+                if j in target:
+                    del target[j]
+                    columns[j].discard(row)
+            else:
+                target[j] = value
+                columns[j].add(row)
+
+        self.constant_terms[row] = self.constant_terms[row] - alpha * self.constant_terms[pivot_row]
+
+    #Pivot rows in pivot column order, then the rows that were eliminated entirely
+    def row_order(self):
+        pivot_rows = [i for i, _ in self.pivots]
+        remaining = set(range(self.num_rows)) - set(pivot_rows)
+        return pivot_rows + sorted(remaining)
+
+    def to_planes(self, row_class):
+        from vector import Vector
+
+        planes = []
+        for i in self.row_order():
+            coordinates = [self.zero] * self.num_variables
+            for j, v in self.rows[i].items():
+                coordinates[j] = v
+            planes.append(row_class(normal_vector=Vector(coordinates, mode=self.mode),
+                                    constant_term=self.constant_terms[i]))
+        return planes
+
+    def has_contradictory_equation(self):
+        for i in range(self.num_rows):
+            if not self.rows[i] and not self.is_near_zero(self.constant_terms[i]):
+                return True
+        return False
+
+    #The following two methods expect compute_rref to have been called
+    def extract_direction_vectors_for_parametrization(self):
+        num_variables = self.num_variables
+        pivot_columns = set(j for _, j in self.pivots)
+
+        direction_vectors = []
+        for free_var in range(num_variables):
+            if free_var in pivot_columns:
+                continue
+            vector_coords = [self.zero] * num_variables
+            vector_coords[free_var] = self.one
+            for i, pivot_var in self.pivots:
+                v = self.rows[i].get(free_var)
+                if v is not None:
+                    vector_coords[pivot_var] = -v
+            direction_vectors.append(vector_coords)
+
+        return direction_vectors
+
+    def extract_basepoint_for_parametrization(self):
+        basepoint_coords = [self.zero] * self.num_variables
+        for i, pivot_var in self.pivots:
+            basepoint_coords[pivot_var] = self.constant_terms[i]
+        return basepoint_coords
+
+    def __len__(self):
+        return self.num_rows
+
+
+class CSRMatrix(object):
+
+    #Compressed sparse rows of float64: row i owns indices[indptr[i]:indptr[i+1]] and the matching values
+    def __init__(self, num_rows, num_columns, indptr, indices, values):
+        self.num_rows = num_rows
+        self.num_columns = num_columns
+        self.indptr = indptr
+        self.indices = indices
+        self.values = values
+
+    @classmethod
+    def from_rows(cls, num_columns, rows):
+        indptr = array('l', [0])
+        indices = array('l')
+        values = array('d')
+        for r in rows:
+            for j in sorted(r):
+                indices.append(j)
+                values.append(float(r[j]))
+            indptr.append(len(indices))
+        return cls(len(rows), num_columns, indptr, indices, values)
+
+    def nonzero_count(self):
+        return len(self.values)
+
+    def row(self, i):
+        start = self.indptr[i]
+        stop = self.indptr[i + 1]
+        return zip(self.indices[start:stop], self.values[start:stop])
+
+    def matvec(self, x):
+        indptr = self.indptr
+        indices = self.indices
+        values = self.values
+        result = [0.0] * self.num_rows
+        for i in range(self.num_rows):
+            total = 0.0
+            for k in range(indptr[i], indptr[i + 1]):
+                total += values[k] * x[indices[k]]
+            result[i] = total
+        return result
+
+    def diagonal(self):
+        diagonal = [0.0] * min(self.num_rows, self.num_columns)
+        for i in range(len(diagonal)):
+            for j, v in self.row(i):
+                if j == i:
+                    diagonal[i] = v
+        return diagonal
+
+    def is_symmetric(self, tolerance=1e-12):
+        entries = {}
+        for i in range(self.num_rows):
+            for j, v in self.row(i):
+                entries[(i, j)] = v
+        for (i, j), v in entries.items():
+            if abs(entries.get((j, i), 0.0) - v) > tolerance * max(abs(v), 1.0):
+                return False
+        return True
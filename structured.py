@@ -0,0 +1,205 @@
+import instrumentation
+from lu import LUFactorization
+from vector import axpy_in_place
+
+
+class SystemStructure(object):
+
+    GENERAL = 'general'
+    DIAGONAL = 'diagonal'
+    UPPER_TRIANGULAR = 'upper-triangular'
+    LOWER_TRIANGULAR = 'lower-triangular'
+    TRIDIAGONAL = 'tridiagonal'
+    BANDED = 'banded'
+
+    #Banded elimination only pays off while the band is narrow next to the number of equations
+    MAX_BAND_FRACTION = 0.5
+
+    #Zero pattern of the coefficients of an AugmentedMatrix, found in one pass over them:
+    #lower_bandwidth (upper_bandwidth) is the furthest any nonzero sits below (above) the diagonal,
+    #and diagonally_dominant means every diagonal entry outweighs the rest of its row, strictly at least once.
+    #Only square matrices are given a kind other than general.
+    def __init__(self, matrix):
+        self.num_rows = matrix.num_rows
+        self.num_variables = matrix.num_variables
+        self.lower_bandwidth = 0
+        self.upper_bandwidth = 0
+        self.diagonally_dominant = self.is_square()
+
+        strictly_dominant = False
+        for i in range(matrix.num_rows):
+            row = matrix.row_coefficients(i)
+            nonzero = [j for j, c in enumerate(row) if c]
+            if nonzero:
+                self.lower_bandwidth = max(self.lower_bandwidth, i - nonzero[0])
+                self.upper_bandwidth = max(self.upper_bandwidth, nonzero[-1] - i)
+
+            if self.diagonally_dominant:
+                diagonal = abs(row[i])
+                off_diagonal = sum(abs(row[j]) for j in nonzero if j != i)
+                self.diagonally_dominant = diagonal >= off_diagonal
+                strictly_dominant = strictly_dominant or diagonal > off_diagonal
+        self.diagonally_dominant = self.diagonally_dominant and strictly_dominant
+
+        self.kind = self.classify()
+
+    def is_square(self):
+        return self.num_rows == self.num_variables
+
+    def classify(self):
+        if not self.is_square():
+            return self.GENERAL
+        p = self.lower_bandwidth
+        q = self.upper_bandwidth
+        if p == 0 and q == 0:
+            return self.DIAGONAL
+        if p == 0:
+            return self.UPPER_TRIANGULAR
+        if q == 0:
+            return self.LOWER_TRIANGULAR
+        if p == 1 and q == 1:
+            return self.TRIDIAGONAL
+        if p + q < self.MAX_BAND_FRACTION * self.num_variables:
+            return self.BANDED
+        return self.GENERAL
+
+    def is_structured(self):
+        return self.kind != self.GENERAL
+
+    def __str__(self):
+        return 'Structure: {} (lower bandwidth {}, upper bandwidth {}{})'.format(
+            self.kind, self.lower_bandwidth, self.upper_bandwidth,
+            ', diagonally dominant' if self.diagonally_dominant else '')
+
+
+class StructuredSolver(object):
+
+    #Unique solutions of square systems with a SystemStructure other than general, without generic
+    #O(n^3) elimination: substitution for triangular systems (O(n^2), O(n) when diagonal), the Thomas
+    #algorithm for diagonally dominant tridiagonal ones (O(n)) and banded elimination with partial pivoting
+    #for the rest (O(n b^2) with b the bandwidth). A pivot that is zero within the mode's tolerance raises
+    #SINGULAR_MATRIX_MSG, leaving such systems to generic elimination. banded_triangular_form and solve work
+    #in place on the matrix.
+    def __init__(self, matrix, structure=None):
+        self.matrix = matrix
+        self.mode = matrix.mode
+        self.structure = structure or SystemStructure(matrix)
+        self.size = matrix.num_variables
+
+    def solve(self):
+        with self.mode.context():
+            return self.do_solve()
+
+    def do_solve(self):
+        kind = self.structure.kind
+        if kind in (SystemStructure.DIAGONAL, SystemStructure.UPPER_TRIANGULAR):
+            return self.back_substitute(self.structure.upper_bandwidth)
+        if kind == SystemStructure.LOWER_TRIANGULAR:
+            return self.forward_substitute()
+        if kind == SystemStructure.TRIDIAGONAL and self.structure.diagonally_dominant:
+            return self.thomas()
+        if kind in (SystemStructure.TRIDIAGONAL, SystemStructure.BANDED):
+            if not self.banded_triangular_form():
+                raise Exception(LUFactorization.SINGULAR_MATRIX_MSG)
+            return self.back_substitute(self.structure.lower_bandwidth + self.structure.upper_bandwidth)
+        raise Exception(LUFactorization.SINGULAR_MATRIX_MSG)
+
+    def pivot(self, i):
+        value = self.matrix.data[i * self.matrix.stride + i]
+        if self.matrix.is_near_zero(value):
+            raise Exception(LUFactorization.SINGULAR_MATRIX_MSG)
+        return value
+
+    #Upper triangular rows with no nonzero further than bandwidth right of the diagonal
+    def back_substitute(self, bandwidth):
+        n = self.size
+        data = self.matrix.data
+        s = self.matrix.stride
+        x = [self.mode.zero] * n
+
+        for i in range(n)[::-1]:
+            total = data[i * s + n]
+            for j in range(i + 1, min(n, i + bandwidth + 1)):
+                total = total - data[i * s + j] * x[j]
+            x[i] = total / self.pivot(i)
+        return x
+
+    def forward_substitute(self):
+        n = self.size
+        data = self.matrix.data
+        s = self.matrix.stride
+        x = [self.mode.zero] * n
+
+        for i in range(n):
+            total = data[i * s + n]
+            for j in range(max(0, i - self.structure.lower_bandwidth), i):
+                total = total - data[i * s + j] * x[j]
+            x[i] = total / self.pivot(i)
+        return x
+
+    #Diagonal dominance keeps every pivot of the sweep away from zero, so no pivoting is needed
+    def thomas(self):
+        n = self.size
+        data = self.matrix.data
+        s = self.matrix.stride
+        upper = [self.mode.zero] * n
+        rhs = [self.mode.zero] * n
+
+        for i in range(n):
+            diagonal = data[i * s + i]
+            total = data[i * s + n]
+            if i > 0:
+                lower = data[i * s + i - 1]
+                diagonal = diagonal - lower * upper[i - 1]
+                total = total - lower * rhs[i - 1]
+            if self.matrix.is_near_zero(diagonal):
+                raise Exception(LUFactorization.SINGULAR_MATRIX_MSG)
+            if i + 1 < n:
+                upper[i] = data[i * s + i + 1] / diagonal
+            rhs[i] = total / diagonal
+
+        x = rhs
+        for i in range(n - 1)[::-1]:
+            x[i] = x[i] - upper[i] * x[i + 1]
+        return x
+
+    def banded_triangular_form(self):
+        with self.mode.context(), instrumentation.phase(instrumentation.TRIANGULAR_PHASE):
+            return self.do_banded_triangular_form()
+
+    #The same triangular form (and pivots) as generic elimination, touching only the band: row swaps widen
+    #the upper bandwidth to lower_bandwidth + upper_bandwidth, and nothing else fills in. Stops and returns
+    #False at the first column without a pivot, leaving the columns before it reduced.
+    def do_banded_triangular_form(self):
+        n = self.size
+        data = self.matrix.data
+        s = self.matrix.stride
+        p = self.structure.lower_bandwidth
+        width = p + self.structure.upper_bandwidth
+
+        for col in range(n):
+            last_row = min(n - 1, col + p)
+            pivot_row = max(range(col, last_row + 1), key=lambda k: abs(data[k * s + col]))
+            if self.matrix.is_near_zero(data[pivot_row * s + col]):
+                return False
+
+            end = min(n, col + width + 1)
+            if pivot_row != col:
+                instrumentation.count(instrumentation.SWAP_ROWS)
+                a = col * s
+                b = pivot_row * s
+                data[a + col:a + end], data[b + col:b + end] = data[b + col:b + end], data[a + col:a + end]
+                data[a + n], data[b + n] = data[b + n], data[a + n]
+
+            pivot = data[col * s + col]
+            for k in range(col + 1, last_row + 1):
+                gamma = data[k * s + col]
+                if not gamma:
+                    continue
+                multiplier = -gamma / pivot
+                instrumentation.count(instrumentation.ADD_MULTIPLE_OF_ROW)
+                axpy_in_place(multiplier, data, col * s + col + 1, k * s + col + 1, end - col - 1)
+                data[k * s + n] = data[k * s + n] + multiplier * data[col * s + n]
+                data[k * s + col] = self.matrix.zero
+
+        return True
@@ -1,12 +1,74 @@
 import sys
 import math
+from array import array
+from operator import mul
+
+import instrumentation
+from numeric import NumericMode, in_mode_context
+
+
+#Fused kernels: each makes one pass over the coordinates and builds a single result.
+#The in-place variants below read their operands as slices and write the result back with one slice
+#assignment, which costs a copy of each operand but runs faster in CPython than writing slot by slot.
+
+def axpy(a, x, y):
+    return [a * xi + yi for xi, yi in zip(x, y)]
+
+def scale(a, x):
+    return [a * xi for xi in x]
+
+def dot(x, y, zero=0):
+    return sum(map(mul, x, y), zero)
+
+#y = a*x + y where x and y are slices of one flat buffer (a list or an array)
+def axpy_in_place(a, buffer, x_start, y_start, length):
+    y_stop = y_start + length
+    result = axpy(a, buffer[x_start:x_start + length], buffer[y_start:y_stop])
+    if isinstance(buffer, array):
+        result = array(buffer.typecode, result)
+    buffer[y_start:y_stop] = result
+
+#buffer[start:start + len(x)] += a*x for an x that lives outside the buffer
+def axpy_into(a, x, buffer, start):
+    stop = start + len(x)
+    result = axpy(a, x, buffer[start:stop])
+    if isinstance(buffer, array):
+        result = array(buffer.typecode, result)
+    buffer[start:stop] = result
+
+def scale_in_place(a, buffer, start, length):
+    stop = start + length
+    result = scale(a, buffer[start:stop])
+    if isinstance(buffer, array):
+        result = array(buffer.typecode, result)
+    buffer[start:stop] = result
+
+
 class Vector(object):
-    def __init__(self, coordinates):
+
+    #No per-instance __dict__; in float mode the coordinates are a packed array of doubles
+    #Vectors are never modified after construction, so derived values are computed once and cached
+    __slots__ = ('coordinates', 'dimension', 'mode',
+                 'cached_squared_norm', 'cached_magnitude', 'cached_unit', 'cached_hash')
+
+    FINGERPRINT_TOLERANCE = 1e-9
+
+    #With a numeric mode every coordinate and every result is converted to that mode's number type
+    def __init__(self, coordinates, mode=None):
+        if instrumentation.active is not None:
+            instrumentation.active.count(instrumentation.VECTOR_ALLOCATIONS)
         try:
             if not coordinates:
                 raise ValueError
-            self.coordinates = tuple(coordinates)
+            self.mode = NumericMode.resolve(mode)
+            if self.mode is None:
+                self.coordinates = tuple(coordinates)
+            elif self.mode.kind == NumericMode.FLOAT:
+                self.coordinates = array('d', coordinates)
+            else:
+                self.coordinates = tuple([self.mode.convert(c) for c in coordinates])
             self.dimension = len(coordinates)
+            self.clear_cache()
 
         except ValueError:
             raise ValueError('The coordinates must be nonempty')
@@ -14,15 +76,75 @@ class Vector(object):
         except TypeError:
             raise TypeError('The coordinates must be an iterable')
 
+    #Float vectors packed into one contiguous array('d'), dimension after dimension
+    @staticmethod
+    def pack(vectors):
+        buffer = array('d')
+        for v in vectors:
+            buffer.extend(v.coordinates)
+        return buffer
+
+    #Float vectors that share the memory of buffer instead of copying it, dimension coordinates each
+    @classmethod
+    def from_buffer(cls, buffer, dimension):
+        view = memoryview(buffer)
+        if view.format != 'd':
+            view = view.cast('B').cast('d')
+
+        mode = NumericMode(NumericMode.FLOAT)
+        vectors = []
+        for start in range(0, len(view), dimension):
+            v = cls.__new__(cls)
+            v.coordinates = view[start:start + dimension]
+            v.dimension = dimension
+            v.mode = mode
+            v.clear_cache()
+            vectors.append(v)
+        return vectors
+
+    #Only needed if the buffer behind a from_buffer vector is written to
+    def clear_cache(self):
+        self.cached_squared_norm = None
+        self.cached_magnitude = None
+        self.cached_unit = None
+        self.cached_hash = None
+
+    #Zero-copy view of the coordinates, only available for float vectors. This is the way to hand a vector
+    #to code that takes a buffer: the __buffer__ protocol hook only exists from Python 3.12 on
+    def as_memoryview(self):
+        if self.mode is None or self.mode.kind != NumericMode.FLOAT:
+            raise TypeError('Only float vectors are backed by a buffer')
+        return memoryview(self.coordinates)
+
     #String function for vectors
     def __str__(self):
-        return 'Vector: {}'.format(self.coordinates)
+        return 'Vector: {}'.format(tuple(self.coordinates))
 
     #Two Vectors are equivalent if they have the same coordinates
     def __eq__(self, v):
-        return self.coordinates == v.coordinates
+        if type(self.coordinates) is type(v.coordinates):
+            return self.coordinates == v.coordinates
+        return tuple(self.coordinates) == tuple(v.coordinates)
+
+    #Numbers that compare equal hash equally, so this agrees with __eq__ across storage types and modes
+    def __hash__(self):
+        if self.cached_hash is None:
+            self.cached_hash = hash(tuple(self.coordinates))
+        return self.cached_hash
+
+    #Coordinates rounded to multiples of tolerance, so vectors that differ only by noise share a fingerprint
+    def fingerprint(self, tolerance=FINGERPRINT_TOLERANCE):
+        return tuple([int(round(float(c) / tolerance)) for c in self.coordinates])
+
+    #Coordinates of both vectors in one numeric mode, preferring this vector's mode over v's
+    def common_mode_coordinates(self, v):
+        mode = self.mode or v.mode
+        a = self.coordinates if self.mode is mode else tuple([mode.convert(c) for c in self.coordinates])
+        b = v.coordinates if v.mode is mode else tuple([mode.convert(c) for c in v.coordinates])
+        return mode, a, b
 
     #The overall total amount of change by the two vectors
+    @in_mode_context
     def plus(self, v):
         
         #The vectors being added must have the same amount of coordinates
@@ -30,13 +152,15 @@ class Vector(object):
             raise Exception("Dimensions of both vectors must be equivalent")
 
         #Adding vectors is the same as the sum of their coordinates
+        mode, a, b = self.common_mode_coordinates(v)
         sumCoordinates = []
         for x in range(0,self.dimension):
-            sumCoordinates.append(self.coordinates[x] + v.coordinates[x])
+            sumCoordinates.append(a[x] + b[x])
         
-        return Vector(tuple(sumCoordinates))
+        return Vector(tuple(sumCoordinates), mode=mode)
 
     #The vector that runs from the head of one vector to the head of the other vector
+    @in_mode_context
     def minus(self, v):
 
         #The vectors being subtracted must have the same amount of coordinates
@@ -44,13 +168,15 @@ class Vector(object):
             raise Exception("Dimensions of both vectors must be equivalent")
 
         #Subtracting vectors is the same as the difference of their coordinates
+        mode, a, b = self.common_mode_coordinates(v)
         diffCoordinates = []
         for x in range(0,self.dimension):
-            diffCoordinates.append(self.coordinates[x] - v.coordinates[x])
+            diffCoordinates.append(a[x] - b[x])
 
-        return Vector(tuple(diffCoordinates))
+        return Vector(tuple(diffCoordinates), mode=mode)
 
     #The dot product is the angel between two different vectors
+    @in_mode_context
     def dot_product(self, v):
 
         #The vectors being multiplied must have the same amount of coordinates
@@ -58,54 +184,109 @@ class Vector(object):
             raise Exception("Dimensions of both vectors must be equivalent")
 
         #dot product is calculated by multiplying the corresponding coordinates of two vectors
-        dotProduct = 0
-        for x in range(0, self.dimension):
-            dotProduct += self.coordinates[x] * v.coordinates[x]
-
-        return dotProduct
+        mode, a, b = self.common_mode_coordinates(v)
+        return dot(a, b, 0 if mode is None else mode.zero)
 
 
     #Multipling the vecotr by a given scalar
+    @in_mode_context
     def times_scalar(self, scalar):
-        scale_coordinates = []
-        for x in range(0, self.dimension):
-            scale_coordinates.append(self.coordinates[x] * scalar)
+        if self.mode is not None:
+            scalar = self.mode.convert(scalar)
 
-        return Vector(tuple(scale_coordinates))
+        return Vector(scale(scalar, self.coordinates), mode=self.mode)
+
+    #scalar * self + v in one pass
+    @in_mode_context
+    def axpy(self, scalar, v):
+        if (self.dimension != v.dimension):
+            raise Exception("Dimensions of both vectors must be equivalent")
+
+        mode, a, b = self.common_mode_coordinates(v)
+        if mode is not None:
+            scalar = mode.convert(scalar)
+
+        return Vector(axpy(scalar, a, b), mode=mode)
+
+    #The projection of self onto basis, (self.basis / basis.basis) * basis, with a single allocation
+    @in_mode_context
+    def project_onto(self, basis):
+        mode, a, b = self.common_mode_coordinates(basis)
+        zero = 0 if mode is None else mode.zero
+
+        squared_norm = basis.squared_norm() if basis.mode is not None and basis.mode is mode else dot(b, b, zero)
+        if squared_norm == 0:
+            raise Exception("The zero vector has no direction")
+
+        return Vector(scale(dot(a, b, zero) / squared_norm, b), mode=mode)
+
+    #self minus its projection onto basis, also in one pass
+    @in_mode_context
+    def reject_from(self, basis):
+        mode, a, b = self.common_mode_coordinates(basis)
+        zero = 0 if mode is None else mode.zero
+
+        squared_norm = basis.squared_norm() if basis.mode is not None and basis.mode is mode else dot(b, b, zero)
+        if squared_norm == 0:
+            raise Exception("The zero vector has no direction")
+
+        return Vector(axpy(-dot(a, b, zero) / squared_norm, b, a), mode=mode)
 
     #magnitude is the length of a vector
     def magnitude(self):
+        if self.cached_magnitude is None:
+            if self.mode is not None:
+                with self.mode.context():
+                    self.cached_magnitude = self.mode.sqrt(self.squared_norm())
+            else:
+                self.cached_magnitude = math.sqrt(self.squared_norm())
+        return self.cached_magnitude
 
-        sumOfSquares = 0
-        #The magnitude of a vector is equal to the square root of the sum of the coordinates of the vector squared 
-        for x in range(0, self.dimension):
-            sumOfSquares += math.pow(self.coordinates[x],2)
-         
-        return math.sqrt(sumOfSquares)
+    def squared_norm(self):
+        if self.cached_squared_norm is None:
+            if self.mode is not None:
+                self.cached_squared_norm = self.dot_product(self)
+            else:
+                sumOfSquares = 0
+                #The magnitude of a vector is equal to the square root of the sum of the coordinates of the vector squared 
+                for x in range(0, self.dimension):
+                    sumOfSquares += math.pow(self.coordinates[x],2)
+                self.cached_squared_norm = sumOfSquares
+        return self.cached_squared_norm
 
     '''
     ' calculating the unit vector of a given vector
     ' (1/magnitude)(vector)
     '''
     def normalization(self):
+        if self.cached_unit is not None:
+            return self.cached_unit
+
         magnitude = self.magnitude()
 
         #The zero vector cannot be normalized
         if (magnitude == 0):
             raise Exception("The zero vector has no direction")
-        inverseMagnitude = 1/self.magnitude()
-        return self.times_scalar(inverseMagnitude)
+        if self.mode is not None:
+            with self.mode.context():
+                self.cached_unit = self.times_scalar(self.mode.one / magnitude)
+        else:
+            inverseMagnitude = 1/magnitude
+            self.cached_unit = self.times_scalar(inverseMagnitude)
+        return self.cached_unit
 
     def angle_between(self, v, radians=True):
-        if self.magnitude() == 0 or v.magnitude() == 0:
+        magnitude1 = self.magnitude()
+        magnitude2 = v.magnitude()
+        if magnitude1 == 0 or magnitude2 == 0:
             raise Exception("The zero vector has no direction")
 
         dotproduct = self.dot_product(v)
         if radians == True:
-            return math.acos(round(float(dotproduct)/(self.magnitude() * v.magnitude()), 6))
+            return math.acos(round(float(dotproduct)/(float(magnitude1) * float(magnitude2)), 6))
 
         else:
-            return math.degrees(float(dotproduct)/(self.magnitude() * v.magnitude()))
+            return math.degrees(float(dotproduct)/(float(magnitude1) * float(magnitude2)))
 
     #Two vectors are orthogonal if their dot_product is zero
     def is_orthogonal(self, v, tolerance=1e-10):
@@ -143,19 +324,20 @@ class Vector(object):
                 return True
 
         #Two vectors are parrallel if one is a scalar multiple of the other
-        if (self.angle_between(v) == 0) or (self.angle_between(v) == math.pi):
+        angle = self.angle_between(v)
+        if (angle == 0) or (angle == math.pi):
             return True
         else:
             return False
 
     def component_parallel_to(self, basis):
         #v parrallel to a basis is equal to the normalization of the basis vector times the scalar of the dot proudct of v and the normalized basis
-        u = basis.normalization()
-        return u.times_scalar((self.dot_product(u)))
+        return self.project_onto(basis)
 
     def component_orthogonal_to(self, basis):
-        return self.minus(self.component_parallel_to(basis))
+        return self.reject_from(basis)
 
+    @in_mode_context
     def cross_product(self, v):
         if self.dimension != 3 or v.dimension != 3:
             raise Exception("vectors must be of the third dimension")
@@ -164,7 +346,7 @@ class Vector(object):
         newVec.append((self.coordinates[1] * v.coordinates[2]) - (v.coordinates[1] * self.coordinates[2]))
         newVec.append(-((self.coordinates[0] * v.coordinates[2]) - (v.coordinates[0] * self.coordinates[2])))
         newVec.append((self.coordinates[0] * v.coordinates[1]) - (v.coordinates[0] * self.coordinates[1]))
-        return Vector(tuple(newVec))
+        return Vector(tuple(newVec), mode=self.mode)
     
     def area_of_parallelogram(self, v):
         return self.cross_product(v).magnitude()
@@ -261,6 +443,76 @@ def main():
     vector37 = Vector([-6.007, 0.124, 5.772])
     print(vector36.area_of_triangle(vector37))
 
+    float_mode = NumericMode(NumericMode.FLOAT)
+    v = Vector([1.5, -2.0, 4.0], mode=float_mode)
+    try:
+        v.extra = 1
+        slotted = False
+    except AttributeError:
+        slotted = True
+    try:
+        Vector([1, 2]).as_memoryview()
+        memoryview_refused = False
+    except TypeError:
+        memoryview_refused = True
+    if not (slotted and not hasattr(v, '__dict__') and
+            isinstance(v.coordinates, array) and v.coordinates.typecode == 'd' and
+            v.as_memoryview().format == 'd' and v.as_memoryview().tolist() == [1.5, -2.0, 4.0] and
+            memoryview_refused):
+        print('test case 1 failed')
+
+    buffer = array('d', [1, 2, 3, 4, 5, 6])
+    vectors = Vector.from_buffer(buffer, 3)
+    buffer[3] = 7
+    if not (len(vectors) == 2 and vectors[1].coordinates.tolist() == [7, 5, 6] and
+            vectors[0].mode == float_mode and
+            Vector.pack(vectors) == buffer and
+            [u.coordinates.tolist() for u in Vector.from_buffer(buffer.tobytes(), 2)] == [[1, 2], [3, 7], [5, 6]]):
+        print('test case 2 failed')
+
+    from decimal import Decimal
+    from fractions import Fraction
+
+    rows = [1.0, 2.0, 3.0, 10.0, 20.0, 30.0]
+    listed = rows[:]
+    packed = array('d', rows)
+    axpy_in_place(2.0, listed, 0, 3, 3)
+    axpy_in_place(2.0, packed, 0, 3, 3)
+    scale_in_place(-1.0, packed, 0, 2)
+    axpy_into(Fraction(1, 2), [2, 4], listed, 1)
+    if not (axpy(2, [1, 2], [3, 4]) == [5, 8] and scale(3, [1, -2]) == [3, -6] and
+            dot([1, 2, 3], [4, 5, 6]) == 32 and dot([], [], Decimal(0)) == Decimal(0) and
+            listed == [1.0, 3.0, 5.0, 12.0, 24.0, 36.0] and
+            packed.tolist() == [-1.0, -2.0, 3.0, 12.0, 24.0, 36.0] and isinstance(packed, array)):
+        print('test case 3 failed')
+
+    fraction_mode = NumericMode(NumericMode.FRACTION)
+    x = Vector([3, 4, 0], mode=fraction_mode)
+    y = Vector([1, 1, 1], mode=fraction_mode)
+    if not (x.axpy(Fraction(1, 2), y) == x.times_scalar(Fraction(1, 2)).plus(y) and
+            x.project_onto(y) == Vector([Fraction(7, 3)] * 3) and
+            x.project_onto(y).plus(x.reject_from(y)) == x and
+            x.reject_from(y).dot_product(y) == 0):
+        print('test case 4 failed')
+
+    z = Vector([3, 4], mode=fraction_mode)
+    h = hash(z)
+    if not (z.magnitude() == 5 and z.cached_magnitude == 5 and z.cached_squared_norm == 25 and
+            z.normalization() is z.normalization() and hash(z) == h and
+            hash(Vector([1, 2])) == hash(Vector([1.0, 2.0], mode=float_mode)) == hash(Vector([Decimal(1), Fraction(2)])) and
+            len({Vector([1, 2]), Vector([1.0, 2.0], mode=float_mode), Vector([2, 1])}) == 2):
+        print('test case 5 failed')
+
+    buffer = array('d', [3, 4])
+    w = Vector.from_buffer(buffer, 2)[0]
+    before = w.magnitude()
+    buffer[0] = 0
+    stale = w.magnitude()
+    w.clear_cache()
+    if not (before == 5 and stale == 5 and w.magnitude() == 4 and w.cached_unit is None and
+            w.normalization() == Vector([0.0, 1.0])):
+        print('test case 6 failed')
+
 
 
     